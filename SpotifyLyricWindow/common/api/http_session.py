@@ -0,0 +1,59 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common.config import Config
+
+# 各 api 提供方对应的代理配置项
+PROVIDER_PROXY_CONFIG = {
+    "spotify": "spotify_proxy_ip",
+    "cloudmusic": "cloudmusic_proxy_ip",
+    "kugou": "kugou_proxy_ip",
+}
+
+_POOL_CONNECTIONS = 4  # 每个 Session 缓存连接池的主机数
+_POOL_MAXSIZE = 8  # 每个主机的连接数上限，超出的并发请求等待空闲连接而不是新建后丢弃
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_proxy(provider: str) -> dict:
+    """读取提供方当前的代理配置"""
+    proxy_ip = getattr(Config.CommonConfig.ClientConfig, PROVIDER_PROXY_CONFIG[provider])
+    return {"https": proxy_ip, "http": proxy_ip} if proxy_ip else {}
+
+
+def get_session(provider: str) -> requests.Session:
+    """
+    获取提供方共享的 Session，同一主机的请求复用 keep-alive 连接
+
+    代理在每次获取时按配置刷新，设置页修改代理后无需重启即可生效
+    """
+    with _sessions_lock:
+        session = _sessions.get(provider)
+        if session is None:
+            session = requests.Session()
+            # 只复用连接，不保存服务端下发的 cookie，请求保持与逐次调用 requests.get 相同的语义
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            adapter = HTTPAdapter(pool_connections=_POOL_CONNECTIONS, pool_maxsize=_POOL_MAXSIZE,
+                                  pool_block=True)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[provider] = session
+    proxies = get_proxy(provider)
+    if session.proxies != proxies:
+        session.proxies = proxies
+    return session
+
+
+def close_sessions():
+    """关闭所有 Session 及其连接池"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
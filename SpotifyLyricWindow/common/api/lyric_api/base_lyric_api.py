@@ -7,6 +7,7 @@ from common.lyric.lyric_type import LrcFile
 
 
 class BaseMusicApi(abc.ABC):
+    _PROVIDER: str  # key of the shared session and the response cache
     _SEARCH_SONG_ID_URL: str
     _SEARCH_SONG_INFO_URL: str
     _FETCH_LYRIC_URL: str
@@ -9,6 +9,9 @@ from typing import List
 import requests
 
 from common.api.exceptions import NoneResultError, NetworkError
+from common.api.http_session import get_session
+from common.api.provider_health import track_health
+from common.api.response_cache import cached_response, SEARCH_TTL, SONG_INFO_TTL
 from common.api.lyric_api.base_lyric_api import BaseMusicApi
 from common.config import Config
 from common.lyric.lyric_type import LrcFile, TransType
@@ -17,16 +20,16 @@ from common.song_metadata.metadata_type import SongInfo, SongSearchInfo
 
 
 class CloudMusicWebApi(BaseMusicApi):
+    _PROVIDER = "cloudmusic"
     _SEARCH_SONG_ID_URL = 'https://music.163.com/api/search/get/web?&s={}&type=1&offset={}&total=true&limit=10'
     _SEARCH_SONG_INFO_URL = 'http://music.163.com/api/song/detail/?id={}&ids=[{}]'
     _FETCH_LYRIC_URL = 'http://music.163.com/api/song/lyric?id={}&lv=-1&kv=-1&tv=-1&rv=-1'
     _USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36'
     _MAINLAND_IP_PATH = RESOURCE_PATH / 'data' / 'mainland_ip.txt'
 
-    @staticmethod
-    def _get_proxy():
-        proxy_ip = Config.CommonConfig.ClientConfig.cloudmusic_proxy_ip
-        return {"https": proxy_ip, "http": proxy_ip} if proxy_ip else {}
+    @classmethod
+    def _session(cls):
+        return get_session(cls._PROVIDER)
 
     @classmethod
     def _generate_mainland_ip(cls):
@@ -59,26 +62,31 @@ class CloudMusicWebApi(BaseMusicApi):
         return headers
 
     def _request_json(self, method: str, url: str, **kwargs):
-        return getattr(requests, method)(url, headers=self._build_headers(), **kwargs).json()
+        return getattr(self._session(), method)(url, headers=self._build_headers(), **kwargs).json()
 
-    def search_song_id(self, keyword: str, page: int = 1, _retry: bool = True) -> List[SongSearchInfo]:
-        keyword = re.sub(r"|[!@#$%^&*/]+", "", keyword)
-        url = self._SEARCH_SONG_ID_URL.format(keyword, (page - 1) * 20)
+    def _post_search(self, url: str) -> dict:
         try:
-            res_json = requests.post(
+            return self._session().post(
                 url,
                 timeout=4,
                 headers=self._build_headers(),
-                proxies=self._get_proxy(),
             ).json()
         except requests.exceptions.RequestException as e:
             raise NetworkError("网易云搜索歌词出错") from e
 
+    @cached_response("search_song_id", SEARCH_TTL)
+    @track_health
+    def search_song_id(self, keyword: str, page: int = 1) -> List[SongSearchInfo]:
+        keyword = re.sub(r"|[!@#$%^&*/]+", "", keyword)
+        url = self._SEARCH_SONG_ID_URL.format(keyword, (page - 1) * 20)
+        res_json = self._post_search(url)
+
         if res_json.get("abroad"):
-            if _retry:
-                self._get_or_create_mainland_ip()
-                return self.search_song_id(keyword, page, _retry=False)
-            raise NoneResultError
+            # 海外访问受限时使用大陆 ip 重试一次，仍受限则视为网络错误（不作为无结果缓存）
+            self._get_or_create_mainland_ip()
+            res_json = self._post_search(url)
+            if res_json.get("abroad"):
+                raise NetworkError("网易云限制海外访问")
         if res_json["result"] == {} or res_json['code'] == 400 or res_json["result"]['songCount'] == 0:  # 该关键词没有结果
             raise NoneResultError
 
@@ -99,14 +107,15 @@ class CloudMusicWebApi(BaseMusicApi):
         else:
             raise NoneResultError
 
+    @cached_response("search_song_info", SONG_INFO_TTL, uncached_params=("download_pic",))
+    @track_health
     def search_song_info(self, song_id: str, *, download_pic: bool = False, pic_size: int = 0) -> SongInfo:
         url = self._SEARCH_SONG_INFO_URL.format(song_id, song_id)
         try:
-            res_json = requests.post(
+            res_json = self._session().post(
                 url,
                 timeout=10,
                 headers=self._build_headers(),
-                proxies=self._get_proxy(),
             ).json()
         except requests.exceptions.RequestException as e:
             raise NetworkError("网易云查找歌词信息出错") from e
@@ -121,12 +130,11 @@ class CloudMusicWebApi(BaseMusicApi):
             param = {} if not pic_size else {"param": f"{pic_size}y{pic_size}"}
             pic_url = song_json["album"]["picUrl"]
             try:
-                pic_data = requests.get(
+                pic_data = self._session().get(
                     pic_url,
                     timeout=10,
                     params=param,
                     headers=self._build_headers(),
-                    proxies=self._get_proxy(),
                 ).content
             except requests.exceptions.RequestException as e:
                 raise NetworkError("网易云歌曲图片获取失败") from e
@@ -146,13 +154,13 @@ class CloudMusicWebApi(BaseMusicApi):
         }
         return SongInfo(**song_info)
 
+    @track_health
     def fetch_song_lyric(self, song_id: str) -> LrcFile:
         try:
-            res_json = requests.get(
+            res_json = self._session().get(
                 self._FETCH_LYRIC_URL.format(song_id),
                 timeout=10,
                 headers=self._build_headers(),
-                proxies=self._get_proxy(),
             ).json()
         except requests.exceptions.RequestException as e:
             raise NetworkError("网易云下载歌词失败") from e
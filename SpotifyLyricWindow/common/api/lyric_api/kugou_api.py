@@ -8,13 +8,16 @@ from typing import List, Dict
 import requests
 
 from common.api.exceptions import NoneResultError, NetworkError
+from common.api.http_session import get_session
+from common.api.provider_health import track_health
+from common.api.response_cache import cached_response, SEARCH_TTL, SONG_INFO_TTL
 from common.api.lyric_api.base_lyric_api import BaseMusicApi
-from common.config import Config
 from common.lyric.lyric_type import KrcFile
 from common.song_metadata.metadata_type import SongInfo, SongSearchInfo
 
 
 class KugouApi(BaseMusicApi):
+    _PROVIDER = "kugou"
     _SEARCH_SONG_ID_URL = 'http://mobilecdn.kugou.com/api/v3/search/song?format=json&keyword={}&page={' \
                           '}&pagesize=20&showtype=1 '
     _SEARCH_SONG_INFO_URL = 'http://m.kugou.com/app/i/getSongInfo.php?cmd=playInfo&hash={}'
@@ -25,18 +28,19 @@ class KugouApi(BaseMusicApi):
 
     header = {'User-Agent': 'Mozilla/5.0 (Windows NT 6.1; WOW64; rv:7.0a1) Gecko/20110623 Firefox/7.0a1 Fennec/7.0a1'}
 
-    @staticmethod
-    def _get_proxy():
-        proxy_ip = Config.CommonConfig.ClientConfig.kugou_proxy_ip
-        return {"https": proxy_ip, "http": proxy_ip} if proxy_ip else {}
+    @classmethod
+    def _session(cls):
+        return get_session(cls._PROVIDER)
 
     # 获取hash值需要搜索关键词。获取access_key和id需要hash值。下载歌词文件需要access_key和id
 
+    @cached_response("search_song_id", SEARCH_TTL)
+    @track_health
     def search_song_id(self, keyword: str, page: int = 1) -> List[SongSearchInfo]:
         keyword = re.sub(r"|[!@#$%^&*/]+", "", keyword)
         url = self._SEARCH_SONG_ID_URL.format(keyword, page)
         try:
-            res_json = requests.get(url, headers=self.header, timeout=4, proxies=self._get_proxy()).json()
+            res_json = self._session().get(url, headers=self.header, timeout=4).json()
         except requests.exceptions.RequestException as e:
             raise NetworkError("酷狗查询歌词失败") from e
 
@@ -56,10 +60,11 @@ class KugouApi(BaseMusicApi):
         else:
             raise NoneResultError("该搜索词无对应歌曲")
 
+    @cached_response("search_song_info", SONG_INFO_TTL, uncached_params=("download_pic",))
+    @track_health
     def search_song_info(self, md5: str, *, download_pic: bool = False, pic_size: int = 0) -> SongInfo:
         try:
-            song_json = requests.get(self._SEARCH_SONG_INFO_URL.format(md5), headers=self.header, timeout=4,
-                                     proxies=self._get_proxy()).json()
+            song_json = self._session().get(self._SEARCH_SONG_INFO_URL.format(md5), headers=self.header, timeout=4).json()
         except requests.RequestException as e:
             raise NetworkError("酷狗搜索歌词信息失败") from e
 
@@ -72,8 +77,8 @@ class KugouApi(BaseMusicApi):
         album_id = song_json["albumid"]  # if not found, the 'album_id' is 0
         if album_id:
             try:
-                album_json = requests.get(self._SEARCH_ALBUM_INFO_URL.format(album_id),
-                                          headers=self.header, timeout=4, proxies=self._get_proxy()).json()
+                album_json = self._session().get(self._SEARCH_ALBUM_INFO_URL.format(album_id),
+                                                 headers=self.header, timeout=4).json()
             except requests.RequestException as e:
                 raise NetworkError("酷狗搜索歌词专辑信息失败") from e
             album = album_json["data"].get("albumname", None)
@@ -86,7 +91,7 @@ class KugouApi(BaseMusicApi):
 
         if download_pic and pic_url:
             try:
-                pic_data = requests.get(pic_url, timeout=10, proxies=self._get_proxy()).content
+                pic_data = self._session().get(pic_url, timeout=10).content
             except requests.RequestException as e:
                 raise NetworkError("酷狗获取专辑图片失败") from e
             pic_buffer = io.BytesIO(pic_data)
@@ -105,6 +110,7 @@ class KugouApi(BaseMusicApi):
         }
         return SongInfo(**song_info)
 
+    @track_health
     def fetch_song_lyric(self, song_id: str) -> KrcFile:
         lrc_info_list = self._get_lrc_info(song_id)
         return self._get_lrc(lrc_info_list[0])
@@ -118,7 +124,7 @@ class KugouApi(BaseMusicApi):
         """
         url = self._GET_KEY_SEARCH_URL.format(md5)
         try:
-            res_json = requests.get(url, headers=self.header, timeout=4, proxies=self._get_proxy()).json()
+            res_json = self._session().get(url, headers=self.header, timeout=4).json()
         except requests.RequestException as e:
             raise NetworkError("获取酷狗歌词信息失败") from e
         if res_json['errcode'] != 200:
@@ -149,7 +155,7 @@ class KugouApi(BaseMusicApi):
         """
         url = self._FETCH_LYRIC_URL.format(lyric_info["id"], lyric_info["key"], 'krc')
         try:
-            res_json = requests.get(url, timeout=4, proxies=self._get_proxy()).json()
+            res_json = self._session().get(url, timeout=4).json()
         except requests.RequestException as e:
             raise NetworkError("酷狗下载歌词失败") from e
         content = res_json['content']
@@ -13,11 +13,15 @@ from common.api.lyric_api.base_lyric_api import BaseMusicApi
 from common.song_metadata.metadata_type import SongInfo, SongSearchInfo
 from common.config import Config
 from common.api.exceptions import UserError, NetworkError
-from common.lyric.lyric_type import LrcFile
+from common.api.http_session import get_session
+from common.api.provider_health import track_health
+from common.api.response_cache import cached_response, SEARCH_TTL, SONG_INFO_TTL
+from common.lyric.lyric_type import LrcFile, TransType
 from common.path import LYRIC_TOKEN_PATH
 
 
 class SpotifyApi(BaseMusicApi):
+    _PROVIDER = "spotify"
     _SEARCH_SONG_ID_URL = "https://api.spotify.com/v1/search?query={}&type=track&offset={}&limit=10"
     _SEARCH_SONG_INFO_URL = "https://api.spotify.com/v1/tracks/{}"
     _FETCH_LYRIC_URL = "https://spclient.wg.spotify.com/color-lyrics/v2/track/{}?format=json&market=from_token"
@@ -30,23 +34,22 @@ class SpotifyApi(BaseMusicApi):
     def __init__(self):
         self.auth = SpotifyUserAuth()
 
-        self.web_session = requests.Session()
         dc_token = Config.CommonConfig.ClientConfig.sp_dc
         self.sp_dc = dc_token
 
-    @staticmethod
-    def _get_proxy():
-        proxy_ip = Config.CommonConfig.ClientConfig.spotify_proxy_ip
-        return {"https": proxy_ip, "http": proxy_ip} if proxy_ip else {}
+    @classmethod
+    def _session(cls):
+        return get_session(cls._PROVIDER)
 
+    @cached_response("search_song_id", SEARCH_TTL)
+    @track_health
     def search_song_id(self, keyword: str, page: int = 1):
         keyword = re.sub(r"|[!@#$%^&*/]+", "", keyword)
 
         url = self._SEARCH_SONG_ID_URL.format(keyword, (page - 1) * 10)
 
-        proxy = self._get_proxy()
         try:
-            res_json = requests.get(url, headers=self._get_token(), proxies=proxy).json()
+            res_json = self._session().get(url, headers=self._get_token()).json()
         except requests.RequestException as e:
             raise NetworkError("spotify查找歌曲失败") from e
         song_info_list = []
@@ -62,11 +65,12 @@ class SpotifyApi(BaseMusicApi):
             song_info_list.append(SongSearchInfo(**song_info))
         return song_info_list
 
+    @cached_response("search_song_info", SONG_INFO_TTL, uncached_params=("download_pic",))
+    @track_health
     def search_song_info(self, song_id: str, *, download_pic: bool = False, pic_size: int = 0):
         url = self._SEARCH_SONG_INFO_URL.format(song_id)
-        proxy = self._get_proxy()
         try:
-            song_json = requests.get(url, headers=self._get_token(), proxies=proxy).json()
+            song_json = self._session().get(url, headers=self._get_token()).json()
         except requests.RequestException as e:
             raise NetworkError("spotify查询歌曲数据失败") from e
         if song_json.get("error"):
@@ -82,8 +86,7 @@ class SpotifyApi(BaseMusicApi):
             if pic_jsons:
                 pic_json = pic_jsons[0]
                 pic_url = pic_json["url"]
-                proxy = self._get_proxy()
-                pic_data = requests.get(pic_url, timeout=10, proxies=proxy).content
+                pic_data = self._session().get(pic_url, timeout=10).content
                 pic_buffer = io.BytesIO(pic_data)
             else:
                 pic_buffer = None
@@ -101,14 +104,13 @@ class SpotifyApi(BaseMusicApi):
             "picBuffer": pic_buffer}
         return SongInfo(**song_info)
 
+    @track_health
     def fetch_song_lyric(self, song_id: str):
         self._check_token_expired()
         lyric_token = self._load_lyric_token()
 
         url = self._FETCH_LYRIC_URL.format(song_id)
 
-        proxy = self._get_proxy()
-
         header = {
             "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:124.0) Gecko/20100101 Firefox/124.0",
             "referer": "https://open.spotify.com/",
@@ -121,7 +123,7 @@ class SpotifyApi(BaseMusicApi):
 
         lrc_file = LrcFile()
         try:
-            res = requests.get(url, headers=header, proxies=proxy)
+            res = self._session().get(url, headers=header)
         except requests.RequestException:
             raise NetworkError("spotify歌词api获取失败")
         if res.status_code == requests.status_codes.codes.not_found:
@@ -135,8 +137,8 @@ class SpotifyApi(BaseMusicApi):
 
         res_json = res.json()
 
-        for line in res_json['lyrics']['lines']:
-            lrc_file.trans_non_dict[int(line['startTimeMs'])] = line['words']
+        lyric_dict = {int(line['startTimeMs']): line['words'] for line in res_json['lyrics']['lines']}
+        lrc_file.load_dict(lyric_dict, TransType.NON)
 
         return lrc_file
 
@@ -152,7 +154,6 @@ class SpotifyApi(BaseMusicApi):
     def _get_lyric_token(self):
         server_time = self._get_server_time()
         totp = self._generate_totp(server_time)
-        proxy = self._get_proxy()
         params = {
             'reason': 'transport',
             'productType': 'web_player',
@@ -167,7 +168,7 @@ class SpotifyApi(BaseMusicApi):
             'Origin': 'https://open.spotify.com/',
             'Cookie': f'sp_dc={self.sp_dc}'
         }
-        response = requests.get(self._TOKEN_URL, headers=headers, params=params, proxies=proxy)
+        response = self._session().get(self._TOKEN_URL, headers=headers, params=params)
         response.raise_for_status()
         data = response.json()
         if data.get('isAnonymous'):
@@ -179,13 +180,12 @@ class SpotifyApi(BaseMusicApi):
         return lyric_token
 
     def _get_server_time(self):
-        proxy = self._get_proxy()
         headers = {
             'Referer': 'https://open.spotify.com/',
             'Origin': 'https://open.spotify.com/',
             'Cookie': f'sp_dc={self.sp_dc}'
         }
-        response = requests.get(self._SERVER_TIME_URL, headers=headers, proxies=proxy)
+        response = self._session().get(self._SERVER_TIME_URL, headers=headers)
         if response.status_code != 200:
             raise NetworkError("spotify服务器时间获取失败")
         return response.json()['serverTime']
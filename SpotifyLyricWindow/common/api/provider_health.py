@@ -0,0 +1,167 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import functools
+import threading
+import time
+from collections import deque, namedtuple
+
+import requests
+
+from common.api.exceptions import NetworkError, NoneResultError
+from common.logger import get_logger
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"  # 正常
+OPEN = "open"  # 熔断中，请求直接失败
+HALF_OPEN = "half_open"  # 熔断到期，放行一个探测请求
+
+ProviderHealthInfo = namedtuple("ProviderHealthInfo", ["provider", "state", "p50", "p95", "error_rate",
+                                                       "consecutive_failures", "samples"])
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+class ProviderHealth:
+    """
+    单个提供方的健康状态：最近请求的延迟与错误率，以及熔断器
+
+    连续失败 failure_threshold 次后熔断，open_time 秒内的请求直接失败；
+    到期后进入半开状态放行一个探测请求，成功则恢复，失败则熔断时间翻倍（不超过 max_open_time）
+    """
+
+    def __init__(self, provider: str, *, window: int = 50, failure_threshold: int = 3, open_time: float = 30,
+                 max_open_time: float = 600):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.base_open_time = open_time
+        self.max_open_time = max_open_time
+        self._latencies = deque(maxlen=window)  # 成功请求的耗时（秒）
+        self._results = deque(maxlen=window)  # 最近请求是否成功
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.open_time = open_time
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow_request(self) -> bool:
+        """是否允许发送请求；半开状态下只放行一个探测请求"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_time:
+                    return False
+                self.state = HALF_OPEN
+                self._probing = False
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def is_available(self) -> bool:
+        """是否可能放行请求（不占用半开状态的探测机会）"""
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() - self._opened_at >= self.open_time
+            return not (self.state == HALF_OPEN and self._probing)
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+            self._results.append(True)
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                logger.info("%s 已恢复", self.provider)
+            self.state = CLOSED
+            self.open_time = self.base_open_time
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._results.append(False)
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN:
+                self.open_time = min(self.open_time * 2, self.max_open_time)
+                self._open()
+            elif self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self._open()
+
+    def cancel_probe(self):
+        """探测请求因与提供方无关的原因中止，允许再次探测"""
+        with self._lock:
+            self._probing = False
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._probing = False
+        logger.info("%s 连续失败 %d 次，暂停请求 %d 秒", self.provider, self.consecutive_failures, self.open_time)
+
+    def percentile(self, percent: float):
+        """成功请求耗时的百分位数（秒），没有样本时返回 None"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100))]
+
+    def error_rate(self) -> float:
+        with self._lock:
+            return self._results.count(False) / len(self._results) if self._results else 0.0
+
+    def snapshot(self) -> ProviderHealthInfo:
+        with self._lock:
+            state = self.state
+            if state == OPEN and time.monotonic() - self._opened_at >= self.open_time:
+                state = HALF_OPEN
+            consecutive_failures, samples = self.consecutive_failures, len(self._results)
+        return ProviderHealthInfo(self.provider, state, self.percentile(50), self.percentile(95), self.error_rate(),
+                                  consecutive_failures, samples)
+
+
+def get_provider_health(provider: str) -> ProviderHealth:
+    with _health_lock:
+        health = _health.get(provider)
+        if health is None:
+            health = _health[provider] = ProviderHealth(provider)
+        return health
+
+
+def get_all_provider_health() -> list:
+    """所有已发送过请求的提供方的状态"""
+    with _health_lock:
+        health_list = list(_health.values())
+    return [health.snapshot() for health in health_list]
+
+
+def track_health(func):
+    """
+    记录 api 方法的耗时与成败，提供方取自实例的 _PROVIDER
+
+    熔断中直接抛出 NetworkError；NoneResultError 视为提供方正常响应。
+    需放在 cached_response 内层，缓存命中不计入统计
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        health = get_provider_health(self._PROVIDER)
+        if not health.allow_request():
+            raise NetworkError(f"{self._PROVIDER} 暂时不可用")
+        start_time = time.monotonic()
+        try:
+            result = func(self, *args, **kwargs)
+        except NoneResultError:
+            health.record_success(time.monotonic() - start_time)
+            raise
+        except (NetworkError, requests.RequestException, ValueError, KeyError):
+            health.record_failure()
+            raise
+        except Exception:
+            health.cancel_probe()
+            raise
+        health.record_success(time.monotonic() - start_time)
+        return result
+
+    return wrapper
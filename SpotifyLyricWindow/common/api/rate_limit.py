@@ -0,0 +1,40 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import threading
+import time
+from collections import deque
+
+
+class RateBudget:
+    """滑动窗口限流：period 秒内最多 limit 次"""
+
+    def __init__(self, limit: int, period: float):
+        self.limit = limit
+        self.period = period
+        self._times = deque()
+        self._lock = threading.Lock()
+
+    def _wait_time(self, now: float) -> float:
+        """尝试占用一次额度，成功返回 0，否则返回需要等待的秒数"""
+        while self._times and now - self._times[0] >= self.period:
+            self._times.popleft()
+        if len(self._times) >= self.limit:
+            return self._times[0] + self.period - now
+        self._times.append(now)
+        return 0
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            return self._wait_time(time.monotonic()) == 0
+
+    def acquire(self, stop_event: threading.Event = None) -> bool:
+        """阻塞直至获得额度；stop_event 被设置时放弃并返回 False"""
+        while True:
+            with self._lock:
+                wait_time = self._wait_time(time.monotonic())
+            if wait_time == 0:
+                return True
+            if stop_event is None:
+                time.sleep(wait_time)
+            elif stop_event.wait(wait_time):
+                return False
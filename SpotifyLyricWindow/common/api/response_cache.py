@@ -0,0 +1,174 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import functools
+import inspect
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from common.api.exceptions import NoneResultError
+from common.logger import get_logger
+from common.path import API_CACHE_DB_PATH
+from common.song_metadata.metadata_type import SongInfo, SongSearchInfo
+
+logger = get_logger(__name__)
+
+SEARCH_TTL = 6 * 3600  # 搜索结果会随曲库更新，缓存时间较短
+SONG_INFO_TTL = 30 * 86400  # 歌曲信息基本不变
+NONE_RESULT_TTL = 3600  # 无结果（NoneResultError）的缓存时间
+
+_MEMORY_CACHE_SIZE = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS response (
+    cache_key TEXT PRIMARY KEY,
+    expire_at REAL NOT NULL,
+    value TEXT
+);
+"""
+
+
+def _encode_value(value) -> str:
+    """将 api 返回值编码为 json 文本，None 表示无结果；封面图片不缓存（由 TempFileManage 按容量管理）"""
+    if value is None:
+        return None
+    if isinstance(value, SongInfo):
+        song_info = value._replace(picBuffer=None)._asdict()
+        return json.dumps({"SongInfo": song_info}, ensure_ascii=False)
+    return json.dumps({"SongSearchInfo": [list(item) for item in value]}, ensure_ascii=False)
+
+
+def _decode_value(text: str):
+    data = json.loads(text)
+    if "SongInfo" in data:
+        song_info = data["SongInfo"]
+        song_info["picBuffer"] = None
+        if isinstance(song_info["trackNumber"], list):
+            song_info["trackNumber"] = tuple(song_info["trackNumber"])
+        return SongInfo(**song_info)
+    return [SongSearchInfo(*item) for item in data["SongSearchInfo"]]
+
+
+def _normalize_param(value):
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value).strip().lower()
+    return value
+
+
+class ResponseCache:
+    """
+    api 结果缓存（内存 LRU + SQLite 持久化）
+
+    键为 提供方 + 接口 + 规范化后的参数，值按接口设定的 TTL 过期
+    """
+
+    def __init__(self, db_path, memory_size: int = _MEMORY_CACHE_SIZE):
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # cache_key -> (expire_at, value text)
+        self._memory_size = memory_size
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute("DELETE FROM response WHERE expire_at < ?", (time.time(),))
+
+    @staticmethod
+    def make_key(provider: str, endpoint: str, params: dict) -> str:
+        params = {key: _normalize_param(value) for key, value in params.items()}
+        return f"{provider}:{endpoint}:" + json.dumps(params, sort_keys=True, ensure_ascii=False)
+
+    def _remember(self, cache_key: str, entry: tuple):
+        self._memory[cache_key] = entry
+        self._memory.move_to_end(cache_key)
+        if len(self._memory) > self._memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, cache_key: str):
+        """返回 (是否命中, 值文本)，值文本为 None 表示缓存的无结果"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(cache_key)
+            if entry is None:
+                row = self._conn.execute(
+                    "SELECT expire_at, value FROM response WHERE cache_key = ?", (cache_key,)).fetchone()
+                if row is None:
+                    return False, None
+                entry = tuple(row)
+            if entry[0] < now:
+                self._memory.pop(cache_key, None)
+                return False, None
+            self._remember(cache_key, entry)
+        return True, entry[1]
+
+    def set(self, cache_key: str, value_text, ttl: float):
+        entry = (time.time() + ttl, value_text)
+        with self._lock:
+            self._remember(cache_key, entry)
+            try:
+                with self._conn:
+                    self._conn.execute("INSERT OR REPLACE INTO response VALUES (?, ?, ?)", (cache_key, *entry))
+            except sqlite3.Error:
+                logger.warning("api 缓存写入失败: %s", cache_key, exc_info=True)
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM response")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(API_CACHE_DB_PATH)
+        return _response_cache
+
+
+def cached_response(endpoint: str, ttl: float, none_result_ttl: float = NONE_RESULT_TTL,
+                    uncached_params: tuple = ()):
+    """
+    缓存 api 方法的返回值，提供方取自实例的 _PROVIDER
+
+    以下划线开头的参数（如内部重试标记）不参与缓存键；NoneResultError 会按 none_result_ttl 缓存，其它异常不缓存
+    uncached_params 中的参数为真时不读写缓存（如 download_pic，图片不应占用 api 缓存）
+    """
+    def outer(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            params = {key: value for key, value in list(bound.arguments.items())[1:] if not key.startswith("_")}
+            if any(params.get(name) for name in uncached_params):
+                return func(self, *args, **kwargs)
+            cache = get_response_cache()
+            cache_key = cache.make_key(self._PROVIDER, endpoint, params)
+
+            is_hit, value_text = cache.get(cache_key)
+            if is_hit:
+                if value_text is None:
+                    raise NoneResultError("缓存的无结果")
+                return _decode_value(value_text)
+
+            try:
+                value = func(self, *args, **kwargs)
+            except NoneResultError:
+                cache.set(cache_key, None, none_result_ttl)
+                raise
+            cache.set(cache_key, _encode_value(value), ttl)
+            return value
+
+        return wrapper
+
+    return outer
@@ -7,17 +7,19 @@ import requests
 import json
 
 from common.api.exceptions import *
+from common.api.http_session import get_session
 from common.api.user_api.user_auth import SpotifyUserAuth
-from common.config import Config
 from common.logger import get_logger
 
 logger = get_logger(__name__)
 
 UserCurrentPlaying = namedtuple("UserCurrentPlaying", ["progress_ms", "artist", "track_name", "is_playing", "track_id",
                                                        "duration", "api_offset"])
+UserQueueTrack = namedtuple("UserQueueTrack", ["track_id", "track_name", "artist", "duration"])
 
 
 class SpotifyUserApi:
+    USER_API_URL = "https://api.spotify.com/v1/"
     USER_PLAYER_URL = "https://api.spotify.com/v1/me/player/"
 
     def __init__(self):
@@ -73,6 +75,54 @@ class SpotifyUserApi:
         )
         return UserCurrentPlaying(progress_ms, artist, track_name, is_playing, track_id, duration, offset)
 
+    def get_user_queue(self) -> list:
+        """获取用户接下来将要播放的歌曲（队列以及当前歌单中的后续歌曲），不包括正在播放的歌曲"""
+        res = self._player_http("get", "queue")
+        if res.status_code != 200:
+            raise UserError("获取播放队列失败")
+        return [self._to_queue_track(item) for item in res.json().get("queue", []) if self._is_track(item)]
+
+    def get_user_playlist_tracks(self) -> list:
+        """获取用户所有歌单中的歌曲（按 track_id 去重）"""
+        tracks = {}
+        for playlist in self._get_all_items(self.USER_API_URL + "me/playlists", limit=50):
+            playlist_items = self._get_all_items(
+                playlist["tracks"]["href"], limit=100,
+                fields="items(track(id,name,type,duration_ms,artists(name))),next")
+            for item in playlist_items:
+                track = item.get("track")
+                if self._is_track(track) and track["id"] not in tracks:
+                    tracks[track["id"]] = self._to_queue_track(track)
+        return list(tracks.values())
+
+    @staticmethod
+    def _is_track(item) -> bool:
+        # 本地文件没有 id，播客单集的 type 为 episode
+        return bool(item) and item.get("type") == "track" and bool(item.get("id"))
+
+    @staticmethod
+    def _to_queue_track(item) -> UserQueueTrack:
+        artist = ", ".join(art["name"] for art in item["artists"])
+        return UserQueueTrack(item["id"], item["name"], artist, item["duration_ms"])
+
+    def _get_all_items(self, url: str, **params) -> list:
+        """按 next 链接翻页，获取列表接口的全部项目"""
+        if not self.is_load:
+            self.load_client_id_secret()
+        items = []
+        while url:
+            try:
+                res = get_session("spotify").get(url, headers=self._get_auth_header(), params=params)
+            except requests.RequestException as e:
+                logger.warning("Spotify 用户 API 请求失败: url=%s", url, exc_info=True)
+                raise NetworkError("spotify用户api连接失败") from e
+            if res.status_code != 200:
+                raise UserError(f"spotify用户api请求失败: {res.status_code}")
+            res_json = res.json()
+            items.extend(res_json["items"])
+            url, params = res_json.get("next"), None  # next 链接已包含分页参数
+        return items
+
     def _get_user_devices(self):
         res_json = self._player_http("get", "devices").json()
         if len(res_json['devices']):
@@ -99,11 +149,9 @@ class SpotifyUserApi:
         if not self.is_load:
             self.load_client_id_secret()
         url = self.USER_PLAYER_URL + url_suffix
-        func = getattr(requests, method)
-        proxy_ip = Config.CommonConfig.ClientConfig.spotify_proxy_ip
-        proxy = {"https": proxy_ip, "http": proxy_ip} if proxy_ip else {}
+        func = getattr(get_session("spotify"), method)
         try:
-            res = func(url, headers=self._get_auth_header(), params=kwargs, proxies=proxy)
+            res = func(url, headers=self._get_auth_header(), params=kwargs)
         except requests.RequestException as e:
             logger.warning("Spotify 用户 API 请求失败: method=%s, endpoint=%s", method, url_suffix, exc_info=True)
             raise NetworkError("spotify用户api连接失败") from e
@@ -13,6 +13,7 @@ import requests
 
 from common.path import TOKEN_PATH, HTML_PATH
 from common.api.exceptions import NoAuthError
+from common.api.http_session import get_session
 from common.config import Config
 
 
@@ -37,8 +38,6 @@ class SpotifyUserAuth:
             self.auth_code = None
             self.client_id = Config.CommonConfig.ClientConfig.client_id
             self.client_secret = Config.CommonConfig.ClientConfig.client_secret
-            self.proxy_ip = Config.CommonConfig.ClientConfig.spotify_proxy_ip
-            self.proxy = {"https": self.proxy_ip, "http": self.proxy_ip} if self.proxy_ip else {}
             auth = base64.b64encode((self.client_id + ":" + self.client_secret).encode("ascii"))
             self.auth_client_header = {'Authorization': 'Basic ' + auth.decode("ascii")}
             if TOKEN_PATH.exists():
@@ -50,8 +49,6 @@ class SpotifyUserAuth:
     def load_client_config(self):
         self.client_id = Config.CommonConfig.ClientConfig.client_id
         self.client_secret = Config.CommonConfig.ClientConfig.client_secret
-        self.proxy_ip = Config.CommonConfig.ClientConfig.spotify_proxy_ip
-        self.proxy = {"https": self.proxy_ip, "http": self.proxy_ip} if self.proxy_ip else {}
 
         auth = base64.b64encode((self.client_id + ":" + self.client_secret).encode("ascii"))
         self.auth_client_header = {'Authorization': 'Basic ' + auth.decode("ascii")}
@@ -131,8 +128,8 @@ class SpotifyUserAuth:
             "redirect_uri": "http://127.0.0.1:8888/callback",
             "grant_type": 'authorization_code'
         }
-        self.user_token_info = requests.post(
-            self.AUTH_TOKEN_URL, data=form, headers=self.auth_client_header, proxies=self.proxy
+        self.user_token_info = get_session("spotify").post(
+            self.AUTH_TOKEN_URL, data=form, headers=self.auth_client_header
         ).json()
         self.user_token_info["expires_at"] = int(time.time()) + self.user_token_info["expires_in"]
         self.save_token()
@@ -143,8 +140,8 @@ class SpotifyUserAuth:
             "grant_type": "refresh_token",
             "refresh_token": refresh_token,
         }
-        self.user_token_info = requests.post(
-            self.AUTH_TOKEN_URL, headers=self.auth_client_header, data=payloads, proxies=self.proxy
+        self.user_token_info = get_session("spotify").post(
+            self.AUTH_TOKEN_URL, headers=self.auth_client_header, data=payloads
         ).json()
         if not self.user_token_info.get("expires_in"):
             # print(self.user_token_info)  # {'error': 'invalid_grant', 'error_description': 'Refresh token revoked'}
@@ -196,7 +193,7 @@ class SpotifyUserAuth:
     def _fetch_client_access_token(self):
         """获取token"""
         payload = {"grant_type": "client_credentials"}
-        response = requests.post(self.AUTH_TOKEN_URL, headers=self.auth_client_header, data=payload, proxies=self.proxy)
+        response = get_session("spotify").post(self.AUTH_TOKEN_URL, headers=self.auth_client_header, data=payload)
         if response.json().get("error") == 'invalid_client':
             raise NotImplementedError("请在设置输入您的client_id以及client_secret")
         response.raise_for_status()
@@ -15,6 +15,8 @@ class Config:
         is_save_position: bool = True
 
         api_offset: int = 0
+        prefetch_count: int = 5  # 预先下载播放队列中后续几首歌曲的歌词，0 为关闭
+        lyric_deadline: float = 1.5  # 播放时查找歌词的时间预算（秒），到时先显示已找到的歌词，0 为不限制
 
         class ClientConfig:
             client_id: str = ""
@@ -28,6 +30,7 @@ class Config:
         class PathConfig:
             temp_file_path: str = ""
             lyrics_file_path: str = ""
+            temp_cache_limit: int = 50 * 1024 * 1024  # 封面缓存大小上限（字节）
 
         class PositionConfig:
             pos_x: int = 0
@@ -0,0 +1,171 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import argparse
+import json
+import threading
+from collections import namedtuple, Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from common.api.exceptions import NetworkError, UserError
+from common.api.rate_limit import RateBudget
+from common.logger import get_logger
+from common.lyric import lyric_download
+from common.lyric.lyric_manage import LyricFileManage, NETWORK_ERROR
+from common.path import BACKFILL_CHECKPOINT_PATH
+from common.persistence import DebouncedJsonWriter
+
+logger = get_logger(__name__)
+
+# 批量任务各提供方的请求频率上限：(次数, 秒)
+DEFAULT_RATE_LIMITS = {
+    "spotify": (5, 1.0),
+    "kugou": (5, 1.0),
+    "cloudmusic": (3, 1.0),
+}
+
+BackfillReport = namedtuple("BackfillReport", ["total", "found", "not_found", "failed", "skipped"])
+
+
+class LyricBackfillJob:
+    """
+    批量补全歌词：no_lyric 中的歌曲以及用户歌单中的歌曲
+
+    进度保存在 checkpoint 文件中，中断后再次运行将从上次的进度继续；全部完成后删除 checkpoint。
+    checkpoint: {"tracks": [[track_id, track_title], ...], "results": {track_id: "found" | "not_found" | "failed" | "skipped"}}
+
+    请求频率由任务自己的各提供方 RateBudget 限制，不影响播放时共享 Session 的请求
+    """
+
+    def __init__(self, user_api=None, *, checkpoint_path: Path = BACKFILL_CHECKPOINT_PATH, max_workers: int = 4,
+                 rate_limits: dict = None):
+        self.user_api = user_api
+        self.checkpoint_path = checkpoint_path
+        self.max_workers = max_workers
+        rate_limits = DEFAULT_RATE_LIMITS if rate_limits is None else rate_limits
+        self.rate_budgets = {provider: RateBudget(limit, period) for provider, (limit, period) in rate_limits.items()}
+        self._stop_event = threading.Event()
+        self._checkpoint = {"tracks": [], "results": {}}
+        self._checkpoint_writer = DebouncedJsonWriter(checkpoint_path, lambda: self._checkpoint, interval=1.0)
+
+    def collect_tracks(self, include_playlists: bool = True) -> list:
+        """收集需要补全的歌曲，返回 [(track_id, track_title), ...]"""
+        lyric_file_manage = LyricFileManage()
+        tracks = {track_id: data["track_title"] for track_id, data in lyric_file_manage.get_not_found_data().items()}
+        if include_playlists and self.user_api is not None:
+            for track in self.user_api.get_user_playlist_tracks():
+                tracks.setdefault(track.track_id, f"{track.track_name} - {track.artist}")
+        return [(track_id, title) for track_id, title in tracks.items()
+                if not lyric_file_manage.is_lyric_exist(track_id)]
+
+    def _load_checkpoint(self) -> bool:
+        if not self.checkpoint_path.exists():
+            return False
+        try:
+            self._checkpoint = json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            logger.warning("补全进度读取失败，重新开始: %s", self.checkpoint_path, exc_info=True)
+            return False
+        return True
+
+    def run(self, *, include_playlists: bool = True, progress_func=None) -> BackfillReport:
+        """
+        运行批量补全（阻塞）
+
+        :param include_playlists: 是否包含用户歌单中的歌曲（仅在新任务时收集）
+        :param progress_func: 进度回调 progress_func(完成数, 总数)，在工作线程中调用
+        :return: BackfillReport
+        """
+        self._stop_event.clear()
+        if self._load_checkpoint():
+            logger.info("继续上次的歌词补全任务: %s", self.checkpoint_path)
+        else:
+            tracks = self.collect_tracks(include_playlists)
+            self._checkpoint = {"tracks": [list(track) for track in tracks], "results": {}}
+            self._checkpoint_writer.mark_dirty()
+
+        results = self._checkpoint["results"]
+        todo = [(track_id, title) for track_id, title in self._checkpoint["tracks"] if track_id not in results]
+        total = len(self._checkpoint["tracks"])
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="lyric_backfill") as executor:
+                for track_id, title in todo:
+                    executor.submit(self._backfill_track, track_id, title, total, progress_func)
+        finally:
+            self._checkpoint_writer.flush()
+
+        report = self.report()
+        if not self._stop_event.is_set():
+            self.checkpoint_path.unlink(missing_ok=True)
+        logger.info("歌词补全完成: %s", report)
+        return report
+
+    def _backfill_track(self, track_id: str, title: str, total: int, progress_func):
+        if self._stop_event.is_set():
+            return
+        lyric_file_manage = LyricFileManage()
+        try:
+            if lyric_file_manage.is_lyric_exist(track_id):
+                result = "skipped"
+            else:
+                download_result = lyric_download.download_lrc_result(title, track_id, rate_budgets=self.rate_budgets)
+                if download_result == lyric_download.FOUND:
+                    result = "found"
+                else:
+                    lyric_file_manage.set_not_found(track_id, title, download_result)
+                    result = "failed" if download_result == NETWORK_ERROR else "not_found"
+        except (NetworkError, UserError):
+            logger.debug("补全歌词失败: %s", title, exc_info=True)
+            lyric_file_manage.set_not_found(track_id, title, NETWORK_ERROR)
+            result = "failed"
+        except Exception:
+            logger.exception("补全歌词出现未知错误: %s", title)
+            result = "failed"
+
+        with self._checkpoint_writer.lock:
+            self._checkpoint["results"][track_id] = result
+            done = len(self._checkpoint["results"])
+        self._checkpoint_writer.mark_dirty()
+        if progress_func is not None:
+            progress_func(done, total)
+
+    def report(self) -> BackfillReport:
+        with self._checkpoint_writer.lock:
+            counter = Counter(self._checkpoint["results"].values())
+            total = len(self._checkpoint["tracks"])
+        return BackfillReport(total, counter["found"], counter["not_found"], counter["failed"], counter["skipped"])
+
+    def stop(self):
+        """停止任务，已提交的歌曲下载完成后返回，进度保留以便下次继续"""
+        self._stop_event.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量补全歌词（no_lyric 以及用户歌单中的歌曲）")
+    parser.add_argument("--no-playlists", action="store_true", help="不包含用户歌单中的歌曲")
+    parser.add_argument("--workers", type=int, default=4, help="并发下载数")
+    parser.add_argument("--restart", action="store_true", help="忽略上次的进度重新开始")
+    args = parser.parse_args()
+
+    if args.restart:
+        BACKFILL_CHECKPOINT_PATH.unlink(missing_ok=True)
+
+    user_api = None
+    if not args.no_playlists:
+        from common.api.user_api import SpotifyUserApi
+        user_api = SpotifyUserApi()
+
+    job = LyricBackfillJob(user_api, max_workers=args.workers)
+    try:
+        report = job.run(progress_func=lambda done, total: print(f"\r{done}/{total}", end="", flush=True))
+    except KeyboardInterrupt:
+        job.stop()
+        print("\n已中断，下次运行将继续")
+        return
+    print(f"\n共 {report.total} 首: 找到 {report.found}, 无歌词 {report.not_found}, "
+          f"失败 {report.failed}, 跳过 {report.skipped}")
+
+
+if __name__ == "__main__":
+    main()
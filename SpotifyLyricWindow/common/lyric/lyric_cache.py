@@ -0,0 +1,150 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""
+解析后歌词的二进制缓存，放在歌词文件夹下的 CACHE_DIR 子文件夹中（<歌词文件名>.cache），
+写入缓存不会改变歌词文件夹本身，不触发歌词文件夹的监听
+
+文件格式（本机字节序）:
+    header: magic, version, 文件类型, 列掩码, 源文件 mtime_ns, 源文件大小, 行数
+    timeline: 行数 * int64
+    每一列（按 TransType 顺序，最后为逐字时间列）:
+        行数 * int32 每行 utf-8 字节长度（-1 代表该时间无歌词）, uint32 字符串表长度, 字符串表
+"""
+import mmap
+import os
+import struct
+from array import array
+from pathlib import Path
+
+from common.lyric.lyric_type import LrcFile, MrcFile, KrcFile, TransType
+from common.logger import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_DIR = ".cache"
+CACHE_SUFFIX = ".cache"
+
+_MAGIC = b"LRCC"
+_VERSION = 1
+_HEADER = struct.Struct("=4sHBBqqI")
+_BLOB_SIZE = struct.Struct("=I")
+_WORD_COLUMN_BIT = 1 << len(TransType)
+
+_FILE_KINDS = [LrcFile, MrcFile, KrcFile]
+_SUFFIX_KINDS = {".lrc": LrcFile, ".mrc": MrcFile, ".krc": KrcFile}
+
+
+def get_cache_path(lyric_path: Path) -> Path:
+    return lyric_path.parent / CACHE_DIR / (lyric_path.name + CACHE_SUFFIX)
+
+
+def _pack_column(column: list) -> bytes:
+    lengths = array('i')
+    texts = []
+    for text in column:
+        if text is None:
+            lengths.append(-1)
+        else:
+            text_bytes = text.encode("utf-8")
+            lengths.append(len(text_bytes))
+            texts.append(text_bytes)
+    blob = b"".join(texts)
+    return lengths.tobytes() + _BLOB_SIZE.pack(len(blob)) + blob
+
+
+def _unpack_column(buffer, pos: int, count: int) -> tuple:
+    lengths = array('i')
+    lengths.frombytes(buffer[pos:pos + count * lengths.itemsize])
+    pos += count * lengths.itemsize
+    blob_size, = _BLOB_SIZE.unpack_from(buffer, pos)
+    pos += _BLOB_SIZE.size
+    blob = buffer[pos:pos + blob_size]
+
+    column = []
+    offset = 0
+    for length in lengths:
+        if length < 0:
+            column.append(None)
+        else:
+            column.append(blob[offset:offset + length].decode("utf-8"))
+            offset += length
+    return column, pos + blob_size
+
+
+def save_lyric_cache(lrc_file: LrcFile, lyric_path: Path):
+    """
+    把解析后的歌词写入 lyric_path 对应的缓存文件，以 lyric_path 当前的 mtime 与大小作为有效性标记
+
+    缓存的类型取决于 lyric_path 的格式而不是 lrc_file 的类型（如 krc 歌词保存为 mrc 文件），
+    读取缓存与重新解析 lyric_path 得到相同类型的对象，只有 krc 文件保留逐字时间
+    """
+    lyric_path = Path(lyric_path)
+    stat = lyric_path.stat()
+    file_kind = _SUFFIX_KINDS.get(lyric_path.suffix, type(lrc_file))
+    timeline, columns, word_column = lrc_file.to_columns()
+    if file_kind is not KrcFile:
+        word_column = None
+
+    mask = 0
+    body = [timeline.tobytes()]
+    for trans in TransType:
+        if trans in columns:
+            mask |= 1 << trans.value
+            body.append(_pack_column(columns[trans]))
+    if word_column is not None:
+        mask |= _WORD_COLUMN_BIT
+        body.append(_pack_column(word_column))
+
+    kind = _FILE_KINDS.index(file_kind) if file_kind in _FILE_KINDS else 0
+    header = _HEADER.pack(_MAGIC, _VERSION, kind, mask, stat.st_mtime_ns, stat.st_size, len(timeline))
+
+    cache_path = get_cache_path(lyric_path)
+    temp_path = cache_path.with_name(cache_path.name + ".tmp")
+    try:
+        cache_path.parent.mkdir(exist_ok=True)
+        temp_path.write_bytes(header + b"".join(body))
+        os.replace(temp_path, cache_path)
+    except OSError:
+        logger.warning("歌词缓存写入失败: %s", cache_path, exc_info=True)
+
+
+def load_lyric_cache(lyric_path: Path):
+    """
+    读取 lyric_path 对应的缓存
+
+    :return: LrcFile（或其子类）, 缓存不存在或已失效（歌词文件 mtime/大小 变化）时返回 None
+    """
+    lyric_path = Path(lyric_path)
+    cache_path = get_cache_path(lyric_path)
+    try:
+        stat = lyric_path.stat()
+        with cache_path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            magic, version, kind, mask, mtime_ns, size, count = _HEADER.unpack_from(buffer, 0)
+            if (magic != _MAGIC or version != _VERSION or kind >= len(_FILE_KINDS) or
+                    mtime_ns != stat.st_mtime_ns or size != stat.st_size):
+                return None
+            pos = _HEADER.size
+            timeline = array('q')
+            timeline.frombytes(buffer[pos:pos + count * timeline.itemsize])
+            pos += count * timeline.itemsize
+
+            columns = {}
+            for trans in TransType:
+                if mask & (1 << trans.value):
+                    columns[trans], pos = _unpack_column(buffer, pos, count)
+            word_column = None
+            if mask & _WORD_COLUMN_BIT:
+                word_column, pos = _unpack_column(buffer, pos, count)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, struct.error, IndexError):
+        logger.warning("歌词缓存读取失败: %s", cache_path, exc_info=True)
+        return None
+
+    return _FILE_KINDS[kind].from_columns(timeline, columns, word_column)
+
+
+def delete_lyric_cache(lyric_path: Path):
+    cache_path = get_cache_path(Path(lyric_path))
+    if cache_path.exists():
+        cache_path.unlink()
@@ -1,74 +1,358 @@
 #!/usr/bin/python
 # -*- coding:utf-8 -*-
-import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 from common.api.lyric_api import CloudMusicWebApi, KugouApi, SpotifyApi
 from common.api.exceptions import NoneResultError, NetworkError, UserError
-from common.song_metadata import compare_song_info
+from common.api.provider_health import get_provider_health, CLOSED
+from common.song_metadata import compare_song_infos
 from common.lyric import LyricFileManage
-from common.path import LRC_PATH
+from common.lyric.lyric_manage import NO_MATCH, NETWORK_ERROR
 
 cloud_api = CloudMusicWebApi()
 kugou_api = KugouApi()
 spotify_api = SpotifyApi()
 
+# 各歌词源并发查询，评分相同时按此顺序优先（熔断中的歌词源排在最后）
+_providers = (kugou_api, cloud_api)
+_executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix="lyric_download")
+# 候选歌曲详细信息单独使用线程池，避免搜索任务等待同一线程池而阻塞
+_info_executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix="lyric_song_info")
 
-def download_lrc(track_name: str, track_id: str, *, min_score=74) -> bool:
-    """download lyric by the track_id. Kugou and Cloud Api were used."""
-    file_name = LRC_PATH / f"{track_id}.mrc"
+FOUND = "found"
 
-    # min_score = 74  # 最低相似度评分
+SEARCH_TOP_K = 3  # 每个歌词源参与评分的搜索结果数
+
+# 搜索候选为 search_song_id + search_song_info 两次请求，超过单次请求 p95 的此倍数仍未返回时发送对冲请求
+_HEDGE_LATENCY_FACTOR = 2
+# 超时返回后在后台继续查找更好歌词的最长时间（秒）
+_BACKGROUND_TIMEOUT = 30
+
+
+def _ordered_providers() -> list:
+    """健康的歌词源优先，不再等待熔断或探测中的歌词源"""
+    return sorted(_providers, key=lambda api: get_provider_health(api._PROVIDER).snapshot().state != CLOSED)
+
+
+def _acquire_rate(api, rate_budgets: dict, cancel_event: threading.Event = None) -> bool:
+    """按歌词源的 RateBudget 等待（批量任务使用，不影响其它请求），查找被取消时返回 False"""
+    rate_budget = rate_budgets.get(api._PROVIDER) if rate_budgets else None
+    return rate_budget is None or rate_budget.acquire(cancel_event)
+
+
+def _search_song_info(api, song_id: str, rate_budgets: dict = None, cancel_event: threading.Event = None):
+    if not _acquire_rate(api, rate_budgets, cancel_event):
+        return None
     try:
-        spotify_info = spotify_api.search_song_info(track_id)
-    except NetworkError as e:
-        raise e
+        return api.search_song_info(song_id)
+    except NoneResultError:
+        return None
+
+
+def _search_candidates(api, track_name: str, cancel_event: threading.Event, top_k: int = SEARCH_TOP_K,
+                       rate_budgets: dict = None) -> list:
+    """
+    在某一歌词源中搜索歌曲，并行获取前 top_k 个结果的详细信息（命中缓存时不发请求）
 
+    :return: [(歌曲 id, 歌曲信息), ...]，按搜索结果排序；部分详细信息获取失败时忽略该结果
+    """
+    if not _acquire_rate(api, rate_budgets, cancel_event):
+        return []
     try:
-        cloud_song_id = cloud_api.search_song_id(track_name)[0].idOrMd5
-        cloud_song_info = cloud_api.search_song_info(cloud_song_id)
-    except (NetworkError, NoneResultError):
-        cloud_song_info = cloud_song_id = None
+        song_ids = [item.idOrMd5 for item in api.search_song_id(track_name)[:top_k]]
+    except NoneResultError:
+        return []
+    if cancel_event.is_set():
+        return []
+    info_futures = [_info_executor.submit(_search_song_info, api, song_id, rate_budgets, cancel_event)
+                    for song_id in song_ids]
+
+    candidates = []
+    network_error = None
+    for song_id, future in zip(song_ids, info_futures):
+        try:
+            song_info = future.result()
+        except NetworkError as e:
+            network_error = e
+            continue
+        if song_info is not None:
+            candidates.append((song_id, song_info))
+    if not candidates and network_error is not None:
+        raise network_error
+    return candidates
+
+
+def _fetch_lyric(api, song_id: str, rate_budgets: dict = None, cancel_event: threading.Event = None):
+    if not _acquire_rate(api, rate_budgets, cancel_event):
+        return None
     try:
-        kugou_song_md5 = kugou_api.search_song_id(track_name)[0].idOrMd5
-        kugou_song_info = kugou_api.search_song_info(kugou_song_md5)
-    except (NetworkError, NoneResultError):
-        kugou_song_info = kugou_song_md5 = None
+        lrc = api.fetch_song_lyric(song_id)
+    except NoneResultError:
+        return None
+    return None if lrc.empty() else lrc
 
-    score_cloud = compare_song_info(cloud_song_info, spotify_info)
-    score_kugou = compare_song_info(kugou_song_info, spotify_info)
-    # print(score_cloud, score_kugou)
 
-    if score_kugou >= score_cloud and score_kugou > min_score:
-        try:
-            lrc = kugou_api.fetch_song_lyric(kugou_song_md5)
-            if not lrc.empty():
-                lrc.save_to_mrc(str(file_name))
-                LyricFileManage().set_track_id_map(track_id, track_name)
-                return True
-        except (NetworkError, NoneResultError):
-            score_kugou = 0
+def download_lrc(track_name: str, track_id: str, *, min_score=74, deadline: float = None) -> bool:
+    """download lyric by the track_id, return whether the lyric was found. See download_lrc_result."""
+    return download_lrc_result(track_name, track_id, min_score=min_score, deadline=deadline) == FOUND
 
-    if score_cloud >= score_kugou and score_cloud > min_score:
-        try:
-            lrc = cloud_api.fetch_song_lyric(cloud_song_id)
-            if not lrc.empty():
-                lrc.save_to_mrc(str(file_name))
-                LyricFileManage().set_track_id_map(track_id, track_name)
-                return True
-        except NetworkError:
-            pass
+
+def download_lrc_result(track_name: str, track_id: str, *, min_score=74, deadline: float = None,
+                        rate_budgets: dict = None) -> str:
+    """
+    download lyric by the track_id. Kugou and Cloud Api were used.
+
+    The providers are searched concurrently and the top SEARCH_TOP_K results of each provider are scored,
+    the best one per provider being its candidate (a candidate with an empty lyric falls back to the next one).
+    A candidate is accepted as soon as it passes min_score and every provider with a higher priority has
+    answered, the remaining lookups are cancelled.
+
+    With a deadline (seconds) the lookup is latency-budgeted: a provider that has not answered after its usual
+    latency gets one hedged duplicate request, and once the deadline passes the best lyric downloaded so far is
+    accepted without waiting for higher priority providers or slower downloads. If nothing has been downloaded
+    yet, the lookup returns at the deadline without a lyric. In both cases the unfinished lookups continue in the
+    background, a better scoring lyric found later replaces the saved one and is announced through
+    lyric_data_notifier.lyric_updated.
+
+    rate_budgets ({provider: RateBudget}) limits the requests of this lookup per provider, for batch jobs.
+
+    :return: FOUND, NO_MATCH if every provider answered without a usable lyric (or nothing was found before the
+             deadline), or NETWORK_ERROR if nothing was found and some provider request failed
+    """
+    lookup = _LyricLookup(track_name, track_id, min_score, hedge=deadline is not None, rate_budgets=rate_budgets)
+    try:
+        _acquire_rate(spotify_api, rate_budgets)
+        spotify_info = spotify_api.search_song_info(track_id)
+    except NetworkError as e:
+        lookup.cancel()
+        raise e
+    lookup.spotify_info = spotify_info
+
+    end_time = None if deadline is None else time.monotonic() + deadline
+    in_background = False
+    try:
+        while True:
+            lookup.collect_searches()
+            lookup.send_hedges()
+            is_expired = end_time is not None and time.monotonic() >= end_time
+            accepted = lookup.try_accept(ignore_priority=is_expired)
+            if accepted is not None:
+                lookup.save(*accepted)
+                if is_expired and lookup.has_pending_searches():
+                    # 已超时先使用当前结果，其余歌词源在后台继续查找
+                    in_background = True
+                    threading.Thread(target=_improve_in_background, args=(lookup,), daemon=True).start()
+                return FOUND
+            if is_expired and lookup.has_pending_searches():
+                # 已超时仍未找到，不再等待，其余歌词源在后台继续查找
+                in_background = True
+                threading.Thread(target=_improve_in_background, args=(lookup,), daemon=True).start()
+                return NETWORK_ERROR if lookup.network_failed else NO_MATCH
+
+            pending = lookup.pending_futures()
+            if not pending:
+                break
+            timeout = lookup.next_hedge_delay()
+            if end_time is not None and not is_expired:
+                remain = end_time - time.monotonic()
+                timeout = remain if timeout is None else min(timeout, remain)
+            wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+    finally:
+        if not in_background:
+            lookup.cancel()
 
     # spotify 歌词 API 暂不支持
     # try:
     #     lrc = spotify_api.fetch_song_lyric(track_id)
     #     if not lrc.empty():
-    #         lrc.save_to_mrc(str(file_name))
+    #         LyricFileManage().save_lyric_file(track_id, lrc)
     #         LyricFileManage().set_track_id_map(track_id, track_name)
     #         return True
     # except (NetworkError, UserError):
     #     pass
 
-    return False
+    return NETWORK_ERROR if lookup.network_failed else NO_MATCH
+
+
+def _improve_in_background(lookup):
+    """
+    超时返回后继续等待其余歌词源，每找到评分更高的歌词就替换并通知
+
+    直到没有可能优于已保存歌词的查找（save 会取消评分不高于已保存歌词的候选），或超过 _BACKGROUND_TIMEOUT
+    """
+    end_time = time.monotonic() + _BACKGROUND_TIMEOUT
+    try:
+        while True:
+            lookup.collect_searches()
+            accepted = lookup.try_accept(ignore_priority=False)
+            if accepted is not None:
+                lookup.save(*accepted)
+                LyricFileManage().notifier().lyric_updated.emit(lookup.track_id)
+                continue
+            pending = lookup.pending_futures()
+            remain = end_time - time.monotonic()
+            if not pending or remain <= 0:
+                return
+            wait(pending, timeout=remain, return_when=FIRST_COMPLETED)
+    finally:
+        lookup.cancel()
+
+
+class _LyricLookup:
+    """一次歌词查找的状态：各歌词源的搜索（含对冲请求）、评分以及歌词下载"""
+
+    def __init__(self, track_name: str, track_id: str, min_score: float, hedge: bool, rate_budgets: dict = None):
+        self.track_name = track_name
+        self.track_id = track_id
+        self.min_score = min_score
+        self.hedge = hedge
+        self.rate_budgets = rate_budgets  # provider -> RateBudget，批量任务的请求频率限制
+        self.spotify_info = None
+        self.providers = _ordered_providers()
+        self.cancel_event = threading.Event()
+        self.network_failed = False  # 有歌词源请求失败时，未找到歌词不代表歌词不存在
+        self.scores = {}  # provider index -> 当前候选的评分
+        self.candidates = {}  # provider index -> 达到评分、尚未尝试的 [(评分, 歌曲 id)]，按评分从高到低
+        self.fetch_futures = {}  # 达到评分的候选提前开始下载歌词
+        self.saved_key = None  # 已保存歌词的 (评分, -优先级)，之后只接受更好的候选
+        self._search_start = time.monotonic()
+        # provider index -> [原始请求, 对冲请求]
+        self.search_futures = [[self._submit_search(api)] for api in self.providers]
+
+    def _submit_search(self, api):
+        return _executor.submit(_search_candidates, api, self.track_name, self.cancel_event,
+                                rate_budgets=self.rate_budgets)
+
+    def _candidate_key(self, index: int) -> tuple:
+        return self.scores[index], -index
+
+    def _search_result(self, index: int):
+        """
+        歌词源的搜索结果：任一请求成功即采用；全部失败时返回 (True, []) 并标记网络错误
+
+        :return: (是否已返回, 候选列表)
+        """
+        futures = self.search_futures[index]
+        for future in futures:
+            if future.done() and future.exception() is None:
+                return True, future.result()
+        if all(future.done() for future in futures):
+            self.network_failed = True
+            return True, []
+        return False, []
+
+    def collect_searches(self):
+        """为已返回的歌词源的全部候选评分，最佳候选开始下载歌词"""
+        for index in range(len(self.providers)):
+            if index in self.scores:
+                continue
+            is_done, candidates = self._search_result(index)
+            if not is_done:
+                continue
+            scores = compare_song_infos([song_info for _, song_info in candidates], self.spotify_info)
+            scored = [(score, song_id) for score, (song_id, _) in zip(scores, candidates)]
+            scored.sort(key=lambda item: item[0], reverse=True)  # 同分保持搜索排序
+            self.scores[index] = scored[0][0] if scored else 0
+            self.candidates[index] = [item for item in scored if item[0] > self.min_score]
+            self._fetch_next_candidate(index)
+
+    def _fetch_next_candidate(self, index: int) -> bool:
+        """下载歌词源下一个候选的歌词（只考虑优于已保存歌词的候选），没有候选时返回 False"""
+        candidates = self.candidates.get(index)
+        while candidates:
+            score, song_id = candidates.pop(0)
+            self.scores[index] = score
+            if self.saved_key is None or self._candidate_key(index) > self.saved_key:
+                self.fetch_futures[index] = _executor.submit(_fetch_lyric, self.providers[index], song_id,
+                                                             self.rate_budgets, self.cancel_event)
+                return True
+        return False
+
+    def _hedge_latency(self, index: int):
+        p95 = get_provider_health(self.providers[index]._PROVIDER).percentile(95)
+        return None if p95 is None else p95 * _HEDGE_LATENCY_FACTOR
+
+    def send_hedges(self):
+        """歌词源超过平常的延迟仍未返回时，发送一次重复的搜索请求"""
+        if not self.hedge:
+            return
+        elapsed = time.monotonic() - self._search_start
+        for index, futures in enumerate(self.search_futures):
+            if index in self.scores or len(futures) > 1:
+                continue
+            hedge_latency = self._hedge_latency(index)
+            if hedge_latency is not None and elapsed >= hedge_latency:
+                futures.append(self._submit_search(self.providers[index]))
+
+    def next_hedge_delay(self):
+        """距下一次需要发送对冲请求的秒数，没有时返回 None"""
+        if not self.hedge:
+            return None
+        elapsed = time.monotonic() - self._search_start
+        delays = [self._hedge_latency(index) for index, futures in enumerate(self.search_futures)
+                  if index not in self.scores and len(futures) == 1]
+        delays = [max(delay - elapsed, 0) for delay in delays if delay is not None]
+        return min(delays) if delays else None
+
+    def try_accept(self, ignore_priority: bool):
+        """
+        选出可采用的歌词
+
+        :param ignore_priority: 是否不再等待优先级更高的歌词源以及未下载完的歌词（超时后），只在已下载完的歌词中选择
+        :return: (provider index, 歌词)，暂无可采用的歌词时返回 None
+        """
+        while self.fetch_futures:
+            if ignore_priority:
+                done = [index for index, future in self.fetch_futures.items() if future.done()]
+                if not done:
+                    return None
+                best = max(done, key=self._candidate_key)
+            else:
+                best = max(self.fetch_futures, key=self._candidate_key)
+                if any(i not in self.scores for i in range(best)):
+                    return None  # 优先级更高的歌词源仍未返回
+                if not self.fetch_futures[best].done():
+                    return None
+            future = self.fetch_futures[best]
+            del self.fetch_futures[best]
+            try:
+                lrc = future.result()
+            except NetworkError:
+                self.network_failed = True
+                lrc = None
+            if lrc is not None:
+                return best, lrc
+            self._fetch_next_candidate(best)  # 歌词为空时尝试该歌词源的下一个候选
+        return None
+
+    def save(self, index: int, lrc):
+        self.saved_key = self._candidate_key(index)
+        # 只保留评分更高的候选，继续在后台改进
+        for other in [i for i in self.fetch_futures if self._candidate_key(i) <= self.saved_key]:
+            self.fetch_futures.pop(other).cancel()
+            self._fetch_next_candidate(other)
+        lyric_file_manage = LyricFileManage()
+        lyric_file_manage.save_lyric_file(self.track_id, lrc)
+        lyric_file_manage.set_track_id_map(self.track_id, self.track_name)
+
+    def has_pending_searches(self) -> bool:
+        return len(self.scores) < len(self.providers) or bool(self.fetch_futures)
+
+    def pending_futures(self) -> list:
+        pending = [future for index, futures in enumerate(self.search_futures) if index not in self.scores
+                   for future in futures if not future.done()]
+        pending += [future for future in self.fetch_futures.values() if not future.done()]
+        return pending
+
+    def cancel(self):
+        self.cancel_event.set()
+        for futures in self.search_futures:
+            for future in futures:
+                future.cancel()
+        for future in self.fetch_futures.values():
+            future.cancel()
 
 
 if __name__ == "__main__":
@@ -79,7 +363,3 @@ if __name__ == "__main__":
     # download_lrc("Void - DUSTCELL", "5QnnLbeNiTPQn68agY3i6D")
     # download_lrc("蜜蜂 - DUSTCELL", "6oDv2ylQf1fiqOMp7UWcV8")
     pass
-
-
-
-
@@ -1,32 +1,63 @@
 #!/usr/bin/python
 # -*- coding:utf-8 -*-
-import json
+import os
 import time
 import weakref
+from collections import namedtuple
 
-from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
 
-from common.path import LRC_PATH, LYRIC_DATA_FILE_PATH
+from common.path import LRC_PATH, LYRIC_DATA_FILE_PATH, LYRIC_DB_PATH
 from common.lyric.lyric_type import LrcFile, MrcFile, KrcFile
+from common.lyric.lyric_cache import load_lyric_cache, save_lyric_cache, delete_lyric_cache
+from common.lyric.lyric_store import LyricDataStore
 
 
 class LyricDataNotifier(QObject):
     changed = pyqtSignal()
+    lyric_updated = pyqtSignal(str)  # 歌曲的歌词文件被替换（如后台找到评分更高的歌词），参数为 track_id
 
 
 lyric_data_notifier = LyricDataNotifier()
 
+LyricFileIndex = namedtuple("LyricFileIndex", ["path", "suffix", "mtime"])
+
+LYRIC_FILE_CLASS = {".mrc": MrcFile, ".lrc": LrcFile, ".krc": KrcFile}
+
+WATCH_DEBOUNCE = 500  # 歌词文件夹变化后等待的时间（ms），合并连续的变化
+
+# 歌词查找失败原因
+NO_MATCH = "no_match"  # 歌词源均已返回，但没有匹配的歌词
+NETWORK_ERROR = "network"  # 部分歌词源请求失败，结果不确定
+
+# 失败原因 -> (首次重试间隔, 最大重试间隔, 最多尝试次数)，重试间隔随连续失败次数翻倍
+RETRY_POLICY = {
+    NO_MATCH: (24 * 3600, 16 * 24 * 3600, 6),
+    NETWORK_ERROR: (5 * 60, 6 * 3600, None),
+}
+
+
+def next_retry_time(reason: str, attempts: int, now: int):
+    """
+    计算下次自动重试的时间
+
+    :param reason: 失败原因
+    :param attempts: 连续失败次数（含本次）
+    :param now: 本次失败的时间
+    :return: 下次重试的时间戳，达到最多尝试次数时返回 None（不再自动重试）
+    """
+    base_delay, max_delay, max_attempts = RETRY_POLICY[reason]
+    if max_attempts is not None and attempts >= max_attempts:
+        return None
+    return now + min(base_delay * 2 ** (attempts - 1), max_delay)
+
 
 class LyricFileManage:
     """
     歌词管理类（单例）
 
-    lyric.json 文件格式
-    {
-    "offset": {}
-    "no_lyric":{}
-    "id2title":{}
-    }
+    歌词数据（偏移、未找到歌词记录、track_id 与标题的对应）存储于 lyric.db，
+    首次启动时从旧版 lyric.json 迁移，见 LyricDataStore
     """
     _instance = None
     _is_init = False
@@ -40,117 +71,168 @@ class LyricFileManage:
 
     def __init__(self):
         if not self._is_init:
-            with LYRIC_DATA_FILE_PATH.open(encoding="utf-8") as f:
-                self.lyric_data_json = json.load(f)
-            keys = ["offset", "no_lyric", "id2title"]
-
-            for base_key in keys:
-                if base_key not in self.lyric_data_json:
-                    self.lyric_data_json[base_key] = {}
+            self.lyric_data_store = LyricDataStore(LYRIC_DB_PATH, LYRIC_DATA_FILE_PATH)
 
-            self.lyric_data_json["title2id"] = {}
-            for id_, title in self.lyric_data_json["id2title"].items():
-                self.lyric_data_json["title2id"][title] = id_
+            self.lyric_index = {}  # track_id -> LyricFileIndex
+            self._indexed_names = set()  # 建立索引时歌词文件夹中的歌词文件名
+            self.refresh_index()
+            self._watcher = None
+            self._refresh_timer = None
 
             self._is_init = True
 
     def __del__(self):
-        self.save_json()
+        self.lyric_data_store.close()
 
     @staticmethod
-    def is_lyric_exist(track_id: str) -> bool:
-        lrc_path = LRC_PATH / (track_id + '.mrc')
-        return lrc_path.exists()
-
-    @staticmethod
-    def read_lyric_file(track_id: str):
-        for file in LRC_PATH.iterdir():
-            if file.name.startswith(track_id):
-                if file.suffix == ".mrc":
-                    return MrcFile(file)
-                elif file.suffix == ".lrc":
-                    return LrcFile(file)
-                elif file.suffix == ".krc":
-                    return KrcFile(file)
-        else:
+    def _lyric_file_names() -> set:
+        return {entry.name for entry in os.scandir(LRC_PATH) if os.path.splitext(entry.name)[1] in LYRIC_FILE_CLASS}
+
+    def refresh_index(self):
+        """扫描歌词文件夹，重建 track_id 到歌词文件的索引，同一 track_id 优先使用 mrc 文件"""
+        lyric_index = {}
+        names = self._lyric_file_names()
+        for name in names:
+            file = LRC_PATH / name
+            track_id = name[:-len(file.suffix)]
+            if track_id in lyric_index and lyric_index[track_id].suffix == ".mrc":
+                continue
+            try:
+                lyric_index[track_id] = LyricFileIndex(file, file.suffix, file.stat().st_mtime_ns)
+            except FileNotFoundError:  # 扫描期间被删除
+                continue
+        self.lyric_index = lyric_index
+        self._indexed_names = names
+
+    def watch_lyric_dir(self):
+        """
+        监听歌词文件夹，外部增删歌词文件时刷新索引（需要 Qt 事件循环）
+
+        变化在 WATCH_DEBOUNCE 内合并为一次检查，只有歌词文件增删时才重建索引（lyric.db 等文件的变化不重建）
+        """
+        if self._watcher is None:
+            self._refresh_timer = QTimer()
+            self._refresh_timer.setSingleShot(True)
+            self._refresh_timer.setInterval(WATCH_DEBOUNCE)
+            self._refresh_timer.timeout.connect(self._refresh_if_changed)
+            self._watcher = QFileSystemWatcher([str(LRC_PATH)])
+            self._watcher.directoryChanged.connect(self._lyric_dir_changed)
+
+    def _lyric_dir_changed(self, _path: str):
+        self._refresh_timer.start()  # 重新计时
+
+    def _refresh_if_changed(self):
+        if self._lyric_file_names() != self._indexed_names:
+            self.refresh_index()
+
+    def is_lyric_exist(self, track_id: str) -> bool:
+        index = self.lyric_index.get(track_id)
+        return index is not None and index.suffix == ".mrc"
+
+    def read_lyric_file(self, track_id: str):
+        index = self.lyric_index.get(track_id)
+        if index is None:
             return LrcFile()
+        lrc_file = load_lyric_cache(index.path)
+        if lrc_file is None:
+            try:
+                lrc_file = LYRIC_FILE_CLASS[index.suffix](index.path)
+            except FileNotFoundError:  # 文件已在外部被删除
+                self.lyric_index.pop(track_id, None)
+                return LrcFile()
+            save_lyric_cache(lrc_file, index.path)
+        return lrc_file
 
     def save_lyric_file(self, track_id: str, lrc_file: LrcFile):
-        lrc_file.save_to_mrc(LRC_PATH / (track_id + ".mrc"))
-        if track_id in self.lyric_data_json["no_lyric"]:
-            title = self.lyric_data_json["no_lyric"][track_id]["track_title"]
-            self.lyric_data_json["no_lyric"].pop(track_id)
-            self.lyric_data_json["id2title"][track_id] = title
-            self.lyric_data_json["title2id"][title] = track_id
-            self.save_json()
+        lrc_path = LRC_PATH / (track_id + ".mrc")
+        lrc_file.save_to_mrc(lrc_path)
+        save_lyric_cache(lrc_file, lrc_path)
+        self.lyric_index[track_id] = LyricFileIndex(lrc_path, ".mrc", lrc_path.stat().st_mtime_ns)
+        self._indexed_names.add(lrc_path.name)  # 自身的写入不需要重建索引
+        not_found_data = self.lyric_data_store.get_no_lyric(track_id)
+        if not_found_data:
+            self.lyric_data_store.delete_no_lyric(track_id)
+            self.lyric_data_store.set_title(track_id, not_found_data["track_title"])
 
     def delete_lyric_file(self, track_id: str):
-        if track_id in self.lyric_data_json["id2title"]:
-            title = self.lyric_data_json["id2title"][track_id]
-            self.lyric_data_json["id2title"].pop(track_id)
-            self.lyric_data_json["title2id"].pop(title)
+        if self.lyric_data_store.get_title(track_id) is not None:
+            self.lyric_data_store.delete_title(track_id)
             lrc_path = LRC_PATH / (track_id + ".mrc")
             if lrc_path.exists():
                 lrc_path.unlink()
+            delete_lyric_cache(lrc_path)
+            self._remove_index(track_id, lrc_path)
+
+        self.lyric_data_store.delete_no_lyric(track_id)
 
-        if track_id in self.lyric_data_json["no_lyric"]:
-            self.lyric_data_json["no_lyric"].pop(track_id)
-            self.save_json()
+    def _remove_index(self, track_id: str, lrc_path):
+        self._indexed_names.discard(lrc_path.name)
+        index = self.lyric_index.get(track_id)
+        if index is not None and index.path == lrc_path:
+            self.lyric_index.pop(track_id)
 
     def get_not_found(self, track_id: str) -> dict:
-        return self.lyric_data_json["no_lyric"].get(track_id, None)
+        return self.lyric_data_store.get_no_lyric(track_id)
 
-    def set_not_found(self, track_id: str, track_title: str):
+    def set_not_found(self, track_id: str, track_title: str, reason: str = NO_MATCH):
+        """
+        记录歌曲未找到歌词，track_title 为空时撤去记录
+
+        同一原因连续失败时累加次数并按 RETRY_POLICY 推迟下次自动重试
+        """
         lrc_path = LRC_PATH / (track_id + ".mrc")
         if lrc_path.exists():
             lrc_path.unlink()
+        delete_lyric_cache(lrc_path)
+        self._remove_index(track_id, lrc_path)
 
         is_changed = False
         if not track_title:
-            self.lyric_data_json["no_lyric"].pop(track_id)
+            self.lyric_data_store.delete_no_lyric(track_id)
         else:
-            is_changed = (track_id not in self.lyric_data_json["no_lyric"] and
-                          track_id not in self.lyric_data_json["id2title"])
-            self.lyric_data_json["no_lyric"][track_id] = {"track_title": track_title, "last_time": int(time.time())}
-        self.save_json()
+            found_data = self.lyric_data_store.get_no_lyric(track_id)
+            is_changed = found_data is None and self.lyric_data_store.get_title(track_id) is None
+            attempts = found_data["attempts"] + 1 if found_data and found_data["reason"] == reason else 1
+            now = int(time.time())
+            self.lyric_data_store.set_no_lyric(track_id, track_title, now, attempts=attempts, reason=reason,
+                                               next_time=next_retry_time(reason, attempts, now))
         if is_changed:
             self._notify_changed()
 
+    def is_retry_due(self, track_id: str) -> bool:
+        """歌曲是否需要（再次）自动查找歌词：没有失败记录，或已到达重试时间"""
+        found_data = self.lyric_data_store.get_no_lyric(track_id)
+        if found_data is None:
+            return True
+        return found_data["next_time"] is not None and found_data["next_time"] <= int(time.time())
+
+    def get_due_retries(self, limit: int = -1) -> list:
+        """到达重试时间的歌曲，返回 [(track_id, track_title), ...]"""
+        return self.lyric_data_store.get_due_no_lyric(int(time.time()), limit)
+
     def get_id(self, track_title: str):
-        return self.lyric_data_json["title2id"].get(track_title)
+        return self.lyric_data_store.get_id(track_title)
 
     def get_title(self, track_id: str) -> str:
-        return self.lyric_data_json["id2title"].get(track_id)
+        return self.lyric_data_store.get_title(track_id)
 
     def set_track_id_map(self, track_id: str, title: str):
-        is_changed = track_id not in self.lyric_data_json["id2title"]
-        self.lyric_data_json["id2title"][track_id] = title
-        self.lyric_data_json["title2id"][title] = track_id
-        self.save_json()
+        is_changed = self.lyric_data_store.get_title(track_id) is None
+        self.lyric_data_store.set_title(track_id, title)
         if is_changed:
             self._notify_changed()
 
     def get_offset_file(self, track_id: str) -> int:
-        return self.lyric_data_json["offset"].get(track_id, 0)
+        return self.lyric_data_store.get_offset(track_id)
 
     def set_offset_file(self, track_id: str, offset: int):
-        self.lyric_data_json["offset"][track_id] = offset
-        self.save_json()
+        self.lyric_data_store.set_offset(track_id, offset)
 
     def get_tracks_id_data(self) -> dict:
-        return self.lyric_data_json["id2title"]
+        return self.lyric_data_store.get_all_titles()
 
     def get_not_found_data(self) -> dict:
-        return self.lyric_data_json["no_lyric"]
-
-    def save_json(self):
-        with LYRIC_DATA_FILE_PATH.open("w", encoding="utf-8") as f:
-            keys = ["offset", "no_lyric", "id2title"]
-            save_json = {}
-            for base_key in keys:
-                save_json[base_key] = self.lyric_data_json[base_key]
-
-            f.write(json.dumps(save_json, indent=4, ensure_ascii=False))
+        return self.lyric_data_store.get_all_no_lyric()
 
     @staticmethod
     def notifier() -> LyricDataNotifier:
@@ -0,0 +1,103 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from common.api.exceptions import NetworkError, NoneResultError, UserError
+from common.api.rate_limit import RateBudget
+from common.config import Config
+from common.logger import get_logger
+from common.lyric import lyric_download
+from common.lyric.lyric_manage import LyricFileManage, NETWORK_ERROR
+from common.temp_manage import TempFileManage
+
+logger = get_logger(__name__)
+
+
+class LyricPrefetcher:
+    """
+    后台预先下载播放队列中后续歌曲的歌词与封面
+
+    下载并发数由 max_workers 限制，下载次数由 RateBudget 限制，超出预算的歌曲留待下次预取
+    """
+
+    def __init__(self, user_api, *, max_workers: int = 2, rate_limit: int = 10, rate_period: float = 60):
+        self.user_api = user_api
+        self.rate_budget = RateBudget(rate_limit, rate_period)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lyric_prefetch")
+        self._queue_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lyric_prefetch_queue")
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def prefetch_user_queue(self):
+        """在后台获取用户播放队列并预取，不阻塞调用线程"""
+        if Config.CommonConfig.prefetch_count <= 0:
+            return
+        self._queue_executor.submit(self._prefetch_user_queue)
+
+    def _prefetch_user_queue(self):
+        try:
+            queue = self.user_api.get_user_queue()
+        except (NetworkError, UserError):
+            logger.debug("获取播放队列失败，跳过预取", exc_info=True)
+            return
+        self.prefetch(queue[:Config.CommonConfig.prefetch_count])
+
+    @staticmethod
+    def _need_lyric(track_id: str) -> bool:
+        """没有歌词，且没有失败记录或已到达重试时间"""
+        lyric_file_manage = LyricFileManage()
+        return not lyric_file_manage.is_lyric_exist(track_id) and lyric_file_manage.is_retry_due(track_id)
+
+    def prefetch(self, tracks: list):
+        """
+        提交歌曲的预取任务
+
+        :param tracks: UserQueueTrack 列表，按播放顺序
+        :return: 实际提交的 track_id 列表
+        """
+        submitted = []
+        for track in tracks:
+            need_lyric = self._need_lyric(track.track_id)
+            need_cover = not TempFileManage().has_temp_image(track.track_id)
+            if not (need_lyric or need_cover):
+                continue
+            with self._lock:
+                if track.track_id in self._in_flight:
+                    continue
+                if not self.rate_budget.try_acquire():
+                    break
+                self._in_flight.add(track.track_id)
+            self._executor.submit(self._prefetch_track, track, need_lyric, need_cover)
+            submitted.append(track.track_id)
+        return submitted
+
+    def _prefetch_track(self, track, need_lyric: bool, need_cover: bool):
+        track_title = f"{track.track_name} - {track.artist}"
+        try:
+            if need_lyric:
+                self._prefetch_lyric(track.track_id, track_title)
+            if need_cover:
+                song_info = lyric_download.spotify_api.search_song_info(track.track_id, download_pic=True, pic_size=64)
+                TempFileManage().save_temp_image(track.track_id, song_info.picBuffer)
+        except (NetworkError, NoneResultError, UserError):
+            logger.debug("预取失败: %s", track_title, exc_info=True)
+        except Exception:
+            logger.exception("预取出现未知错误: %s", track_title)
+        finally:
+            with self._lock:
+                self._in_flight.discard(track.track_id)
+
+    @staticmethod
+    def _prefetch_lyric(track_id: str, track_title: str):
+        try:
+            result = lyric_download.download_lrc_result(track_title, track_id)
+        except NetworkError:
+            result = NETWORK_ERROR
+        if result != lyric_download.FOUND:
+            LyricFileManage().set_not_found(track_id, track_title, result)
+        logger.debug("预取歌词完成: %s (%s)", track_title, result)
+
+    def close(self):
+        self._queue_executor.shutdown(wait=False, cancel_futures=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,102 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import queue
+import threading
+import time
+
+from common.api.exceptions import NetworkError, UserError
+from common.api.rate_limit import RateBudget
+from common.logger import get_logger
+from common.lyric import lyric_download
+from common.lyric.lyric_manage import LyricFileManage, NETWORK_ERROR
+
+logger = get_logger(__name__)
+
+
+class LyricRetryScheduler:
+    """
+    无歌词记录的后台重试队列
+
+    每隔 check_interval 秒取出已到达重试时间（见 lyric_manage.RETRY_POLICY）的记录重新查找歌词，
+    播放路径只通过 request 将当前歌曲提前加入队列，不在播放时等待重试结果。
+    找到歌词后调用 found_func(track_id)（在后台线程中调用）。
+    """
+
+    def __init__(self, *, found_func=None, check_interval: float = 300, batch_size: int = 5,
+                 rate_limit: int = 10, rate_period: float = 60):
+        self.found_func = found_func
+        self.check_interval = check_interval
+        self.batch_size = batch_size
+        self.rate_budget = RateBudget(rate_limit, rate_period)
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lyric_retry", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def request(self, track_id: str, track_title: str) -> bool:
+        """
+        将歌曲加入重试队列
+
+        :return: 是否加入队列（未到达重试时间或已在队列中时不加入）
+        """
+        if not LyricFileManage().is_retry_due(track_id):
+            return False
+        with self._lock:
+            if track_id in self._queued:
+                return False
+            self._queued.add(track_id)
+        self._queue.put((track_id, track_title))
+        return True
+
+    def _enqueue_due(self):
+        for track_id, track_title in LyricFileManage().get_due_retries(self.batch_size):
+            self.request(track_id, track_title)
+
+    def _run(self):
+        next_scan = time.monotonic()
+        while not self._stop_event.is_set():
+            # 按时间而非队列空闲触发检查，持续的 request 不会使到期记录得不到重试
+            now = time.monotonic()
+            if now >= next_scan:
+                self._enqueue_due()
+                next_scan = now + self.check_interval
+            try:
+                item = self._queue.get(timeout=next_scan - now)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+            if not self.rate_budget.acquire(self._stop_event):
+                break
+            self._retry(*item)
+
+    def _retry(self, track_id: str, track_title: str):
+        with self._lock:
+            self._queued.discard(track_id)
+        lyric_file_manage = LyricFileManage()
+        if lyric_file_manage.is_lyric_exist(track_id) or not lyric_file_manage.is_retry_due(track_id):
+            return
+        try:
+            result = lyric_download.download_lrc_result(track_title, track_id)
+        except (NetworkError, UserError):
+            logger.debug("重试查找歌词失败: %s", track_title, exc_info=True)
+            result = NETWORK_ERROR
+        except Exception:
+            # 同样按网络错误推迟重试，避免每轮检查都重复出错
+            logger.exception("重试查找歌词出现未知错误: %s", track_title)
+            result = NETWORK_ERROR
+
+        if result == lyric_download.FOUND:
+            logger.info("重试找到歌词: %s", track_title)
+            if self.found_func is not None:
+                self.found_func(track_id)
+        else:
+            lyric_file_manage.set_not_found(track_id, track_title, result)
+
+    def close(self):
+        self._stop_event.set()
+        self._queue.put(None)
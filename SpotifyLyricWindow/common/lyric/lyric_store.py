@@ -0,0 +1,158 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+from common.logger import get_logger
+
+logger = get_logger(__name__)
+
+_SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS track_offset (
+    track_id TEXT PRIMARY KEY,
+    offset_ms INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS no_lyric (
+    track_id TEXT PRIMARY KEY,
+    track_title TEXT NOT NULL,
+    last_time INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS track_title (
+    track_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS track_title_title_index ON track_title (title);
+"""
+
+
+class LyricDataStore:
+    """
+    歌词数据的 SQLite 存储，替代原先整体重写的 lyric.json
+
+    表：
+    track_offset(track_id, offset_ms)  歌词偏移
+    no_lyric(track_id, track_title, last_time, attempts, reason, next_time)
+        未找到歌词的记录：连续失败次数、失败原因以及下次自动重试的时间（NULL 为不再自动重试）
+    track_title(track_id, title)  track_id 与 "歌名 - 歌手" 的对应
+    """
+
+    def __init__(self, db_path: Path, json_path: Path = None):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        # WAL 下每次提交只追加日志，不再同步整个数据库文件
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < 1 and json_path is not None and json_path.exists():
+                self._migrate_json(json_path)
+            if version < 2:
+                self._migrate_retry_columns()
+            if version < _SCHEMA_VERSION:
+                self._conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    def _migrate_json(self, json_path: Path):
+        """从旧版 lyric.json 导入数据（仅在数据库新建时进行一次）"""
+        try:
+            with json_path.open(encoding="utf-8") as f:
+                lyric_data_json = json.load(f)
+        except (OSError, ValueError):
+            logger.warning("lyric.json 读取失败，跳过迁移: %s", json_path, exc_info=True)
+            return
+
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO track_offset VALUES (?, ?)",
+            lyric_data_json.get("offset", {}).items())
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO no_lyric (track_id, track_title, last_time) VALUES (?, ?, ?)",
+            ((track_id, data["track_title"], data["last_time"])
+             for track_id, data in lyric_data_json.get("no_lyric", {}).items()))
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO track_title VALUES (?, ?)",
+            lyric_data_json.get("id2title", {}).items())
+        logger.info("已从 lyric.json 迁移歌词数据: %s", json_path)
+
+    def _migrate_retry_columns(self):
+        """no_lyric 增加重试信息，已有记录沿用旧版 24h 后重试的规则"""
+        self._conn.execute("ALTER TABLE no_lyric ADD COLUMN attempts INTEGER NOT NULL DEFAULT 1")
+        self._conn.execute("ALTER TABLE no_lyric ADD COLUMN reason TEXT NOT NULL DEFAULT 'no_match'")
+        self._conn.execute("ALTER TABLE no_lyric ADD COLUMN next_time INTEGER")
+        self._conn.execute("UPDATE no_lyric SET next_time = last_time + 86400")
+        self._conn.execute("CREATE INDEX no_lyric_next_time_index ON no_lyric (next_time)")
+
+    def _fetch_one(self, sql: str, params: tuple):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def _execute(self, sql: str, params: tuple):
+        with self._lock, self._conn:
+            self._conn.execute(sql, params)
+
+    def get_offset(self, track_id: str) -> int:
+        row = self._fetch_one("SELECT offset_ms FROM track_offset WHERE track_id = ?", (track_id,))
+        return row[0] if row else 0
+
+    def set_offset(self, track_id: str, offset: int):
+        self._execute("INSERT OR REPLACE INTO track_offset VALUES (?, ?)", (track_id, offset))
+
+    @staticmethod
+    def _no_lyric_row_to_dict(row) -> dict:
+        track_title, last_time, attempts, reason, next_time = row
+        return {"track_title": track_title, "last_time": last_time, "attempts": attempts, "reason": reason,
+                "next_time": next_time}
+
+    def get_no_lyric(self, track_id: str):
+        row = self._fetch_one("SELECT track_title, last_time, attempts, reason, next_time FROM no_lyric "
+                              "WHERE track_id = ?", (track_id,))
+        return self._no_lyric_row_to_dict(row) if row else None
+
+    def set_no_lyric(self, track_id: str, track_title: str, last_time: int, *, attempts: int = 1,
+                     reason: str = "no_match", next_time: int = None):
+        self._execute("INSERT OR REPLACE INTO no_lyric (track_id, track_title, last_time, attempts, reason, next_time) "
+                      "VALUES (?, ?, ?, ?, ?, ?)", (track_id, track_title, last_time, attempts, reason, next_time))
+
+    def delete_no_lyric(self, track_id: str):
+        self._execute("DELETE FROM no_lyric WHERE track_id = ?", (track_id,))
+
+    def get_all_no_lyric(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT track_id, track_title, last_time, attempts, reason, next_time "
+                                      "FROM no_lyric ORDER BY rowid").fetchall()
+        return {row[0]: self._no_lyric_row_to_dict(row[1:]) for row in rows}
+
+    def get_due_no_lyric(self, now: int, limit: int = -1) -> list:
+        """到达重试时间的记录，按重试时间先后排列，返回 [(track_id, track_title), ...]"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT track_id, track_title FROM no_lyric WHERE next_time IS NOT NULL AND next_time <= ? "
+                "ORDER BY next_time LIMIT ?", (now, limit)).fetchall()
+
+    def get_title(self, track_id: str):
+        row = self._fetch_one("SELECT title FROM track_title WHERE track_id = ?", (track_id,))
+        return row[0] if row else None
+
+    def get_id(self, title: str):
+        """同一标题对应多个 track_id 时，返回最后设置的"""
+        row = self._fetch_one("SELECT track_id FROM track_title WHERE title = ? ORDER BY rowid DESC LIMIT 1", (title,))
+        return row[0] if row else None
+
+    def set_title(self, track_id: str, title: str):
+        # REPLACE 会重新插入行，rowid 随之更新，使 get_id 得到最后设置的 track_id
+        self._execute("INSERT OR REPLACE INTO track_title VALUES (?, ?)", (track_id, title))
+
+    def delete_title(self, track_id: str):
+        self._execute("DELETE FROM track_title WHERE track_id = ?", (track_id,))
+
+    def get_all_titles(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT track_id, title FROM track_title ORDER BY rowid").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -5,12 +5,25 @@ import codecs
 import json
 import re
 import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
 from enum import Enum
 
 from common.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 时间标签 [mm:ss] [mm:ss.xx] [mm:ss:xxx] [hh:mm:ss.xx]，优先按无小时解析以兼容 mrc 的 [mm:ss:xxx]
+_LRC_TAG_PATTERN = re.compile(r'\[(?:(\d+):)??(\d+):(\d+)(?:[.:](\d+))?]')
+# 行首的一个或多个时间标签 以及 歌词文本
+_LRC_LINE_PATTERN = re.compile(r'^((?:\[(?:\d+:)??\d+:\d+(?:[.:]\d+)?])+)(.*?)\r?$', re.M)
+
+_KRC_KEY = bytes([0x40, 0x47, 0x61, 0x77, 0x5e, 0x32, 0x74, 0x47, 0x51, 0x36, 0x31, 0x2d, 0xce, 0xd2, 0x6e, 0x69])
+_KRC_WORD_TAG_PATTERN = re.compile(r'<[^>]*>')
+_KRC_WORD_PATTERN = re.compile(r'<(\d+),(\d+),\d+>([^<]*)')
+_KRC_LINE_TIME_PATTERN = re.compile(r'\[(\d+),\d*]')
+
 
 class TransType(Enum):
     NON = 0
@@ -18,30 +31,125 @@ class TransType(Enum):
     CHINESE = 2
 
 
+class LyricColumnView(Mapping):
+    """
+    Read-only {time(ms): text} view on one text column of LrcFile.
+    """
+    __slots__ = ("_timeline", "_column")
+
+    def __init__(self, timeline: array, column: list):
+        self._timeline = timeline
+        self._column = column
+
+    def __getitem__(self, time_: int) -> str:
+        index = bisect_left(self._timeline, time_)
+        if index < len(self._column) and self._timeline[index] == time_:
+            text = self._column[index]
+            if text is not None:
+                return text
+        raise KeyError(time_)
+
+    def __iter__(self):
+        return (time_ for time_, text in zip(self._timeline, self._column) if text is not None)
+
+    def __len__(self) -> int:
+        return len(self._column) - self._column.count(None)
+
+
+class WordTimedLine:
+    """
+    Word-level timing of one lyric line, offsets and durations are ms relative to the line start.
+    """
+    __slots__ = ("start", "words", "offsets", "durations", "_char_ends")
+
+    def __init__(self, start: int, words: list, offsets: array, durations: array):
+        self.start = start
+        self.words = words
+        self.offsets = offsets
+        self.durations = durations
+
+        self._char_ends = array('l')  # 每个字结束处的字符数，用于计算进度
+        char_count = 0
+        for word in words:
+            char_count += len(word)
+            self._char_ends.append(char_count)
+
+    @classmethod
+    def from_krc(cls, start: int, tagged_text: str) -> "WordTimedLine":
+        """Build from the text of a KRC line like '<0,200,0>Hel<200,300,0>lo'."""
+        words = []
+        offsets = array('l')
+        durations = array('l')
+        for offset, duration, word in _KRC_WORD_PATTERN.findall(tagged_text):
+            words.append(word)
+            offsets.append(int(offset))
+            durations.append(int(duration))
+        return cls(start, words, offsets, durations)
+
+    @property
+    def text(self) -> str:
+        return ''.join(self.words)
+
+    def word_index(self, elapsed: int) -> int:
+        """
+        Get the index of the word being sung.
+
+        :param elapsed: ms after the line start
+        :return: Return -1 if no word has started
+        """
+        return bisect_right(self.offsets, elapsed) - 1
+
+    def progress(self, elapsed: int) -> float:
+        """
+        Get the sung proportion of the line text, weighted by characters.
+
+        :param elapsed: ms after the line start
+        :return: 0.0 ~ 1.0
+        """
+        index = self.word_index(elapsed)
+        if index < 0 or not self._char_ends[-1]:
+            return 0.0
+        duration = self.durations[index]
+        word_rate = min((elapsed - self.offsets[index]) / duration, 1.0) if duration else 1.0
+        sung_chars = self._char_ends[index - 1] if index else 0
+        sung_chars += len(self.words[index]) * word_rate
+        return sung_chars / self._char_ends[-1]
+
+
 class LrcFile:
+    """
+    Lyric data is stored by columns: all TransType share one sorted timestamp array,
+    each TransType has a text list aligned with it (None means no line at this time).
+    """
+    __slots__ = ("_timeline", "_columns", "_word_view", "_word_lines")
 
     def __init__(self, file_path=None, lrc_type: TransType = TransType.NON):
-        self.trans_non_dict = {}
-        self.trans_romaji_dict = {}
-        self.trans_chinese_dict = {}
+        self._timeline = array('q')  # 排序后的时间戳，供二分查找
+        self._columns = {}  # TransType -> 与 _timeline 对齐的文本列
+        self._word_view = None  # 原文带逐字时间标签的文本 {time: text}，仅 krc 存在
+        self._word_lines = {}  # 按需解析的 WordTimedLine 缓存
         if file_path:
             self.load_file_path(file_path, lrc_type)
 
-    def __select_lrc_type(self, lrc_type: TransType) -> dict:
-        """
-        Get the bound dict.
+    @property
+    def trans_non_dict(self) -> LyricColumnView:
+        return self._column_view(TransType.NON)
 
-        :return: Returns a reference to the corresponding dict.
-        """
-        if lrc_type == TransType.NON:
-            target_dict = self.trans_non_dict
-        elif lrc_type == TransType.ROMAJI:
-            target_dict = self.trans_romaji_dict
-        elif lrc_type == TransType.CHINESE:
-            target_dict = self.trans_chinese_dict
-        else:
+    @property
+    def trans_romaji_dict(self) -> LyricColumnView:
+        return self._column_view(TransType.ROMAJI)
+
+    @property
+    def trans_chinese_dict(self) -> LyricColumnView:
+        return self._column_view(TransType.CHINESE)
+
+    def _column_view(self, lrc_type: TransType) -> LyricColumnView:
+        return LyricColumnView(self._timeline, self._columns.get(lrc_type, []))
+
+    @staticmethod
+    def __check_lrc_type(lrc_type: TransType):
+        if not isinstance(lrc_type, TransType):
             raise ValueError("lrc_type must be TransType.")
-        return target_dict
 
     def load_content(self, content: str, lrc_type: TransType) -> bool:
         """
@@ -49,43 +157,79 @@ class LrcFile:
 
         :return:
         """
-        target_dict = self.__select_lrc_type(lrc_type)
-        target_dict.clear()
-        file_data = content.splitlines()
-        for line in file_data:
-            if re.match(r'\[\d\d:\d\d.\d+]', line):
-                if line[9] == ']':
-                    moment = int(line[1:3]) * 60000 + \
-                             int(line[4:6]) * 1000 + int(line[7:9]) * 10
-                    context = line[10:]
-                elif line[10] == ']':
-                    moment = int(line[1:3]) * 60000 + \
-                             int(line[4:6]) * 1000 + int(line[7:10])
-                    context = line[11:]
-                else:
-                    end = line.find(']')
-                    moment_text_list = re.split('[:.]', line[1:end])
-                    moment = int(moment_text_list[0]) * 60000 + \
-                             int(moment_text_list[1]) * 1000 + int(moment_text_list[2])
-                    context = line[end + 1:]
-                while moment in target_dict.keys():
+        self.__check_lrc_type(lrc_type)
+        target_dict = {}
+        moments = set()
+        for line_match in _LRC_LINE_PATTERN.finditer(content):
+            tags, context = line_match.groups()
+            for hour, minute, second, fraction in _LRC_TAG_PATTERN.findall(tags):
+                moment = (int(hour or 0) * 3600 + int(minute) * 60 + int(second)) * 1000
+                if fraction:
+                    moment += int(fraction[:3].ljust(3, '0'))
+                while moment in moments:
                     moment += 10
                     logger.debug("检测到重复时间戳，顺延 10ms: %s", moment)
+                moments.add(moment)
                 target_dict[moment] = context
-        # 同步
-        if self.trans_non_dict.keys():
-            if self.trans_romaji_dict.keys():
-                time_list = [x for x in self.trans_non_dict.keys() if x not in self.trans_romaji_dict.keys()]
-                for i in time_list:
-                    self.trans_romaji_dict[i] = ''
-
-            if self.trans_chinese_dict.keys():
-                time_list = [x for x in self.trans_non_dict.keys() if x not in self.trans_chinese_dict.keys()]
-                for i in time_list:
-                    self.trans_chinese_dict[i] = ''
 
+        self.load_dict(target_dict, lrc_type)
         return True
 
+    def load_dict(self, lyric_dict: dict, lrc_type: TransType):
+        """
+        Load lyric data from a dict of {time(ms): text}, replacing the old data of this type.
+
+        :return:
+        """
+        self.__check_lrc_type(lrc_type)
+        column_dicts = {trans: dict(self._column_view(trans)) for trans in self._columns if trans != lrc_type}
+        if lyric_dict:
+            column_dicts[lrc_type] = lyric_dict
+
+        # 时间轴以原文为准（没有原文时依次使用中文翻译、罗马音），只在翻译中存在的时间戳不单独成行
+        base_type = next((trans for trans in (TransType.NON, TransType.CHINESE, TransType.ROMAJI)
+                          if trans in column_dicts), None)
+        timeline = sorted(column_dicts[base_type]) if base_type is not None else []
+        non_dict = column_dicts.get(TransType.NON, {})
+        columns = {}
+        for trans, text_dict in column_dicts.items():
+            if trans == TransType.NON:
+                columns[trans] = [text_dict.get(time_) for time_ in timeline]
+                continue
+            # 同步 原文存在的时间戳 翻译缺失时补空字符串；没有留下任何翻译文本时去除该翻译
+            column = [text_dict.get(time_, '' if time_ in non_dict else None) for time_ in timeline]
+            if any(column):
+                columns[trans] = column
+
+        self._timeline = array('q', timeline)
+        self._columns = columns
+        if lrc_type == TransType.NON:
+            self._word_view = None
+            self._word_lines = {}
+
+    def to_columns(self) -> tuple:
+        """
+        Export the parsed data, see from_columns. Do not modify the returned data.
+
+        :return: (timeline, {TransType: text column}, word tagged text column or None), columns aligned with timeline
+        """
+        word_column = None
+        if self._word_view is not None:
+            word_column = [self._word_view.get(time_) for time_ in self._timeline]
+        return self._timeline, dict(self._columns), word_column
+
+    @classmethod
+    def from_columns(cls, timeline: array, columns: dict, word_column: list = None):
+        """
+        Create the lyric from already parsed columns (such as the data of to_columns) without parsing,
+        they must be aligned with timeline.
+        """
+        lrc_file = cls()
+        lrc_file._timeline = timeline
+        lrc_file._columns = columns
+        lrc_file._word_view = LyricColumnView(timeline, word_column) if word_column else None
+        return lrc_file
+
     def load_file_path(self, path: str, lrc_type: TransType):
         """
         Parse the lyric data in the path file.
@@ -100,19 +244,18 @@ class LrcFile:
 
         :return: If there is no data for this type, return ''.
         """
-        target_dict = self.__select_lrc_type(lrc_type)
+        self.__check_lrc_type(lrc_type)
+        target_dict = self._column_view(lrc_type)
 
         if not target_dict:
             return ''
 
-        time_list = sorted(target_dict.keys())
-
         res_file_content = ""
-        for time_ in time_list:
+        for time_, text in target_dict.items():
             time_stamp = "[%s:%s:%s]" % (str(time_ // 60000).zfill(2),
                                          str(time_ % 60000 // 1000).zfill(2),
                                          str(time_ % 1000).zfill(3))
-            res_file_content += time_stamp + target_dict[time_] + '\n'
+            res_file_content += time_stamp + text + '\n'
         return res_file_content
 
     def save_to_lrc(self, save_path: str, lrc_type: TransType) -> bool:
@@ -146,22 +289,16 @@ class LrcFile:
 
     def get_time(self, order: int) -> int:
         """
-        Get the time of order in dict.
+        Get the time of order in the sorted time list.
 
         :param order:
         :return: the time.
         """
-        if self.trans_non_dict:
-            time_list = list(self.trans_non_dict.keys())
-        elif self.trans_chinese_dict:
-            time_list = list(self.trans_chinese_dict.keys())
-        elif self.trans_romaji_dict:
-            time_list = list(self.trans_romaji_dict.keys())
-        else:
+        if not self._timeline:
             return -1
-        if order >= len(time_list):
+        if order >= len(self._timeline):
             return -2
-        return time_list[order]
+        return self._timeline[order]
 
     def get_order_position(self, time_position: int) -> int:
         """
@@ -170,24 +307,46 @@ class LrcFile:
         :param time_position:
         :return: Return -1 if none, Return the length of the time_list if it is greater than all times
         """
-        if self.trans_non_dict:
-            time_list = list(self.trans_non_dict.keys())
-        elif self.trans_chinese_dict:
-            time_list = list(self.trans_chinese_dict.keys())
-        elif self.trans_romaji_dict:
-            time_list = list(self.trans_romaji_dict.keys())
-        else:
+        if not self._timeline:
             return -1
-        time_list.sort()
+        return max(bisect_right(self._timeline, time_position) - 1, 0)
 
-        if time_position < time_list[0]:
-            return 0
+    def get_text(self, order: int, lrc_type: TransType = TransType.NON) -> str:
+        """
+        Get the text of order in the column of lrc_type.
 
-        for order in range(1, len(time_list)):
-            if time_position < time_list[order]:
-                return order - 1
-        else:
-            return len(time_list) - 1
+        :return: If there is no text at this order, return ''.
+        """
+        column = self._columns.get(lrc_type)
+        if not column or not 0 <= order < len(column):
+            return ''
+        return column[order] or ''
+
+    def get_column(self, lrc_type: TransType = TransType.NON) -> list:
+        """
+        Get the text column of lrc_type aligned with the time order, do not modify it.
+
+        :return: If there is no data for this type, return None.
+        """
+        return self._columns.get(lrc_type)
+
+    def get_word_line(self, order: int):
+        """
+        Get the word-level timing of the order line, parsed only when first asked.
+
+        :return: WordTimedLine, If the lyric has no word timing, return None.
+        """
+        if self._word_view is None:
+            return None
+        if order in self._word_lines:
+            return self._word_lines[order]
+        time_ = self.get_time(order)
+        tagged_text = self._word_view.get(time_) if time_ >= 0 else None
+        word_line = WordTimedLine.from_krc(time_, tagged_text) if tagged_text else None
+        if word_line is not None and not word_line.words:
+            word_line = None
+        self._word_lines[order] = word_line
+        return word_line
 
     def available_trans(self) -> list:
         available_trans_list = [TransType.NON]
@@ -198,15 +357,15 @@ class LrcFile:
         return available_trans_list
 
     def empty(self, lrc_type: TransType = TransType.NON) -> bool:
-        target_dict = self.__select_lrc_type(lrc_type)
-        if not target_dict:
-            return True
+        self.__check_lrc_type(lrc_type)
+        return lrc_type not in self._columns
 
 
 class KrcFile(LrcFile):
     """
     Read KRC files and decode them
     """
+    __slots__ = ()
 
     @staticmethod
     def __decode(file_data: bytes, sec_decimal: int = 3) -> str:
@@ -215,44 +374,25 @@ class KrcFile(LrcFile):
 
         :param file_data: Specifies the data to read
         :param sec_decimal: The number of seconds inside the file
-        :return: Decoded text
-        """
-        krc_bytes = bytearray(file_data)
-        key = bytearray([0x0040,
-                         0x0047,
-                         0x0061,
-                         0x0077,
-                         0x005e,
-                         0x0032,
-                         0x0074,
-                         0x0047,
-                         0x0051,
-                         0x0036,
-                         0x0031,
-                         0x002d,
-                         0x00ce,
-                         0x00d2,
-                         0x006e,
-                         0x0069])
-        decompress_bytes = []
-        i = 0
-        for ch in krc_bytes[4:]:
-            decompress_bytes.append(ch ^ key[i % 16])
-            i = i + 1
-        decode_bytes = zlib.decompress(
-            bytearray(decompress_bytes)).decode('utf-8-sig')
-        decode_bytes = re.sub(r'<[^>]*>', '', decode_bytes)
-        for match in re.finditer(r'\[(\d*),\d*]', decode_bytes):
-            ms = int(match.group(1))
-            if sec_decimal == 3:
-                time = '[%.2d:%.2d.%.3d]' % ((ms % (
-                        1000 * 60 * 60)) / (1000 * 60), (ms % (1000 * 60)) / 1000, (ms % (1000 * 60)) % 1000)
-            elif sec_decimal == 2:
-                time = '[%.2d:%.2d.%.2d]' % ((ms % (1000 * 60 * 60)) / (
-                        1000 * 60), (ms % (1000 * 60)) / 1000, (ms % (1000 * 60)) // 10 % 100)
-            else:
-                raise ValueError("sec_decimal must be 2 or 3.")
-            decode_bytes = decode_bytes.replace(match.group(0), time)
+        :return: Decoded text, the word time tags <offset,duration,0> are kept
+        """
+        if sec_decimal == 3:
+            def format_time(match):
+                ms = int(match.group(1))
+                return '[%.2d:%.2d.%.3d]' % (ms // 60000, ms % 60000 // 1000, ms % 1000)
+        elif sec_decimal == 2:
+            def format_time(match):
+                ms = int(match.group(1))
+                return '[%.2d:%.2d.%.2d]' % (ms // 60000, ms % 60000 // 1000, ms % 1000 // 10)
+        else:
+            raise ValueError("sec_decimal must be 2 or 3.")
+
+        # 将16位密钥平铺至与数据等长，以大整数整体异或代替逐字节循环
+        payload = file_data[4:]
+        key_stream = (_KRC_KEY * (len(payload) // len(_KRC_KEY) + 1))[:len(payload)]
+        decrypt_bytes = (int.from_bytes(payload, 'big') ^ int.from_bytes(key_stream, 'big')).to_bytes(len(payload), 'big')
+        decode_bytes = zlib.decompress(decrypt_bytes).decode('utf-8-sig')
+        decode_bytes = _KRC_LINE_TIME_PATTERN.sub(format_time, decode_bytes)
         return decode_bytes
 
     def load_content(self, content: bytes, lrc_type: TransType = TransType.NON):
@@ -265,6 +405,14 @@ class KrcFile(LrcFile):
             decoded_content = content.decode("utf-8")
         super(KrcFile, self).load_content(decoded_content, lrc_type)
 
+        # 逐字时间标签保留在单独的列中，显示用的文本列去除标签
+        tagged_column = self._columns.get(lrc_type)
+        if tagged_column:
+            self._columns[lrc_type] = [_KRC_WORD_TAG_PATTERN.sub('', text) if text else text
+                                       for text in tagged_column]
+            if lrc_type == TransType.NON:
+                self._word_view = LyricColumnView(self._timeline, tagged_column)
+
         file_data = decoded_content.splitlines()
         information_dict = {}
         for line in file_data:
@@ -290,11 +438,11 @@ class KrcFile(LrcFile):
                     for sentence in language_type_dict['lyricContent']:
                         trans_chinese_list.append(sentence[0])
 
-        for index, time_ in enumerate(self.trans_non_dict.keys()):
-            if trans_romaji_list:
-                self.trans_romaji_dict[time_] = trans_romaji_list[index]
-            if trans_chinese_list:
-                self.trans_chinese_dict[time_] = trans_chinese_list[index]
+        time_list = list(self.trans_non_dict)
+        if trans_romaji_list:
+            self.load_dict(dict(zip(time_list, trans_romaji_list)), TransType.ROMAJI)
+        if trans_chinese_list:
+            self.load_dict(dict(zip(time_list, trans_chinese_list)), TransType.CHINESE)
 
     def load_file_path(self, path: str, lrc_type: TransType = TransType.NON):
         text_byte = open(path, 'rb').read()
@@ -302,6 +450,7 @@ class KrcFile(LrcFile):
 
 
 class MrcFile(LrcFile):
+    __slots__ = ()
 
     def load_content(self, content: str, lrc_type: TransType) -> bool:
         file_data = content.splitlines()
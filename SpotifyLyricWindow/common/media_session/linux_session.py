@@ -1,13 +1,18 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 import sys
+import time
 from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot, QMetaType, QVariant
-from PyQt6.QtDBus import QDBusConnection, QDBusInterface, QDBusMessage, QDBusObjectPath, QDBusVariant
+from PyQt6.QtDBus import QDBusConnection, QDBusMessage, QDBusObjectPath, QDBusPendingCallWatcher, \
+    QDBusPendingReply, QDBusServiceWatcher
 from PyQt6.QtWidgets import QApplication
 
+from common.logger import get_logger
 from common.media_session.base_session import BaseMediaSession
 from common.media_session.media_session_type import MediaPropertiesInfo, MediaPlaybackInfo
 
+logger = get_logger(__name__)
+
 
 # dbus-monitor --session "type='signal',interface='org.mpris.MediaPlayer2.Player',member='Seeked'"
 
@@ -15,7 +20,12 @@ from common.media_session.media_session_type import MediaPropertiesInfo, MediaPl
 
 
 class LinuxMediaSession(QObject, BaseMediaSession):
-    """Linux 下的异步媒体信号监听器"""
+    """
+    Linux 下的异步媒体信号监听器
+
+    Player 的属性缓存在 _properties 中：PropertiesChanged 与 Seeked 携带的变化直接合并到缓存，
+    只有信号未携带且缓存中没有的属性才异步查询，回复到达后再通知界面，界面线程不会等待总线
+    """
     playback_info_changed = pyqtSignal(dict)
     media_properties_changed = pyqtSignal(dict)
     timeline_properties_changed = pyqtSignal(dict)
@@ -25,48 +35,32 @@ class LinuxMediaSession(QObject, BaseMediaSession):
 
     PROP_INTERFACE = "org.freedesktop.DBus.Properties"
     PLAYER_INTERFACE = "org.mpris.MediaPlayer2.Player"
+    PLAYBACK_PROPERTIES = ["Metadata", "PlaybackStatus", "Position"]  # MediaPlaybackInfo 所需的属性
 
-    def __init__(self,):
+    def __init__(self, session_bus: QDBusConnection = None):
         super().__init__()
         self.playback_info_changed_func = None
         self.media_properties_changed_func = None
         self.timeline_properties_changed_func = None
         self._is_connect = False
 
-        self._init_dbus()
-
-        self.connect_spotify()
-
-    def _init_dbus(self):
-        self.session_bus = QDBusConnection.sessionBus()
-
-        self.properties_interface = QDBusInterface(
-            self.SERVICE,
-            self.PATH,
-            self.PROP_INTERFACE,
-            self.session_bus
-        )
-        
-        self.interface_player = QDBusInterface(
-            self.SERVICE,
-            self.PATH,
-            self.PLAYER_INTERFACE,
-            self.session_bus
-        )
+        self._properties = {}  # Player 属性缓存 Position 单位：us
+        self._position_time = 0.0  # 缓存的 Position 对应的时刻（单调时钟）
 
-        get_args = [self.SERVICE, self.PATH, self.PROP_INTERFACE, "Get"]
+        self._init_dbus(session_bus)
 
-        self.metadata_req = QDBusMessage.createMethodCall(*get_args)
-        self.metadata_req.setArguments([self.PLAYER_INTERFACE, "Metadata"])
+        self.connect_spotify()
 
-        self.position_req = QDBusMessage.createMethodCall(*get_args)
-        self.position_req.setArguments([self.PLAYER_INTERFACE, "Position"])
+    def _init_dbus(self, session_bus: QDBusConnection = None):
+        self.session_bus = session_bus if session_bus is not None else QDBusConnection.sessionBus()
 
-        self.playback_req = QDBusMessage.createMethodCall(*get_args)
-        self.playback_req.setArguments([self.PLAYER_INTERFACE, "PlaybackStatus"])
+        # 不使用 QDBusInterface：其构造时会同步获取 introspection 数据
+        self.get_all_req = QDBusMessage.createMethodCall(self.SERVICE, self.PATH, self.PROP_INTERFACE, "GetAll")
+        self.get_all_req.setArguments([self.PLAYER_INTERFACE])
 
-        self.position_req = QDBusMessage.createMethodCall(*get_args)
-        self.position_req.setArguments([self.PLAYER_INTERFACE, "Position"])
+        self.service_watcher = QDBusServiceWatcher(self.SERVICE, self.session_bus,
+                                                   QDBusServiceWatcher.WatchModeFlag.WatchForOwnerChange, self)
+        self.service_watcher.serviceOwnerChanged.connect(self._service_owner_changed)
 
         self.session_bus.connect(self.SERVICE,
                                  self.PATH,
@@ -79,91 +73,162 @@ class LinuxMediaSession(QObject, BaseMediaSession):
                                  "PropertiesChanged",
                                  self._media_properties_playback_changed_func)
 
-    @pyqtSlot("QString", "QVariantMap")
-    def _media_properties_playback_changed_func(self, interface_name, changed_properties):
-        if changed_properties.get("Metadata"):
-            info = self.get_current_media_properties()
-            self.media_properties_changed_func(info)
-        if changed_properties.get("PlaybackStatus"):
-            info = self.get_current_playback_info()
-            self.playback_info_changed_func(info)
+    def _service_owner_changed(self, service: str, old_owner: str, new_owner: str):
+        self._is_connect = bool(new_owner)
+        self._properties.clear()  # 播放器重启或退出 缓存失效
+
+    @pyqtSlot("QString", "QVariantMap", "QStringList")
+    def _media_properties_playback_changed_func(self, interface_name, changed_properties, invalidated_properties):
+        if interface_name != self.PLAYER_INTERFACE:
+            return
+        for name in invalidated_properties:
+            self._properties.pop(name, None)
+        metadata_changed = bool(changed_properties.get("Metadata"))
+        playback_changed = bool(changed_properties.get("PlaybackStatus"))
+        if metadata_changed:
+            self._properties.pop("Position", None)  # 切换歌曲后进度需要重新获取
+        self._update_properties(changed_properties)
+        if not metadata_changed and not playback_changed:
+            return
+
+        def properties_changed():
+            if metadata_changed:
+                self.media_properties_changed_func(self.get_current_media_properties())
+            if playback_changed:
+                self.playback_info_changed_func(self.get_current_playback_info())
+
+        # 界面的回调会同时读取两类信息 缓存补全后再通知，回调中不会同步查询
+        self._query_missing(self.PLAYBACK_PROPERTIES, properties_changed)
 
     @pyqtSlot('qint64')
     def _timeline_properties_changed_func(self, timestamp):
-        info = self.get_current_playback_info()
-        self.timeline_properties_changed_func(info)
+        self._update_properties({"Position": timestamp})
+        self._query_missing(self.PLAYBACK_PROPERTIES,
+                            lambda: self.timeline_properties_changed_func(self.get_current_playback_info()))
+
+    def _update_properties(self, properties: dict):
+        """将信号或回复中的属性合并到缓存"""
+        now = time.monotonic()
+        if "Position" not in properties and "Position" in self._properties:
+            # 播放状态可能变化 先按原来的状态推算当前进度
+            self._properties["Position"] = self._current_position()
+        self._properties.update(properties)
+        self._position_time = now
+
+    def _current_position(self) -> int:
+        """由缓存推算当前进度 us"""
+        position = self._properties.get("Position", 0)
+        if self._properties.get("PlaybackStatus") == "Playing":
+            position += int((time.monotonic() - self._position_time) * 1_000_000)
+        return position
+
+    def _query_missing(self, names: list, callback, retry: bool = True):
+        """
+        异步获取缓存中缺少的属性，回复到达后调用 callback()；都已缓存时直接调用
+
+        只缺一个属性时使用 Get，否则使用 GetAll；获取失败时重试一次，仍失败也调用 callback()
+        """
+        missing = [name for name in names if name not in self._properties]
+        if not missing:
+            callback()
+            return
+        if len(missing) == 1:
+            message = QDBusMessage.createMethodCall(self.SERVICE, self.PATH, self.PROP_INTERFACE, "Get")
+            message.setArguments([self.PLAYER_INTERFACE, missing[0]])
+        else:
+            message = self.get_all_req
+        watcher = QDBusPendingCallWatcher(self.session_bus.asyncCall(message), self)
+        watcher.finished.connect(
+            lambda finished_watcher: self._properties_reply(finished_watcher, missing, callback, retry))
+
+    def _properties_reply(self, watcher: QDBusPendingCallWatcher, names: list, callback, retry: bool):
+        watcher.deleteLater()
+        reply = QDBusPendingReply(watcher)
+        if reply.isError():
+            logger.warning("获取播放器属性失败: %s", reply.error().message())
+            if retry:
+                self._query_missing(names, callback, retry=False)
+                return
+            # 仍然通知回调，缺少的属性由 _get_properties 同步获取
+        else:
+            value = reply.argumentAt(0)
+            self._update_properties({names[0]: value} if len(names) == 1 else value)
+        callback()
+
+    def _get_properties(self, names: list) -> dict:
+        """缓存的属性，缺少 names 中的属性时同步获取一次"""
+        if any(name not in self._properties for name in names):
+            reply = self.session_bus.call(self.get_all_req)
+            if reply.type() == QDBusMessage.MessageType.ReplyMessage:
+                self._update_properties(reply.arguments()[0])
+        return self._properties
 
     def get_current_media_properties(self, session=None) -> MediaPropertiesInfo:
-        res_metadata = self.session_bus.call(self.metadata_req)
-        metadata = res_metadata.arguments()[0]
+        metadata = self._get_properties(["Metadata"]).get("Metadata", {})
         info = MediaPropertiesInfo(
             title=metadata.get("xesam:title"),
-            artist=", ".join(metadata.get("xesam:artist")),
+            artist=", ".join(metadata.get("xesam:artist", [])),
             albumTitle=metadata.get("xesam:album"),
-            albumArtist=", ".join(metadata.get("xesam:albumArtist")),
+            albumArtist=", ".join(metadata.get("xesam:albumArtist", [])),
             trackNumber=metadata.get("xesam:trackNumber")
         )
         return info
 
-
     def get_current_playback_info(self, session=None) -> MediaPlaybackInfo:
-        res_playback = self.session_bus.call(self.playback_req)
-        res_position = self.session_bus.call(self.position_req)
-        res_metadata = self.session_bus.call(self.metadata_req)
-
-        playback = res_playback.arguments()[0]
-        position = res_position.arguments()[0]
-        metadata = res_metadata.arguments()[0]
+        properties = self._get_properties(self.PLAYBACK_PROPERTIES)
+        metadata = properties.get("Metadata", {})
 
         info = MediaPlaybackInfo(
-            playStatus=4 if playback=="Playing" else 5,
-            duration=metadata.get("mpris:length") // 1000,
-            position=position // 1000
+            playStatus=4 if properties.get("PlaybackStatus") == "Playing" else 5,
+            duration=metadata.get("mpris:length", 0) // 1000,
+            position=self._current_position() // 1000
         )
         return info
 
     def is_connected(self) -> bool:
-        return self.properties_interface.isValid()
+        return self._is_connect
 
     def connect_spotify(self):
-        self.properties_interface.isValid()
+        self._is_connect = self.session_bus.interface().isServiceRegistered(self.SERVICE).value()
+        return self._is_connect
+
+    def _call_player(self, method: str, *args) -> bool:
+        """异步调用 Player 的方法，不等待回复"""
+        if not self._is_connect:
+            return False
+        message = QDBusMessage.createMethodCall(self.SERVICE, self.PATH, self.PLAYER_INTERFACE, method)
+        message.setArguments(list(args))
+        self.session_bus.asyncCall(message)
+        return True
 
     def pause_media(self) -> bool:
-        if self.interface_player.isValid():
-            self.interface_player.call("Pause")
-        return self.interface_player.isValid()
+        return self._call_player("Pause")
 
     def play_media(self) -> bool:
-        if self.interface_player.isValid():
-            self.interface_player.call("Play")
-        return self.interface_player.isValid()
+        return self._call_player("Play")
 
     def skip_next_media(self) -> bool:
         """播放下一首"""
-        if self.interface_player.isValid():
-            self.interface_player.call("Next")
-        return self.interface_player.isValid()
+        return self._call_player("Next")
 
     def skip_previous_media(self) -> bool:
         """播放上一首"""
-        if self.interface_player.isValid():
-            self.interface_player.call("Previous")
-        return self.interface_player.isValid()
+        return self._call_player("Previous")
 
     def play_pause_media(self) -> bool:
         """切换播放状态的 暂停/播放"""
-        if self.interface_player.isValid():
-            self.interface_player.call("PlayPause")
-        return self.interface_player.isValid()
+        return self._call_player("PlayPause")
 
     def seek_to_position_media(self, position):
-        res_metadata = self.session_bus.call(self.metadata_req)
-        metadata = res_metadata.arguments()[0]
-        track_id = metadata.get("mpris:trackid", "")
-        track_path = QDBusObjectPath(track_id)
+        self._query_missing(["Metadata"], lambda: self._set_position(position))
+
+    def _set_position(self, position):
+        track_id = self._properties.get("Metadata", {}).get("mpris:trackid")
+        if track_id is None:
+            return
         v = QVariant(position)
         v.convert(QMetaType(QMetaType.Type.LongLong.value))
-        self.interface_player.call("SetPosition", track_path, v)
+        self._call_player("SetPosition", QDBusObjectPath(track_id), v)
 
     def playback_info_changed_connect(self, func):
         """绑定pyqt的信号"""
@@ -26,8 +26,11 @@ TEMP_IMAGE_PATH = TEMP_PATH / "image"
 TOKEN_PATH = BASE_PATH / Path(r"resource/token")
 LYRIC_TOKEN_PATH = BASE_PATH / Path(r"resource/lyric_token")
 
-LYRIC_DATA_FILE_PATH = LRC_PATH / "lyric.json"
+LYRIC_DATA_FILE_PATH = LRC_PATH / "lyric.json"  # 旧版歌词数据，仅用于迁移至 LYRIC_DB_PATH
+LYRIC_DB_PATH = LRC_PATH / "lyric.db"
 TEMP_DATA_FILE_PATH = TEMP_PATH / "temp.json"
+API_CACHE_DB_PATH = TEMP_PATH / "api_cache.db"
+BACKFILL_CHECKPOINT_PATH = TEMP_PATH / "backfill.json"
 
 SETTING_TOML_PATH = BASE_PATH / Path(r"resource/setting.toml")
 
@@ -44,7 +47,7 @@ def path_check():
         if not dir_.exists():
             dir_.mkdir(parents=True)
 
-    for json_file in (LYRIC_DATA_FILE_PATH, TEMP_DATA_FILE_PATH):
+    for json_file in (TEMP_DATA_FILE_PATH,):
         if not json_file.exists():
             with json_file.open("w", encoding="utf-8") as f:
                 f.write(json.dumps({}, indent=4, ensure_ascii=False))
@@ -0,0 +1,70 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable
+
+from common.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def write_text_atomic(path: Path, text: str):
+    """先写入同目录下的临时文件再重命名覆盖，写入中途崩溃不会破坏原文件"""
+    temp_path = path.with_name(path.name + ".tmp")
+    with temp_path.open("w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class DebouncedJsonWriter:
+    """
+    JSON 文件的延迟写入器
+
+    修改数据后调用 mark_dirty 标记，首次标记起 interval 秒后由后台线程合并写入一次；
+    调用 flush 立即写入（如关闭窗口时）。
+    修改数据时需持有 lock，保证后台线程序列化时数据不被同时修改。
+    """
+
+    def __init__(self, path: Path, get_data: Callable[[], dict], interval: float = 2.0):
+        self.path = path
+        self.interval = interval
+        self.lock = threading.RLock()
+        self._get_data = get_data
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._timer = None
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    def mark_dirty(self):
+        with self.lock:
+            self._dirty = True
+            if self._timer is None:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """若有未保存的修改则立即写入"""
+        with self._write_lock:
+            with self.lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                text = json.dumps(self._get_data(), indent=4, ensure_ascii=False)
+            try:
+                write_text_atomic(self.path, text)
+            except OSError:
+                logger.warning("文件写入失败: %s", self.path, exc_info=True)
+                with self.lock:
+                    self._dirty = True
@@ -1,3 +1,4 @@
 #!/usr/bin/python
 # -*- coding:utf-8 -*-
 from .lyric_player import LrcPlayer
+from .lyric_scheduler import LyricScheduler, get_lyric_scheduler
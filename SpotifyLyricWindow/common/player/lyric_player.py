@@ -1,20 +1,24 @@
 #!/usr/bin/python
 # -*- coding:utf-8 -*-
-import sys
-import threading
 import time
-import weakref
 
 from common.api import SpotifyUserApi
 from common.lyric import LyricFileManage
+from common.player.lyric_scheduler import LyricScheduler, get_lyric_scheduler
 from common.typing import LrcFile, TransType
 
+DRIFT_TOLERANCE = 100  # 媒体会话报告的进度与计时器相差不超过该值（ms）时不做校正
+PLAY_DONE_AHEAD = 1200  # 距歌曲结束该时长（ms）时视为播放完毕
+LOOKAHEAD_LINES = 3  # 每次输出歌词时提前输出之后的歌词句数，供界面提前排版
+
 
 class LrcPlayer:
-    def __init__(self, output_func):
+    _clock = staticmethod(time.monotonic_ns)  # 单调时钟，不受系统时间调整、休眠唤醒影响
+
+    def __init__(self, output_func, scheduler: LyricScheduler = None):
         self.output_func = output_func  # 输出歌词函数  可设置为print利于测试
         self.lyric_file_manage = LyricFileManage()
-        self.timer_start_value: int = int(time.time() * 1000)  # 计时器实现原理，当前时间减去开始时间
+        self.timer_start_value: int = self._now()  # 计时器实现原理，当前时间减去开始时间
 
         # 播放相关属性
         self.track_id = ""
@@ -26,25 +30,36 @@ class LrcPlayer:
         self.track_offset = 0
         self.global_offset = 0
         self.lrc_file = LrcFile()
+        self.trans_column = None  # 当前翻译模式对应的文本列，切换翻译时整列替换
 
         self.play_done_event_func = None
+        self.word_output_func = None  # 输出逐字时间的函数 (WordTimedLine, 已播放时长ms)
+        self.lookahead_output_func = None  # 提前输出之后几句歌词的函数 [(原文, 翻译), ...]
+
+        # 多个播放器共用一个调度线程，播放器只注册回调
+        self.scheduler = scheduler if scheduler is not None else get_lyric_scheduler()
+        self.lyric_task = self.scheduler.register(self._play_lyric)
+        self.lyric_task.wake()
 
-        self.thread_play_lrc = LyricThread(self)
-        self.thread_play_lrc.start()
+    def close(self):
+        self.lyric_task.cancel()
 
-    def close(self, timeout: float = 1.0):
-        self.thread_play_lrc.terminate()
-        self.thread_play_lrc.join(timeout=timeout)
+    def _now(self) -> int:
+        """单调时钟的当前值 ms"""
+        return self._clock() // 1_000_000
 
     def get_time(self) -> int:
         """获取播放进度"""
-        return int(time.time() * 1000) - self.timer_start_value + self.track_offset + self.global_offset
+        return self._now() - self.timer_start_value + self.track_offset + self.global_offset
+
+    def deadline_ns(self, position: int) -> int:
+        """播放进度到达 position（ms）时单调时钟的值 ns"""
+        return (position - self.track_offset - self.global_offset + self.timer_start_value) * 1_000_000
 
     def set_pause(self, flag: bool):
         """设置歌词播放是否暂停"""
         self.is_pause = flag
-        if not flag:
-            self.thread_play_lrc.reset_position()
+        self.lyric_task.wake()
 
     def set_track(self, track_id: str, duration: int):
         """设置当前播放的歌曲 duration单位：ms"""
@@ -61,124 +76,150 @@ class LrcPlayer:
 
         if self.trans_mode not in self.lrc_file.available_trans():
             self.trans_mode = TransType.NON
+        self._refresh_trans_column()
+        self.lyric_task.wake()
+
+    def reload_lyric(self):
+        """重新读取当前歌曲的歌词文件，保持播放进度"""
+        if not self.track_id:
+            return
+        self.lrc_file = self.lyric_file_manage.read_lyric_file(self.track_id)
+        if self.trans_mode not in self.lrc_file.available_trans():
+            self.trans_mode = TransType.NON
+        self._refresh_trans_column()
+        self._show_last_lyric()
+        self.lyric_task.wake()
 
     def set_trans_mode(self, mode: TransType) -> bool:
         """设置翻译模式"""
         if self.lrc_file.empty(mode):
             return False
         self.trans_mode = mode
+        self._refresh_trans_column()
         self._show_last_lyric()
         return True
 
+    def _refresh_trans_column(self):
+        """根据翻译模式选取翻译文本列"""
+        if self.trans_mode == TransType.NON:
+            self.trans_column = None
+        else:
+            self.trans_column = self.lrc_file.get_column(self.trans_mode)
+
     def _show_last_lyric(self):
         """显示上一句非空白的歌词"""
         lrc_file = self.lrc_file
         if lrc_file.empty():
             return
         order = lrc_file.get_order_position(self.get_time())
-        timestamp = lrc_file.get_time(order)
-        lyric_text = lrc_file.trans_non_dict[timestamp]
-        while order != -1 and not lyric_text:
+        while order != -1 and not lrc_file.get_text(order):
             order -= 1
-            timestamp = lrc_file.get_time(order)
-            lyric_text = lrc_file.trans_non_dict.get(timestamp)
         if order != -1:
             self.show_content(order, 0)
 
     def seek_to_position(self, position: int, is_show_last_lyric=True):
         """调整歌词播放进度 position单位：ms"""
-        self.timer_start_value = int(time.time() * 1000) - position
+        self.timer_start_value = self._now() - position
         if is_show_last_lyric:
             self._show_last_lyric()
-            self.thread_play_lrc.reset_position()
+            self.lyric_task.wake()
+
+    def sync_position(self, position: int) -> bool:
+        """
+        根据媒体会话报告的播放进度校正计时器漂移 position单位：ms
+
+        :return: 偏差超过 DRIFT_TOLERANCE 并已校正时返回 True
+        """
+        drift = position - (self._now() - self.timer_start_value)
+        if abs(drift) <= DRIFT_TOLERANCE:
+            return False
+        self.timer_start_value -= drift
+        self.lyric_task.wake()
+        return True
 
     def modify_offset(self, modify_value: int):
         """修改单个歌词文件的偏移"""
         self.track_offset += modify_value
+        self.lyric_task.wake()
 
     def modify_global_offset(self, modify_value: int):
         """修改全局偏移"""
         self.global_offset += modify_value
+        self.lyric_task.wake()
+
+    def _play_lyric(self):
+        """
+        调度回调：输出当前的歌词
+
+        根据排序后的时间轴计算下一句歌词的时刻，期间只会被跳转、暂停、切歌等操作唤醒，不做轮询
+        :return: 下一次调用的单调时钟时刻（ns），None 表示等待唤醒
+        """
+        position = self.get_time()
+        done_position = self.duration - PLAY_DONE_AHEAD
+        if position > done_position:  # 播放完毕
+            if self.play_done_event_func and not self.is_pause:
+                self.play_done_event_func()  # 发送播放完毕信号
+            return None
+        if self.is_pause:
+            return None
+
+        lyric_order = self.lrc_file.get_order_position(position)
+        if lyric_order < 0:  # 无歌词 等待播放完毕
+            next_stamp = done_position + 1
+        else:
+            next_stamp = self.lrc_file.get_time(lyric_order + 1)
+            if next_stamp < 0:  # 最后一句 滚动到歌曲结束
+                next_stamp = self.duration
+            roll_time = next_stamp - position
+            self.show_content(lyric_order, roll_time if roll_time != float('inf') else 0)
+            self.show_lookahead(lyric_order)
+            next_stamp = min(next_stamp, done_position + 1)
+        return None if next_stamp == float('inf') else self.deadline_ns(next_stamp)
 
     def show_content(self, lyric_order, roll_time: int):
         """输出歌词"""
-        lrc_file = self.lrc_file
-        time_stamp = lrc_file.get_time(lyric_order)
+        lyric_text = self.lrc_file.get_text(lyric_order)
 
-        if time_stamp == -1 or not lrc_file.trans_non_dict[time_stamp].strip():
+        if not lyric_text.strip():
             return
 
         if self.output_func:  # self.lyrics_window.text_show_signal.emit
-            self.output_func(1, lrc_file.trans_non_dict[time_stamp], roll_time)
-            if lrc_file.empty(self.trans_mode) or self.trans_mode == TransType.NON:
+            self.output_func(1, lyric_text, roll_time)
+            if self.word_output_func and roll_time:
+                word_line = self.lrc_file.get_word_line(lyric_order)
+                if word_line:
+                    self.word_output_func(word_line, max(self.get_time() - word_line.start, 0))
+            if not self.trans_column:
                 self.output_func(2, "", 0)
-            elif self.trans_mode == TransType.CHINESE:
-                self.output_func(2, lrc_file.trans_chinese_dict[time_stamp], roll_time)
-            elif self.trans_mode == TransType.ROMAJI:
-                self.output_func(2, lrc_file.trans_romaji_dict[time_stamp], roll_time)
+            else:
+                self.output_func(2, self.trans_column[lyric_order] or "", roll_time)
+
+    def show_lookahead(self, lyric_order: int):
+        """输出 lyric_order 之后的 LOOKAHEAD_LINES 句非空白歌词"""
+        if not self.lookahead_output_func:
+            return
+        lines = []
+        order = lyric_order + 1
+        while len(lines) < LOOKAHEAD_LINES and self.lrc_file.get_time(order) >= 0:
+            lyric_text = self.lrc_file.get_text(order)
+            if lyric_text.strip():
+                trans_text = (self.trans_column[order] or "") if self.trans_column else ""
+                lines.append((lyric_text, trans_text))
+            order += 1
+        if lines:
+            self.lookahead_output_func(lines)
 
     def play_done_event_connect(self, func):
         """播放完毕的信号连接"""
         self.play_done_event_func = func
 
+    def word_output_connect(self, func):
+        """逐字时间的信号连接"""
+        self.word_output_func = func
 
-class LyricThread(threading.Thread):
-    def __init__(self, player: LrcPlayer):
-        super(LyricThread, self).__init__(target=self._play_lyric_thread, daemon=True)
-        self.sleep = threading.Event()
-
-        self.player_ = weakref.ref(player)
-        self.is_running = True
-
-    def reset_position(self):
-        self.sleep.set()
-
-    def _play_lyric_thread(self):
-        while self.is_running:
-            if self.sleep.is_set() and self.is_running:
-                self.sleep.clear()
-            position = self.player.get_time()
-            lyric_order = self.player.lrc_file.get_order_position(position)
-            next_stamp = self.player.lrc_file.get_time(lyric_order + 1)
-            if position > self.player.duration - 1200:  # 播放完毕
-                if self.player.play_done_event_func and not self.player.is_pause:
-                    self.player.play_done_event_func()  # 发送播放完毕信号
-                self.sleep.wait()
-                continue
-            if next_stamp == -2:
-                self.sleep.wait(0.5)
-                continue
-
-            if lyric_order < 0:  # 无歌词
-                self.sleep.wait(0.5)  # 开始检测何时播放完毕
-                continue
-            elif next_stamp < 0:
-                next_stamp = self.player.duration
-
-            show_time = next_stamp - position
-
-            if show_time < 0:  # 位置判断变化导致时间错误 重新获取
-                continue
-            self.player.show_content(lyric_order, show_time)
-
-            if next_stamp != self.player.duration:  # 播放最后一句时不需要等待
-                self.sleep.wait(show_time / 1000)
-
-            if self.player.is_pause and self.is_running:
-                self.sleep.wait()
-                continue
-
-    def terminate(self):
-        self.is_running = False
-        self.sleep.set()
-
-    @property
-    def player(self):
-        player = self.player_()
-        if not player:
-            self.terminate()
-            raise SystemExit(0)
-        return player
+    def lookahead_output_connect(self, func):
+        """之后几句歌词的信号连接"""
+        self.lookahead_output_func = func
 
 
 if __name__ == '__main__':
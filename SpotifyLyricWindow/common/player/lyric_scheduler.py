@@ -0,0 +1,149 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import heapq
+import inspect
+import itertools
+import threading
+import time
+import weakref
+
+from common.logger import get_logger
+
+logger = get_logger(__name__)
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+class LyricTask:
+    """
+    注册在 LyricScheduler 中的回调
+
+    回调返回下一次需要调用的单调时钟时刻（ns），返回 None 表示等待 wake。
+    绑定方法以弱引用保存，不会因注册而延长播放器的生命周期
+    """
+
+    def __init__(self, scheduler, callback):
+        self.scheduler = scheduler
+        if inspect.ismethod(callback):
+            self._callback_ref = weakref.WeakMethod(callback)
+        else:
+            self._callback_ref = lambda: callback
+        self.generation = 0  # 每次重新安排时递增，堆中代数不一致的条目已失效
+
+    def wake(self):
+        """立即调用回调，取消已安排的时刻"""
+        self.scheduler.schedule(self, 0)
+
+    def cancel(self):
+        self.scheduler.schedule(self, None)
+
+    def run(self):
+        callback = self._callback_ref()
+        if callback is None:
+            return None
+        try:
+            return callback()
+        except Exception:
+            logger.exception("歌词调度回调出错")
+            return None
+
+
+class LyricScheduler:
+    """
+    多个 LrcPlayer 共用的歌词调度线程
+
+    所有任务的下一时刻保存在最小堆中，线程只休眠到最近的时刻；重新安排任务时旧条目不删除，
+    以代数标记失效后在出堆时丢弃，安排与出堆均为 O(log n)
+    """
+
+    def __init__(self, clock=time.monotonic_ns):
+        self._clock = clock
+        self._heap = []  # (deadline_ns, seq, generation, task)
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="lyric_scheduler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def register(self, callback) -> LyricTask:
+        """注册回调，需调用 wake 后才开始调度"""
+        return LyricTask(self, callback)
+
+    def schedule(self, task: LyricTask, deadline_ns):
+        """安排任务在 deadline_ns 时调用，None 则取消"""
+        with self._condition:
+            task.generation += 1
+            if deadline_ns is not None:
+                self._push(task, deadline_ns)
+
+    def _push(self, task: LyricTask, deadline_ns: int):
+        heapq.heappush(self._heap, (deadline_ns, next(self._seq), task.generation, task))
+        if self._heap[0][3] is task:
+            self._condition.notify()
+
+    def _drop_stale(self):
+        heap = self._heap
+        while heap and heap[0][2] != heap[0][3].generation:
+            heapq.heappop(heap)
+
+    def next_deadline(self):
+        """最近的时刻 ns，没有任务时返回 None"""
+        with self._condition:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def run_due(self) -> int:
+        """
+        调用所有已到时刻的任务
+
+        :return: 调用的任务数
+        """
+        count = 0
+        while True:
+            with self._condition:
+                self._drop_stale()
+                if not self._heap or self._heap[0][0] > self._clock():
+                    return count
+                _, _, generation, task = heapq.heappop(self._heap)
+            deadline_ns = task.run()
+            count += 1
+            with self._condition:
+                # 回调期间任务被重新安排时以新的安排为准
+                if task.generation == generation and deadline_ns is not None:
+                    self._push(task, deadline_ns)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running:
+                    self._drop_stale()
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    remaining = self._heap[0][0] - self._clock()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining / 1e9)
+                else:
+                    return
+            self.run_due()
+
+    def close(self, timeout: float = 1.0):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+
+
+def get_lyric_scheduler() -> LyricScheduler:
+    """进程内共用的调度器，首次获取时启动"""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = LyricScheduler()
+            _default_scheduler.start()
+        return _default_scheduler
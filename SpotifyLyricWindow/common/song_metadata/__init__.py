@@ -1,3 +1,3 @@
 #!/usr/bin/python
 # -*- coding:utf-8 -*-
-from .compare_metadata import compare_song_info
+from .compare_metadata import compare_song_info, compare_song_infos
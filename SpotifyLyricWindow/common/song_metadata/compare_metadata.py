@@ -1,10 +1,13 @@
 #!/usr/bin/python
 # -*- coding:utf-8 -*-
+import functools
 
-from fuzzywuzzy import fuzz
+from common.song_metadata import fuzzy_match as fuzz
+from common.song_metadata.fuzzy_match import normalize
 from common.typing import SongInfo
 
 
+@functools.lru_cache(maxsize=1024)
 def __parse_duration(duration_text: str) -> int:
     """把文本格式的时间转化为整型"""
     d_list = duration_text.split(":")
@@ -12,12 +15,15 @@ def __parse_duration(duration_text: str) -> int:
     return time
 
 
-def compare_song_info(song_info_1: SongInfo, song_info_2: SongInfo) -> int:
-    """对比两个歌曲元数据，返回相似度评分"""
-    if not song_info_1 or not song_info_2:
-        return 0
-    duration_1 = __parse_duration(song_info_1.duration)
-    duration_2 = __parse_duration(song_info_2.duration)
+def __prepare(song_info: SongInfo) -> tuple:
+    """(时长, 规范化的歌手, 规范化的曲名, 规范化的专辑)"""
+    return (__parse_duration(song_info.duration), normalize(song_info.singer),
+            normalize(song_info.songName), normalize(song_info.album))
+
+
+def __score(prepared_1: tuple, prepared_2: tuple) -> float:
+    duration_1, singer_1, name_1, album_1 = prepared_1
+    duration_2, singer_2, name_2, album_2 = prepared_2
     score_list = []
     # 时长比较
     if duration_1 and duration_2:
@@ -28,16 +34,36 @@ def compare_song_info(song_info_1: SongInfo, song_info_2: SongInfo) -> int:
         else:
             score_list.append(0)
     # 歌手比较
-    singer_score = fuzz.partial_ratio(song_info_1.singer, song_info_2.singer)
+    singer_score = fuzz.partial_ratio(singer_1, singer_2)
     # 曲名比较
-    name_score = fuzz.partial_ratio(song_info_1.songName, song_info_2.songName)
+    name_score = fuzz.partial_ratio(name_1, name_2)
 
     score_list.extend([singer_score, name_score])
-    if song_info_1.album and song_info_2.album:
-        album_score = fuzz.partial_ratio(song_info_1.album, song_info_2.album)
+    if album_1 and album_2:
+        album_score = fuzz.partial_ratio(album_1, album_2)
         score_list.append(album_score)
     return sum(score_list) / len(score_list)
 
 
+def compare_song_info(song_info_1: SongInfo, song_info_2: SongInfo) -> int:
+    """
+    对比两个歌曲元数据，返回相似度评分
+
+    文本先经过 normalize 规范化；规范化结果与时长解析均有缓存，
+    同一首歌与多个候选对比时只处理一次
+    """
+    if not song_info_1 or not song_info_2:
+        return 0
+    return __score(__prepare(song_info_1), __prepare(song_info_2))
+
 
+def compare_song_infos(song_infos: list, song_info: SongInfo) -> list:
+    """
+    批量对比多个候选歌曲与同一首歌的元数据，返回与 song_infos 顺序一致的相似度评分
 
+    song_info 只规范化一次，评分与逐个调用 compare_song_info(candidate, song_info) 相同
+    """
+    if not song_info:
+        return [0] * len(song_infos)
+    prepared = __prepare(song_info)
+    return [__score(__prepare(candidate), prepared) if candidate else 0 for candidate in song_infos]
@@ -0,0 +1,87 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import functools
+import re
+import unicodedata
+
+# 常见的繁体 / 日文旧字体 / 日文新字体 -> 简体，用于歌名、歌手名的模糊匹配（非完整的繁简转换）
+_KANJI_VARIANTS = str.maketrans(
+    "愛戀夢樂雙時們說為東風聲淚涙憶歲歳與後裡裏會當來這個対對麼還讓沒遠國華紅長無見開話邊辺戰戦劍剣龍竜鳥傳伝記過單単車雲體絲"
+    "陽歡舊憂聽聴語寫亂氣気戲戯晝黃櫻桜關関讀読線緑綠藍銀鐘鈴燈葉飛聖魚馬貓號間門問誰變変約結終縁緣壞壊實実歸帰選隣鄰涼",
+    "爱恋梦乐双时们说为东风声泪泪忆岁岁与后里里会当来这个对对么还让没远国华红长无见开话边边战战剑剑龙龙鸟传传记过单单车云体丝"
+    "阳欢旧忧听听语写乱气气戏戏昼黄樱樱关关读读线绿绿蓝银钟铃灯叶飞圣鱼马猫号间门问谁变变约结终缘缘坏坏实实归归选邻邻凉",
+)
+
+# (feat. xxx) / [Remastered] / 【MV】 等括号内容，以及末尾的 feat. xxx
+_BRACKET_PATTERN = re.compile(r"\([^()]*\)|\[[^\[\]]*]|【[^【】]*】|<[^<>]*>")
+_FEAT_PATTERN = re.compile(r"\s+(?:feat\.?|ft\.?|featuring)\s.*$")
+_SPACE_PATTERN = re.compile(r"\s+")
+
+_HIRAGANA_OFFSET = ord("ぁ") - ord("ァ")
+
+
+def _fold_kana(text: str) -> str:
+    """片假名转为平假名"""
+    return "".join(chr(ord(ch) + _HIRAGANA_OFFSET) if "ァ" <= ch <= "ヶ" else ch for ch in text)
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize(text: str) -> str:
+    """
+    规范化歌名、歌手等文本：全角半角统一（NFKC）、忽略大小写、片假名转平假名、常见异体字统一，
+    去除括号内容与 feat.（去除后为空时保留）
+    """
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    stripped = _FEAT_PATTERN.sub("", _BRACKET_PATTERN.sub(" ", text))
+    if stripped.strip():
+        text = stripped
+    text = _fold_kana(text).translate(_KANJI_VARIANTS)
+    return _SPACE_PATTERN.sub(" ", text).strip()
+
+
+@functools.lru_cache(maxsize=4096)
+def _pattern_masks(pattern: str) -> dict:
+    """字符 -> 在 pattern 中出现位置的位掩码"""
+    masks = {}
+    for i, ch in enumerate(pattern):
+        masks[ch] = masks.get(ch, 0) | (1 << i)
+    return masks
+
+
+def window_lcs(pattern: str, text: str) -> int:
+    """
+    pattern 与 text 中长度为 len(pattern) 的各个窗口（text 较短时为整个 text）的最长公共子序列长度的最大值
+
+    位并行算法（Allison-Dix / Hyyrö），每个窗口字符只需常数次整数运算
+    """
+    m = len(pattern)
+    if not m or not text:
+        return 0
+    masks = _pattern_masks(pattern)
+    full = (1 << m) - 1
+    best = 0
+    for start in range(max(len(text) - m, 0) + 1):
+        v = full
+        for ch in text[start:start + m]:
+            u = v & masks.get(ch, 0)
+            v = ((v + u) | (v - u)) & full
+        # v 中置 0 的位数即为公共子序列长度
+        best = max(best, m - bin(v).count("1"))
+        if best == m:
+            break
+    return best
+
+
+def partial_ratio(text_1: str, text_2: str) -> int:
+    """
+    较短的文本与较长文本中最相似的等长子串的相似度（0 - 100），与 fuzzywuzzy.fuzz.partial_ratio 含义相同
+
+    相似度按匹配字符计算（2 * 匹配数 / 总长度），替换一个字符只损失该字符，
+    评分尺度与 fuzzywuzzy 一致，download_lrc 的 min_score 阈值无需调整
+    """
+    if not text_1 or not text_2:
+        return 0
+    shorter, longer = (text_1, text_2) if len(text_1) <= len(text_2) else (text_2, text_1)
+    return round(100 * window_lcs(shorter, longer) / len(shorter))
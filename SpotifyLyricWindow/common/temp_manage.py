@@ -1,14 +1,33 @@
 #!/usr/bin/python
 # -*- coding:utf-8 -*-
+import hashlib
 import io
 import json
 import time
 import weakref
+from collections import OrderedDict
+
+from PyQt6.QtGui import QPixmap
+
+from common.config import Config
+from common.logger import get_logger
 from common.path import TEMP_DATA_FILE_PATH, TEMP_IMAGE_PATH
+from common.persistence import DebouncedJsonWriter
+
+logger = get_logger(__name__)
+
+PIXMAP_CACHE_SIZE = 32
 
 
 class TempFileManage:
-    """临时文件管理类（单例）"""
+    """
+    临时文件管理类（单例）
+
+    封面按内容哈希存储为 <hash>.jpg，同一专辑的多首歌曲共用一份文件。
+    temp.json 中:
+    image: track_id -> {"hash", "last_time"}
+    blob: hash -> {"size", "last_time"}，按最近使用排序，超出大小上限时从头部淘汰
+    """
     _instance = None
     _is_init = False
 
@@ -21,56 +40,162 @@ class TempFileManage:
 
     def __init__(self):
         if not self._is_init:
-            with TEMP_DATA_FILE_PATH.open(encoding="utf-8") as f:
-                self.temp_data_json = json.load(f)
-            keys = ["image"]
+            try:
+                with TEMP_DATA_FILE_PATH.open(encoding="utf-8") as f:
+                    self.temp_data_json = json.load(f)
+            except (OSError, ValueError):
+                logger.warning("temp.json 读取失败，使用空数据: %s", TEMP_DATA_FILE_PATH, exc_info=True)
+                self.temp_data_json = {}
+            self.temp_data_writer = DebouncedJsonWriter(TEMP_DATA_FILE_PATH, lambda: self.temp_data_json)
+            keys = ["image", "blob"]
 
             for base_key in keys:
                 if base_key not in self.temp_data_json:
                     self.temp_data_json[base_key] = {}
 
+            self.cache_limit = Config.CommonConfig.PathConfig.temp_cache_limit
+            self._cache_size = sum(blob["size"] for blob in self.temp_data_json["blob"].values())
+            self._pixmap_cache = OrderedDict()
+            self._migrate_legacy_image()
+
             self._is_init = True
 
+    @staticmethod
+    def _get_blob_path(image_hash: str):
+        return TEMP_IMAGE_PATH / (image_hash + ".jpg")
+
+    def _migrate_legacy_image(self):
+        """旧版以 <track_id>.jpg 存储的封面转为按内容哈希存储"""
+        legacy_ids = [track_id for track_id, data in self.temp_data_json["image"].items() if "hash" not in data]
+        for track_id in legacy_ids:
+            legacy_path = TEMP_IMAGE_PATH / (track_id + ".jpg")
+            data = legacy_path.read_bytes() if legacy_path.exists() else b""
+            del self.temp_data_json["image"][track_id]
+            if data:
+                legacy_path.unlink()
+                self._store_image(track_id, data)
+        if legacy_ids:
+            self.temp_data_writer.mark_dirty()
+
+    def _touch_blob(self, image_hash: str, now: int):
+        """将封面移至最近使用的位置"""
+        blob_data = self.temp_data_json["blob"].pop(image_hash)
+        blob_data["last_time"] = now
+        self.temp_data_json["blob"][image_hash] = blob_data
+
+    def _store_image(self, track_id: str, data: bytes):
+        image_hash = hashlib.sha1(data).hexdigest()
+        now = int(time.time())
+        with self.temp_data_writer.lock:
+            if image_hash in self.temp_data_json["blob"]:
+                self._touch_blob(image_hash, now)
+            else:
+                self._get_blob_path(image_hash).write_bytes(data)
+                self.temp_data_json["blob"][image_hash] = {"size": len(data), "last_time": now}
+                self._cache_size += len(data)
+            self.temp_data_json["image"][track_id] = {"hash": image_hash, "last_time": now}
+            self._evict()
+
+    def _evict(self):
+        """按最近最少使用淘汰封面，直至缓存大小不超过上限（至少保留最近的一份）"""
+        blob_dict = self.temp_data_json["blob"]
+        while self._cache_size > self.cache_limit and len(blob_dict) > 1:
+            self._delete_blob(next(iter(blob_dict)))
+
+    def _delete_blob(self, image_hash: str):
+        blob_data = self.temp_data_json["blob"].pop(image_hash)
+        self._cache_size -= blob_data["size"]
+        self._pixmap_cache.pop(image_hash, None)
+        self._get_blob_path(image_hash).unlink(missing_ok=True)
+
+    def _get_image_hash(self, track_id):
+        """获取歌曲对应封面的哈希，并更新使用时间；封面已被淘汰时返回 None"""
+        with self.temp_data_writer.lock:
+            track_data = self.temp_data_json["image"].get(track_id)
+            if track_data is None:
+                return None
+            image_hash = track_data["hash"]
+            if image_hash not in self.temp_data_json["blob"]:
+                del self.temp_data_json["image"][track_id]
+                self.temp_data_writer.mark_dirty()
+                return None
+            # 只更新内存中的使用时间，由后台线程延迟写入
+            now = int(time.time())
+            track_data["last_time"] = now
+            self._touch_blob(image_hash, now)
+        self.temp_data_writer.mark_dirty()
+        return image_hash
+
+    def has_temp_image(self, track_id) -> bool:
+        """是否已缓存歌曲封面（不更新使用时间）"""
+        with self.temp_data_writer.lock:
+            track_data = self.temp_data_json["image"].get(track_id)
+            return track_data is not None and track_data["hash"] in self.temp_data_json["blob"]
+
     def delete_temp_image(self, track_id):
-        """删除对应的缓存图片"""
-        file_path = TEMP_IMAGE_PATH / (track_id + ".jpg")
-        if file_path.exists():
-            file_path.unlink()
-        self.temp_data_json["image"].pop(track_id)
+        """删除歌曲与封面的对应，封面文件由淘汰机制清理"""
+        with self.temp_data_writer.lock:
+            self.temp_data_json["image"].pop(track_id, None)
+        self.temp_data_writer.mark_dirty()
 
     def save_temp_image(self, track_id, img_io: io.BytesIO):
         """将下载到的图片载入临时文件文件夹"""
-        if not img_io:
+        if not img_io or not img_io.getvalue():
             return
-        self.temp_data_json["image"][track_id] = {"last_time": int(time.time())}
-        self.json_save()
-        file_path = TEMP_IMAGE_PATH / (track_id + ".jpg")
-        file_path.write_bytes(img_io.getvalue())
+        self._store_image(track_id, img_io.getvalue())
+        self.temp_data_writer.mark_dirty()
 
     def get_temp_image(self, track_id) -> io.BytesIO:
         """获取临时缓存的图片，若不存在，则返回空io对象"""
-        if track_id in self.temp_data_json["image"]:
-            file_path = TEMP_IMAGE_PATH / (track_id + ".jpg")
-            if not file_path.exists():
-                self.delete_temp_image(track_id)
-                return io.BytesIO()
-            self.temp_data_json["image"][track_id]["last_time"] = int(time.time())
-            self.json_save()
-            return io.BytesIO(file_path.read_bytes())
-        else:
+        image_hash = self._get_image_hash(track_id)
+        if image_hash is None:
+            return io.BytesIO()
+        file_path = self._get_blob_path(image_hash)
+        if not file_path.exists():
+            with self.temp_data_writer.lock:
+                self._delete_blob(image_hash)
             return io.BytesIO()
+        return io.BytesIO(file_path.read_bytes())
+
+    def get_temp_pixmap(self, track_id):
+        """获取临时缓存图片解码后的 QPixmap（仅限主线程），若不存在，则返回 None"""
+        image_hash = self._get_image_hash(track_id)
+        if image_hash is None:
+            return None
+        if image_hash in self._pixmap_cache:
+            self._pixmap_cache.move_to_end(image_hash)
+            return self._pixmap_cache[image_hash]
+
+        image = self.get_temp_image(track_id)
+        pixmap = QPixmap()
+        if not pixmap.loadFromData(image.getvalue()):
+            return None
+        self._pixmap_cache[image_hash] = pixmap
+        if len(self._pixmap_cache) > PIXMAP_CACHE_SIZE:
+            self._pixmap_cache.popitem(last=False)
+        return pixmap
 
     def auto_clean_temp(self):
         """自动清理临时文件，最近一次使用距今3天将被清除"""
-        for temp_id in list(self.temp_data_json["image"].keys()):
-            if int(time.time()) - self.temp_data_json["image"][temp_id]["last_time"] >= 259200:
-                self.delete_temp_image(temp_id)
+        now = int(time.time())
+        with self.temp_data_writer.lock:
+            for image_hash, blob_data in list(self.temp_data_json["blob"].items()):
+                if now - blob_data["last_time"] >= 259200:
+                    self._delete_blob(image_hash)
+            blob_dict = self.temp_data_json["blob"]
+            for track_id, track_data in list(self.temp_data_json["image"].items()):
+                if track_data["hash"] not in blob_dict:
+                    del self.temp_data_json["image"][track_id]
+        self.temp_data_writer.mark_dirty()
 
     def clean_all_temp(self):
         """清理掉所有的临时图片"""
-        for temp_id in list(self.temp_data_json["image"].keys()):
-            self.delete_temp_image(temp_id)
+        with self.temp_data_writer.lock:
+            for image_hash in list(self.temp_data_json["blob"].keys()):
+                self._delete_blob(image_hash)
+            self.temp_data_json["image"].clear()
+        self.temp_data_writer.mark_dirty()
 
-    def json_save(self):
-        with TEMP_DATA_FILE_PATH.open("w", encoding="utf-8") as f:
-            f.write(json.dumps(self.temp_data_json, indent=4, ensure_ascii=False))
+    def flush(self):
+        """立即写入未保存的临时文件数据"""
+        self.temp_data_writer.flush()
@@ -5,7 +5,7 @@ from enum import Enum
 from common.lyric.lyric_type import TransType, LrcFile, KrcFile, MrcFile
 from common.song_metadata.metadata_type import SongInfo, SongElseInfo, SongSearchInfo
 from common.media_session.media_session_type import MediaPlaybackInfo, MediaPropertiesInfo
-from common.api.user_api.user_api import UserCurrentPlaying
+from common.api.user_api.user_api import UserCurrentPlaying, UserQueueTrack
 from typing import List, Dict, Callable
 
 
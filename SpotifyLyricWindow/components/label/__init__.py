@@ -2,3 +2,4 @@
 # -*- coding:utf-8 -*-
 from .vertical_label import VerticalLabel
 from .horizontal_label import HorizontalLabel
+from .text_layout import TextLayout
@@ -5,11 +5,30 @@ from PyQt6.QtGui import *
 from PyQt6.QtWidgets import *
 from PyQt6.QtCore import *
 
+from components.label.text_layout import TextLayout
+
 
 class HorizontalLabel(QLabel):
     def __init__(self, parent=None):
         super(HorizontalLabel, self).__init__(parent)
+        self.text_layout = TextLayout("", 0, 0, None)
+
+    def layout_text(self, text: str) -> TextLayout:
+        """计算文本排版，可提前调用"""
+        font_metrics = QFontMetrics(self.font())
+        return TextLayout(text, font_metrics.horizontalAdvance(text), font_metrics.height(), None)
+
+    def set_layout(self, layout: TextLayout):
+        """使用已计算好的排版设置文本"""
+        self.text_layout = layout
+        self.setText(layout.text)
+
+    def setFont(self, font: QFont):
+        super(HorizontalLabel, self).setFont(font)
+        self.text_layout = self.layout_text(self.text())
 
     def getTextSize(self):
         """满足和竖向label同函数格式"""
-        return QFontMetrics(self.font()).horizontalAdvance(self.text())
+        if self.text_layout.text != self.text():
+            self.text_layout = self.layout_text(self.text())
+        return self.text_layout.size
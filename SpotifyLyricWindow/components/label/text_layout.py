@@ -0,0 +1,6 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import collections
+
+# 预先计算的文本排版  size: 文本在滚动方向上的长度  line_height: 字体行高  glyphs: 竖向文本各段的绘制位置
+TextLayout = collections.namedtuple("TextLayout", ["text", "size", "line_height", "glyphs"])
@@ -5,45 +5,73 @@ from PyQt6.QtGui import *
 from PyQt6.QtWidgets import *
 from PyQt6.QtCore import *
 
+from components.label.text_layout import TextLayout
+
 
 class VerticalLabel(QLabel):
     def __init__(self, parent=None):
         super(VerticalLabel, self).__init__(parent)
-        self.text_height = 0
+        self.text_layout = TextLayout("", 0, 0, [])
 
-    def paintEvent(self, a0: QPaintEvent) -> None:
-        painter = QPainter(self)
+    def layout_text(self, text: str) -> TextLayout:
+        """
+        计算文本排版，可提前调用
 
-        self.text_height = 0  # 记录文本高度 已用于绘画文本
-        ascii_text = ""
+        ASCII字符横过来写，非ASCII字符竖着写；glyphs 为 [(是否旋转, 竖直方向位置, 文本), ...]
+        """
         font_metrics = QFontMetrics(self.font())
-
-        other_size = self.width() - font_metrics.height()
-        paint_x = other_size  # 文本布局需要手动计算 将文本写于水平方向靠右
-
-        # 以下目的为 ASCII字符横过来写，非ASCII字符竖着写
-        for ch in self.text():
+        line_height = font_metrics.height()
+        glyphs = []
+        text_height = 0
+        ascii_text = ""
+        for ch in text:
             if ch.isascii():
                 ascii_text += ch
             else:
-                painter.rotate(90)
                 if ascii_text:
-                    # painter 被旋转，坐标轴也会跟着变化 参考(x,y) 等价于 (y,-x) 10为补偿经验值
-                    painter.drawText(QPoint(self.text_height, -paint_x - 10), ascii_text)
-                    self.text_height += font_metrics.horizontalAdvance(ascii_text)
+                    glyphs.append((True, text_height, ascii_text))
+                    text_height += font_metrics.horizontalAdvance(ascii_text)
                     ascii_text = ""
-                painter.rotate(-90)
-                self.text_height += font_metrics.height()
-                painter.drawText(QPoint(paint_x, self.text_height), ch)
-        painter.rotate(90)
+                text_height += line_height
+                glyphs.append((False, text_height, ch))
         if ascii_text:
-            painter.drawText(QPoint(self.text_height, -paint_x - 10), ascii_text)
-            self.text_height += font_metrics.horizontalAdvance(ascii_text)
+            glyphs.append((True, text_height, ascii_text))
+            text_height += font_metrics.horizontalAdvance(ascii_text)
+
+        text_height += 1 * line_height  # 经验值 补偿
+        return TextLayout(text, text_height, line_height, glyphs)
 
-        self.text_height += 1 * font_metrics.height()  # 经验值 补偿
+    def set_layout(self, layout: TextLayout):
+        """使用已计算好的排版设置文本"""
+        self.text_layout = layout
+        self.setText(layout.text)
+
+    def setFont(self, font: QFont):
+        super(VerticalLabel, self).setFont(font)
+        self.text_layout = self.layout_text(self.text())
+
+    def current_layout(self) -> TextLayout:
+        if self.text_layout.text != self.text():
+            self.text_layout = self.layout_text(self.text())
+        return self.text_layout
+
+    def paintEvent(self, a0: QPaintEvent) -> None:
+        painter = QPainter(self)
+        layout = self.current_layout()
+
+        paint_x = self.width() - layout.line_height  # 文本布局需要手动计算 将文本写于水平方向靠右
+
+        for rotated, position, text in layout.glyphs:
+            if rotated:
+                # painter 被旋转，坐标轴也会跟着变化 参考(x,y) 等价于 (y,-x) 10为补偿经验值
+                painter.rotate(90)
+                painter.drawText(QPoint(position, -paint_x - 10), text)
+                painter.rotate(-90)
+            else:
+                painter.drawText(QPoint(paint_x, position), text)
 
         super(VerticalLabel, self).paintEvent(a0)
 
     def getTextSize(self):
         """获取当前播放歌词的高度, 可用于计算滚动参数"""
-        return self.text_height
+        return self.current_layout().size
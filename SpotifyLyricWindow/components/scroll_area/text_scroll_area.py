@@ -1,14 +1,17 @@
 #!/usr/bin/python
 # -*- coding:utf-8 -*-
 import math
+from collections import deque
 
 from PyQt6.QtGui import *
 from PyQt6.QtWidgets import *
 from PyQt6.QtCore import *
-from components.label import VerticalLabel, HorizontalLabel
+from components.label import VerticalLabel, HorizontalLabel, TextLayout
 from common.typing import DisplayMode
 from common.config import Config
 
+PREPARED_LAYOUT_SIZE = 8  # 预先排版的文本数量
+
 
 class TextScrollArea(QScrollArea):
     def __init__(self, parent=None):
@@ -35,6 +38,8 @@ class TextScrollArea(QScrollArea):
         self.vertical_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         # setAttribute(Qt.WA_TranslucentBackground, True)
 
+        self.prepared_layouts = deque(maxlen=PREPARED_LAYOUT_SIZE)  # 之后将要显示的文本排版（环形缓冲）
+
     def _init_roll(self):
         """初始化 滚动相关参数"""
         self.timer_tick_lag = 20  # 刷新时间间隔
@@ -48,6 +53,10 @@ class TextScrollArea(QScrollArea):
         self.current_tick = 0
         self.is_roll = False
 
+        # 逐字时间 存在时滚动跟随正在演唱的字
+        self.word_line = None
+        self.word_elapsed = 0
+
         self.horizontal_scrollbar = self.horizontalScrollBar()
         self.vertical_scrollbar = self.verticalScrollBar()
 
@@ -76,7 +85,8 @@ class TextScrollArea(QScrollArea):
     def set_text(self, text=''):
         """设置文本，滚动复位"""
         lyrics_label = self.get_current_label()
-        lyrics_label.setText(text)
+        lyrics_label.set_layout(self._take_layout(text))
+        self.word_line = None
         self.get_current_scrollbar().setValue(0)  # 滚动条复位
         self.refresh_label_size()
 
@@ -85,6 +95,18 @@ class TextScrollArea(QScrollArea):
         else:
             self.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
+    def prepare_text(self, text: str):
+        """提前排版之后将要显示的文本，显示时不再计算字体度量"""
+        if not text or any(layout.text == text for layout in self.prepared_layouts):
+            return
+        self.prepared_layouts.append(self.get_current_label().layout_text(text))
+
+    def _take_layout(self, text: str) -> TextLayout:
+        for layout in self.prepared_layouts:
+            if layout.text == text:
+                return layout
+        return self.get_current_label().layout_text(text)
+
     def set_roll_time(self, roll_time: int):
         """依据roll_time通过神奇的计算公式得到滚动需要的两个参数"""
         text_size = self.get_current_label().getTextSize()
@@ -103,6 +125,16 @@ class TextScrollArea(QScrollArea):
         self.begin_tick = 0.5 * (1 - self.roll_time_rate) * roll_time // self.timer_tick_lag
         self.begin_tick = int(self.begin_tick)
 
+    def set_word_line(self, word_line, elapsed: int = 0):
+        """
+        设置当前行的逐字时间，需在 set_roll_time 之后调用
+
+        :param word_line: WordTimedLine
+        :param elapsed: 设置时该行已经播放的时长 ms
+        """
+        self.word_line = word_line
+        self.word_elapsed = elapsed
+
     def refresh_label_size(self):
         """刷新文本框大小，防止卡住不动"""
         text_size = self.get_current_label().getTextSize()
@@ -141,6 +173,7 @@ class TextScrollArea(QScrollArea):
         self.vertical_label.setStyleSheet(stylesheet)
 
     def setFont(self, font: QFont):
+        self.prepared_layouts.clear()  # 排版与字体相关
         self.horizontal_label.setFont(font)
         self.vertical_label.setFont(font)
         return super(TextScrollArea, self).setFont(font)
@@ -150,7 +183,17 @@ class TextScrollArea(QScrollArea):
         self.refresh_label_size()
         if self.is_roll:
             self.current_tick += 1
-            if self.current_tick > self.begin_tick:
+            if self.word_line is not None:
+                # 将正在演唱的字滚动到中间
+                elapsed = self.current_tick * self.timer_tick_lag + self.word_elapsed
+                text_size = self.get_current_label().getTextSize()
+                if self.display_mode == DisplayMode.Horizontal:
+                    view_size = self.width()
+                else:
+                    view_size = self.height()
+                scrollbar = self.get_current_scrollbar()
+                scrollbar.setValue(int(self.word_line.progress(elapsed) * text_size - view_size / 2))
+            elif self.current_tick > self.begin_tick:
                 # 滚动字幕
                 scrollbar = self.get_current_scrollbar()
                 scrollbar.setValue((self.current_tick - self.begin_tick) * self.move_step)
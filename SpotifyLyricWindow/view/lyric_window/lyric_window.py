@@ -13,10 +13,14 @@ from PyQt6.QtCore import *
 from PyQt6.QtGui import *
 from PyQt6.QtWidgets import *
 from common.api.exceptions import UserError, NoPermission, NetworkError, NoActiveUser
+from common.api.http_session import close_sessions
 from common.api.user_api import SpotifyUserApi
 from common.config import Config
 from common.lyric import LyricFileManage
-from common.lyric.lyric_download import download_lrc
+from common.lyric.lyric_download import download_lrc_result, FOUND
+from common.lyric.lyric_manage import NETWORK_ERROR
+from common.lyric.lyric_prefetch import LyricPrefetcher
+from common.lyric.lyric_retry import LyricRetryScheduler
 from common.logger import get_logger, init_logging
 from common.player import LrcPlayer
 from common.temp_manage import TempFileManage
@@ -70,6 +74,9 @@ class CatchError:
 class LyricsWindow(LyricsWindowView):
     error_msg_show_signal = pyqtSignal(object)
     text_show_signal = pyqtSignal(int, str, int)
+    word_line_show_signal = pyqtSignal(object, int)
+    lyric_lookahead_signal = pyqtSignal(list)
+    lyric_found_signal = pyqtSignal(str)
 
     def __init__(self, parent=None):
         super(LyricsWindow, self).__init__(parent)
@@ -105,7 +112,12 @@ class LyricsWindow(LyricsWindowView):
 
         self.error_msg_show_signal.connect(self._error_msg_show_event)
         self.text_show_signal.connect(self.set_lyrics_text)
+        self.word_line_show_signal.connect(self.set_lyrics_word_line)
+        self.lyric_lookahead_signal.connect(self.prepare_lyrics_text)
+        self.lyric_found_signal.connect(self._lyric_found_event)
         self.lrc_player.play_done_event_connect(self.player_done_event)
+        self.lrc_player.word_output_connect(self.word_line_show_signal.emit)
+        self.lrc_player.lookahead_output_connect(self.lyric_lookahead_signal.emit)
 
     def _init_lrc_player(self):
         """初始化歌词播放器"""
@@ -114,11 +126,16 @@ class LyricsWindow(LyricsWindowView):
     def _init_common(self):
         """初始化其他辅助部件"""
         self.lyric_file_manage = LyricFileManage()
+        self.lyric_file_manage.watch_lyric_dir()
+        self.lyric_file_manage.notifier().lyric_updated.connect(self._lyric_updated_event)
         self.temp_manage = TempFileManage()
 
         self.user_trans = TransType(Config.LyricConfig.trans_type)
 
         self.spotify_auth = SpotifyUserApi()
+        self.lyric_prefetcher = LyricPrefetcher(self.spotify_auth)
+        self.lyric_retry_scheduler = LyricRetryScheduler(found_func=self.lyric_found_signal.emit)
+        self.lyric_retry_scheduler.start()
         self.delay_timer = QTimer()
         self.delay_timer.setSingleShot(True)
         self.delay_timer.timeout.connect(self.calibration_event)
@@ -179,6 +196,7 @@ class LyricsWindow(LyricsWindowView):
                 self.lrc_player.seek_to_position(0)
                 self._manual_skip_flag = True
             self.lrc_player.set_pause(not (playback_info.playStatus == 4))
+            self.lyric_prefetcher.prefetch_user_queue()
         else:
             if not self._manual_skip_flag:
                 # 自动切换到下一首歌 将会有将近700ms的歌曲准备时间导致时间定位不准确
@@ -207,7 +225,8 @@ class LyricsWindow(LyricsWindowView):
             # 由于切换到下一首歌会同时触发timeline和properties的变化信号，利用position<500过滤掉切换歌时候的timeline信号
             self.lrc_player.seek_to_position(info.position, is_show_last_lyric=False)
             return
-        self.lrc_player.seek_to_position(info.position)
+        # 进度报告与计时器偏差较小时不做处理，避免重复刷新当前歌词
+        self.lrc_player.sync_position(info.position)
 
     @thread_drive()
     @CatchError
@@ -251,6 +270,7 @@ class LyricsWindow(LyricsWindowView):
             user_current = self._refresh_player_track(user_current)
 
         self.lrc_player.set_pause(not user_current.is_playing)
+        self.lyric_prefetcher.prefetch_user_queue()
 
         if not self.media_session.is_connected() or use_api_position:
             self.lrc_player.seek_to_position(user_current.progress_ms)
@@ -410,31 +430,51 @@ class LyricsWindow(LyricsWindowView):
         :param user_current: 用户播放信息
         :return: 返回输入的用户播放信息
         """
-        found_data = self.lyric_file_manage.get_not_found(user_current.track_id)
-        if found_data and int(time.time()) - found_data["last_time"] < 24 * 3600:
-            # 最近 24h 内自动下载过但是失败 将在 24h 后重试 24h 内将不重试
-            self.text_show_signal.emit(1, f"{user_current.track_name} - {user_current.artist}", 0)
+        track_title = f"{user_current.track_name} - {user_current.artist}"
+        if self.lyric_file_manage.get_not_found(user_current.track_id):
+            # 查找失败过的歌曲交由后台队列按退避时间重试，找到后再校准
+            self.lyric_retry_scheduler.request(user_current.track_id, track_title)
+            self.text_show_signal.emit(1, track_title, 0)
             self.text_show_signal.emit(2, self.tr("无歌词"), 0)
             return self._refresh_player_track()
 
         self.text_show_signal.emit(1, self.tr("查找歌词中！"), 0)
         self.text_show_signal.emit(2, self.tr("(〃'▽'〃)"), 0)
 
-        is_success = download_lrc(f"{user_current.track_name} - {user_current.artist}", user_current.track_id)
-        if not is_success:  # 没有成功下载
-            self.lyric_file_manage.set_not_found(user_current.track_id,
-                                                 f"{user_current.track_name} - {user_current.artist}")
-            self.text_show_signal.emit(1, f"{user_current.track_name} - {user_current.artist}", 0)
+        try:
+            result = download_lrc_result(track_title, user_current.track_id,
+                                         deadline=Config.CommonConfig.lyric_deadline or None)
+        except NetworkError:
+            self.lyric_file_manage.set_not_found(user_current.track_id, track_title, NETWORK_ERROR)
+            raise
+        if result != FOUND:  # 没有成功下载
+            if not self.lyric_file_manage.is_lyric_exist(user_current.track_id):  # 后台查找可能已经找到
+                self.lyric_file_manage.set_not_found(user_current.track_id, track_title, result)
+            self.text_show_signal.emit(1, track_title, 0)
             self.text_show_signal.emit(2, self.tr("无歌词"), 0)
         self.delay_calibration()
         return self._refresh_player_track()
 
+    def _lyric_found_event(self, track_id: str):
+        """后台重试找到歌词，若仍在播放该歌曲则重新校准"""
+        if track_id == self.lrc_player.track_id:
+            self.calibration_event(no_text_show=True)
+
+    def _lyric_updated_event(self, track_id: str):
+        """当前歌曲的歌词被替换为更好的结果时重新载入"""
+        if track_id == self.lrc_player.track_id:
+            self.lrc_player.reload_lyric()
+
     def closeEvent(self, event: QCloseEvent):
         self.delay_timer.stop()
         self.lrc_player.close()
+        self.lyric_prefetcher.close()
+        self.lyric_retry_scheduler.close()
         del self.lrc_player
         del self.lyric_file_manage
         self.temp_manage.auto_clean_temp()
+        self.temp_manage.flush()
+        close_sessions()
         super(LyricsWindow, self).closeEvent(event)
 
 
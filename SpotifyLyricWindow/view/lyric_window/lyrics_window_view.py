@@ -384,6 +384,25 @@ class LyricsWindowView(QWidget, Ui_HorizontalLyricsWindow, Ui_VerticalLyricsWind
             self.below_scrollArea.set_text(text)
             self.below_scrollArea.set_roll_time(roll_time)
 
+    def prepare_lyrics_text(self, lines: list):
+        """
+        提前排版之后将要显示的歌词，切换歌词时直接使用
+
+        :param lines: [(上行歌词, 下行歌词), ...]
+        """
+        for text, trans_text in lines:
+            self.above_scrollArea.prepare_text(text)
+            self.below_scrollArea.prepare_text(trans_text)
+
+    def set_lyrics_word_line(self, word_line, elapsed: int = 0):
+        """
+        设置上行歌词的逐字时间
+
+        :param word_line: WordTimedLine
+        :param elapsed: 该行已经播放的时长 ms
+        """
+        self.above_scrollArea.set_word_line(word_line, elapsed)
+
     def set_always_front(self, flag: bool):
         """
         设置窗口是否在最上层
@@ -3,8 +3,10 @@
 import weakref
 
 from requests.exceptions import ProxyError
+from PyQt6.QtCore import QTimer
 from PyQt6.QtWidgets import *
 
+from common.api.provider_health import get_all_provider_health, CLOSED, OPEN, HALF_OPEN
 from common.api.user_api import SpotifyUserAuth
 from common.config import Config
 from common.lyric import LyricFileManage
@@ -38,6 +40,14 @@ class CommonPage(QWidget, Ui_CommonPage):
         self.cache_tip_label.setText("")
         self.lyrics_tip_label.setText("")
 
+        # 各歌词源的健康状态，页面显示时定时刷新
+        self.provider_health_label = QLabel(self)
+        self.provider_health_label.setObjectName("provider_health_label")
+        self.common_gridLayout.addWidget(self.provider_health_label, 9, 0, 1, 2)
+        self.provider_health_timer = QTimer(self)
+        self.provider_health_timer.setInterval(2000)
+        self.provider_health_timer.timeout.connect(self.refresh_provider_health)
+
     def _init_line_edit(self):
         """初始化lineEdit"""
         self.secret_lineEdit.setEchoMode(QLineEdit.EchoMode.PasswordEchoOnEdit)
@@ -166,6 +176,25 @@ class CommonPage(QWidget, Ui_CommonPage):
     def _save_position_event(self):
         self.set_check_box_event(self.save_position_checkBox)
 
+    def refresh_provider_health(self):
+        """显示各提供方的状态、延迟（p50 / p95）与错误率"""
+        state_text = {CLOSED: self.tr("正常"), OPEN: self.tr("暂停请求"), HALF_OPEN: self.tr("恢复中")}
+        lines = []
+        for info in get_all_provider_health():
+            latency = f"{info.p50:.2f}s / {info.p95:.2f}s" if info.p50 is not None else "-"
+            lines.append(f"{info.provider}: {state_text[info.state]}  {self.tr('延迟')} {latency}  "
+                         f"{self.tr('错误率')} {info.error_rate:.0%}")
+        self.provider_health_label.setText("\n".join(lines))
+
+    def showEvent(self, event):
+        self.refresh_provider_health()
+        self.provider_health_timer.start()
+        super(CommonPage, self).showEvent(event)
+
+    def hideEvent(self, event):
+        self.provider_health_timer.stop()
+        super(CommonPage, self).hideEvent(event)
+
     def path_change_tip_event(self, tip_label: QLabel):
         """修改路径事件"""
         tip_label.setText(self.tr("路径修改将在重启后生效"))
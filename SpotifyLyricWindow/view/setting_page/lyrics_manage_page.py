@@ -10,8 +10,10 @@ from PyQt6.QtGui import *
 from PyQt6.QtWidgets import *
 
 from common.api.lyric_api import SpotifyApi
-from common.api.exceptions import NetworkError
+from common.api.exceptions import NetworkError, UserError
+from common.api.user_api import SpotifyUserApi
 from common.logger import get_logger
+from common.lyric.lyric_backfill import LyricBackfillJob
 from common.lyric.lyric_manage import LyricFileManage
 from common.typing import TransType, LrcFile
 from common.temp_manage import TempFileManage
@@ -42,6 +44,7 @@ class LyricsManagePage(QWidget, Ui_LyricsManage):
     set_plain_text_signal = pyqtSignal(str)
     set_detail_label_signal = pyqtSignal(tuple)
     set_cover_pixmap_signal = pyqtSignal(str, object)
+    backfill_done_signal = pyqtSignal(object)
 
     def __init__(self, parent=None, *, setting_window=None):
         super(LyricsManagePage, self).__init__(parent)
@@ -66,6 +69,7 @@ class LyricsManagePage(QWidget, Ui_LyricsManage):
         self.lyrics_file_items = []
         self._current_cover_track_id = ""
         self._is_destroyed = False
+        self.backfill_job = None
 
     def _init_label(self):
         """初始化标签"""
@@ -97,6 +101,7 @@ class LyricsManagePage(QWidget, Ui_LyricsManage):
         self.set_plain_text_signal.connect(self._set_plain_text_event)
         self.set_detail_label_signal.connect(self._set_detail_label_event)
         self.set_cover_pixmap_signal.connect(self._set_cover_pixmap_event)
+        self.backfill_done_signal.connect(self._backfill_done_event)
         self.lyrics_file_manage.notifier().changed.connect(self._lyrics_data_changed_event)
 
     def _init_list_widget(self):
@@ -186,7 +191,7 @@ class LyricsManagePage(QWidget, Ui_LyricsManage):
         track_title = item.text()
         self._current_cover_track_id = track_id
 
-        image = self.temp_file_manage.get_temp_image(track_id)
+        pixmap = self.temp_file_manage.get_temp_pixmap(track_id)
         offset = self.lyrics_file_manage.get_offset_file(track_id)
         # 显示歌词歌手以及歌名
         title_list = track_title.split(" - ")
@@ -202,12 +207,12 @@ class LyricsManagePage(QWidget, Ui_LyricsManage):
             self.current_lrc = LrcFile()
         self.lyric_show_trans_event()
         # 下载歌曲专辑封面
-        if not image.getvalue():
+        if pixmap is None:
             self.image_label.clear()
             self.image_label.setText(self.tr("正在获取封面"))
             self.fetch_cover_event(track_id)
             return
-        self._show_cover(track_id, image)
+        self.image_label.setPixmap(pixmap)
 
     @thread_drive()
     def fetch_cover_event(self, track_id: str):
@@ -235,14 +240,16 @@ class LyricsManagePage(QWidget, Ui_LyricsManage):
         if not current_item or current_item.track_id != track_id:
             return
 
-        if not image or not image.getvalue():
+        # 封面已在后台写入缓存，从缓存取得解码后的图片
+        pix = self.temp_file_manage.get_temp_pixmap(track_id)
+        if pix is None and image and image.getvalue():
+            pix = QPixmap()
+            pix.loadFromData(image.getvalue())
+        if pix is None or pix.isNull():
             self.image_label.clear()
             self.image_label.setText(self.tr("封面获取失败"))
             return
 
-        image.seek(0)
-        pix = QPixmap()
-        pix.loadFromData(image.read())
         self.image_label.setPixmap(pix)
 
     def set_spin_box_offset_event(self):
@@ -379,6 +386,10 @@ class LyricsManagePage(QWidget, Ui_LyricsManage):
         del_item_action = QAction(self.tr("删除歌词"), self)
         list_widget_menu.addAction(del_item_action)
         del_item_action.triggered.connect(self.menu_delete_item)
+        backfill_action = QAction(self.tr("补全缺失歌词"), self)
+        backfill_action.setEnabled(self.backfill_job is None)
+        list_widget_menu.addAction(backfill_action)
+        backfill_action.triggered.connect(self.menu_backfill_lyrics)
 
         list_widget_menu.exec(self.lyrics_listWidget.mapToGlobal(position))
 
@@ -388,6 +399,38 @@ class LyricsManagePage(QWidget, Ui_LyricsManage):
         self.lyrics_file_items.remove(item)
         self.lyrics_file_manage.delete_lyric_file(item.track_id)
 
+    def menu_backfill_lyrics(self):
+        """批量补全无歌词以及用户歌单中的歌曲"""
+        self.backfill_job = LyricBackfillJob(SpotifyUserApi())
+        self.set_detail_label_signal.emit((self.tr("正在补全歌词"), ""))
+        self.backfill_lyrics_event(self.backfill_job)
+
+    @thread_drive()
+    def backfill_lyrics_event(self, job: LyricBackfillJob):
+        """后台运行补全任务，中断后下次将从上次的进度继续"""
+        def progress_func(done, total):
+            if not self._is_page_gone():
+                self.set_detail_label_signal.emit((self.tr("正在补全歌词"), f"{done}/{total}"))
+
+        try:
+            report = job.run(progress_func=progress_func)
+        except (requests.RequestException, NetworkError, UserError):
+            logger.warning("补全歌词失败", exc_info=True)
+            report = None
+        if not self._is_page_gone():
+            self.backfill_done_signal.emit(report)
+
+    def _backfill_done_event(self, report):
+        """补全任务结束，在主线程中显示结果"""
+        self.backfill_job = None
+        if report is None:
+            self.set_detail_label_signal.emit((self.tr("补全歌词失败"), ""))
+            return
+        self.set_detail_label_signal.emit((
+            self.tr("补全歌词完成"),
+            self.tr("找到 {0} / 共 {1}，失败 {2}").format(report.found, report.total, report.failed)))
+        self.load_lyrics_file(keep_state=True)
+
     def _set_plain_text_event(self, text: str):
         """设置文本，利于非主线程控制"""
         self.lyrics_plainTextEdit.setPlainText(text)
@@ -410,6 +453,8 @@ class LyricsManagePage(QWidget, Ui_LyricsManage):
 
     def _destroyed_event(self, *_):
         self._is_destroyed = True
+        if self.backfill_job is not None:
+            self.backfill_job.stop()
 
     def _is_page_gone(self) -> bool:
         return self._is_destroyed or sip.isdeleted(self)
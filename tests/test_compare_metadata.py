@@ -1,5 +1,7 @@
 #!/usr/bin/python
 # -*- coding:utf-8 -*-
+import pytest
+
 from common.song_metadata import compare_metadata
 from common.song_metadata.metadata_type import SongInfo
 
@@ -57,3 +59,43 @@ def test_compare_song_info_ignores_album_when_missing(monkeypatch):
     )
 
     assert score == 80
+
+
+def test_compare_song_info_normalizes_text():
+    score = compare_metadata.compare_song_info(
+        make_song(name="ＳＯＮＧ (feat. Someone)", singer="アーティスト", album="Album [Deluxe]"),
+        make_song(name="song", singer="あーてぃすと", album="album"),
+    )
+
+    assert score == 100
+
+
+LOVE_STORY = make_song(name="Love Story", singer="Taylor Swift", album="Fearless", duration="03:56")
+LEMON = make_song(name="Lemon", singer="Kenshi Yonezu", album="Lemon", duration="04:15")
+
+# (候选, 目标, 是否超过 download_lrc 的 min_score=74)，与使用 fuzzywuzzy 时的判断一致
+CANDIDATES = [
+    (make_song(name="Love Story (Taylor's Version)", singer="Taylor Swift", album="Fearless (Taylor's Version)",
+               duration="03:55"), LOVE_STORY, True),
+    (make_song(name="Love Song", singer="Taylor Swift", album="", duration="03:56"), LOVE_STORY, True),
+    (make_song(name="Love Story", singer="Tayler Swift", album="Fearless", duration="03:56"), LOVE_STORY, True),
+    (make_song(name="Love Story", singer="Taylor Swift", album="", duration="04:10"), LOVE_STORY, False),
+    (make_song(name="Love Story", singer="Indila", album="", duration="04:00"), LOVE_STORY, False),
+    (make_song(name="You Belong With Me", singer="Taylor Swift", album="Fearless", duration="03:51"), LOVE_STORY, False),
+    (make_song(name="Lemon", singer="米津玄師", album="Lemon", duration="04:16"), LEMON, True),
+    (make_song(name="Lemon", singer="Kenshi Yonezu", album="", duration="05:00"), LEMON, False),
+]
+
+
+@pytest.mark.parametrize("candidate, target, accepted", CANDIDATES)
+def test_compare_song_info_min_score_decisions(candidate, target, accepted):
+    assert (compare_metadata.compare_song_info(candidate, target) > 74) == accepted
+
+
+def test_compare_song_infos_matches_single_comparison():
+    candidates = [candidate for candidate, target, _ in CANDIDATES if target is LOVE_STORY] + [None]
+
+    scores = compare_metadata.compare_song_infos(candidates, LOVE_STORY)
+
+    assert scores == [compare_metadata.compare_song_info(candidate, LOVE_STORY) for candidate in candidates]
+    assert compare_metadata.compare_song_infos(candidates, None) == [0] * len(candidates)
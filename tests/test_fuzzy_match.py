@@ -0,0 +1,74 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import random
+
+import pytest
+
+from common.song_metadata import fuzzy_match
+
+
+def brute_lcs(text_1, text_2):
+    previous = [0] * (len(text_2) + 1)
+    for char_1 in text_1:
+        current = [0]
+        for j, char_2 in enumerate(text_2, 1):
+            current.append(previous[j - 1] + 1 if char_1 == char_2 else max(previous[j], current[j - 1]))
+        previous = current
+    return previous[-1]
+
+
+def brute_window_lcs(pattern, text):
+    windows = range(max(len(text) - len(pattern), 0) + 1)
+    return max(brute_lcs(pattern, text[start:start + len(pattern)]) for start in windows)
+
+
+def test_normalize_folds_width_case_kana_and_variants():
+    assert fuzzy_match.normalize("ＬＯＶＥ　Ｓｏｎｇ") == "love song"
+    assert fuzzy_match.normalize("アイドル") == fuzzy_match.normalize("あいどる")
+    assert fuzzy_match.normalize("愛與夢") == "爱与梦"
+
+
+def test_normalize_strips_brackets_and_feat():
+    assert fuzzy_match.normalize("Song (feat. Someone) [Remastered 2011]") == "song"
+    assert fuzzy_match.normalize("Song ft. Someone") == "song"
+    assert fuzzy_match.normalize("【MV】夜に駆ける") == "夜に駆ける"
+    assert fuzzy_match.normalize("(Intro)") == "(intro)"
+
+
+def test_window_lcs_matches_dynamic_programming():
+    rng = random.Random(0)
+    for _ in range(300):
+        pattern = "".join(rng.choice("abcd") for _ in range(rng.randint(1, 70)))
+        text = "".join(rng.choice("abcd") for _ in range(rng.randint(1, 90)))
+        assert fuzzy_match.window_lcs(pattern, text) == brute_window_lcs(pattern, text)
+
+
+def test_partial_ratio():
+    assert fuzzy_match.partial_ratio("Song", "My Song Title") == 100
+    assert fuzzy_match.partial_ratio("My Song Title", "Song") == 100
+    assert fuzzy_match.partial_ratio("abcd", "abxd") == 75
+    assert fuzzy_match.partial_ratio("", "abc") == 0
+
+
+# (文本 1, 文本 2, 评分)；除标注外评分与 fuzzywuzzy.fuzz.partial_ratio 相同，
+# 是否超过 download_lrc 的 min_score=74 均与 fuzzywuzzy 一致
+TITLE_PAIRS = [
+    ("love story", "love song", 78),
+    ("hello", "hallo", 80),
+    ("shape of you", "shape of my heart", 83),  # fuzzywuzzy 75：difflib 的匹配块少算了一个字符
+    ("米津玄師", "米津玄师", 75),
+    ("lemon", "lemonade", 100),
+    ("someone like you", "someone you loved", 69),
+    ("let it go", "let her go", 67),
+    ("rolling in the deep", "rolling stone", 69),
+    ("coldplay", "cold war", 62),
+    ("viva la vida", "la vida loca", 58),
+    ("bad guy", "bad blood", 57),
+    ("稻香", "稻草人", 50),
+]
+
+
+@pytest.mark.parametrize("text_1, text_2, score", TITLE_PAIRS)
+def test_partial_ratio_keeps_fuzzywuzzy_scale(text_1, text_2, score):
+    assert fuzzy_match.partial_ratio(text_1, text_2) == score
+    assert fuzzy_match.partial_ratio(text_2, text_1) == score
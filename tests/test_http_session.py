@@ -0,0 +1,106 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import pytest
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common.api import http_session, rate_limit
+from common.api.rate_limit import RateBudget
+from common.api.lyric_api import KugouApi
+from common.config import Config
+
+
+@pytest.fixture(autouse=True)
+def isolated_sessions(monkeypatch):
+    monkeypatch.setattr(Config.CommonConfig.ClientConfig, "kugou_proxy_ip", "")
+    http_session.close_sessions()
+    yield
+    http_session.close_sessions()
+
+
+def test_session_is_shared_per_provider():
+    session = http_session.get_session("kugou")
+
+    assert http_session.get_session("kugou") is session
+    assert http_session.get_session("cloudmusic") is not session
+    assert KugouApi._session() is session
+    assert session.get_adapter("http://mobilecdn.kugou.com")._pool_maxsize == http_session._POOL_MAXSIZE
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 保持连接以便复用
+    connections = []
+
+    def setup(self):
+        super().setup()
+        self.connections.append(self.client_address)
+
+    def do_GET(self):
+        time.sleep(0.05)
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_concurrent_requests_do_not_exceed_pool(monkeypatch):
+    monkeypatch.setattr(http_session, "_POOL_MAXSIZE", 2)
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    session = http_session.get_session("kugou")
+    try:
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            responses = list(executor.map(lambda _: session.get(url, timeout=5), range(12)))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert [response.text for response in responses] == ["ok"] * 12
+    assert len(SlowHandler.connections) <= 2
+
+
+def test_session_proxy_follows_config(monkeypatch):
+    session = http_session.get_session("kugou")
+    assert session.proxies == {}
+
+    monkeypatch.setattr(Config.CommonConfig.ClientConfig, "kugou_proxy_ip", "http://127.0.0.1:8892")
+    assert http_session.get_session("kugou").proxies == {
+        "https": "http://127.0.0.1:8892",
+        "http": "http://127.0.0.1:8892",
+    }
+    assert http_session.get_session("spotify").proxies == http_session.get_proxy("spotify")
+
+
+def test_session_does_not_keep_response_cookies():
+    session = http_session.get_session("cloudmusic")
+
+    assert session.cookies.get_policy().allowed_domains() == ()
+
+
+def test_rate_budget_window(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    budget = RateBudget(2, 60)
+
+    assert budget.try_acquire()
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+    now[0] = 60
+    assert budget.try_acquire()
+
+
+def test_rate_budget_acquire_stops_on_event():
+    budget = RateBudget(1, 60)
+    stop_event = threading.Event()
+    stop_event.set()
+
+    assert budget.acquire(stop_event)
+    assert not budget.acquire(stop_event)
@@ -0,0 +1,321 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import itertools
+import shutil
+import subprocess
+import time
+import weakref
+
+import pytest
+
+pytest.importorskip("PyQt6.QtDBus")
+from PyQt6.QtCore import QCoreApplication, QMetaType, QObject, QVariant, pyqtClassInfo, pyqtSlot
+from PyQt6.QtDBus import (QDBusAbstractAdaptor, QDBusConnection, QDBusMessage, QDBusObjectPath,
+                          QDBusPendingCall, QDBusVariant)
+
+from common.media_session.linux_session import LinuxMediaSession
+
+pytestmark = pytest.mark.skipif(shutil.which("dbus-daemon") is None, reason="dbus-daemon is not available")
+
+_connection_names = itertools.count()
+_app = None
+
+
+def typed(value, type_):
+    variant = QVariant(value)
+    variant.convert(QMetaType(type_.value))
+    return variant
+
+
+def int64(value):
+    return typed(value, QMetaType.Type.LongLong)
+
+
+@pyqtClassInfo("D-Bus Interface", "org.freedesktop.DBus.Properties")
+class FakePropertiesAdaptor(QDBusAbstractAdaptor):
+    @property
+    def player(self):
+        return self.parent()
+
+    @pyqtSlot(str, result="QVariantMap")
+    def GetAll(self, interface_name):
+        self.player.calls.append("GetAll")
+        return self.player.properties()
+
+    @pyqtSlot(str, str, result=QDBusVariant)
+    def Get(self, interface_name, name):
+        self.player.calls.append(f"Get {name}")
+        return QDBusVariant(self.player.properties()[name])
+
+
+@pyqtClassInfo("D-Bus Interface", "org.mpris.MediaPlayer2.Player")
+class FakePlayerAdaptor(QDBusAbstractAdaptor):
+    @property
+    def player(self):
+        return self.parent()
+
+    @pyqtSlot(QDBusObjectPath, "qlonglong")
+    def SetPosition(self, track_id, position):
+        self.player.calls.append(("SetPosition", track_id.path(), position))
+
+    @pyqtSlot()
+    def Next(self):
+        self.player.calls.append("Next")
+
+
+class FakeMprisPlayer(QObject):
+    """本地的 MPRIS 服务，记录收到的调用"""
+
+    def __init__(self, bus: QDBusConnection):
+        super().__init__()
+        self.bus = bus
+        self.calls = []
+        self.track = "track1"
+        self.status = "Playing"
+        self.position = 30_000_000
+        FakePropertiesAdaptor(self)
+        FakePlayerAdaptor(self)
+
+    def metadata(self):
+        return {
+            "mpris:trackid": f"/com/spotify/track/{self.track}",
+            "mpris:length": int64(200_000_000),
+            "xesam:title": f"Title {self.track}",
+            "xesam:artist": ["Artist"],
+            "xesam:album": "Album",
+            "xesam:albumArtist": ["Artist"],
+            "xesam:trackNumber": 1,
+        }
+
+    def properties(self):
+        return {"Metadata": self.metadata(), "PlaybackStatus": self.status, "Position": int64(self.position)}
+
+    def change_track(self, track, with_status=True):
+        self.track, self.position = track, 0
+        changed = {"Metadata": self.metadata()}
+        if with_status:
+            changed["PlaybackStatus"] = self.status
+        signal = QDBusMessage.createSignal(LinuxMediaSession.PATH, LinuxMediaSession.PROP_INTERFACE, "PropertiesChanged")
+        signal.setArguments([LinuxMediaSession.PLAYER_INTERFACE, changed, typed([], QMetaType.Type.QStringList)])
+        self.bus.send(signal)
+
+    def seek(self, position):
+        self.position = position
+        signal = QDBusMessage.createSignal(LinuxMediaSession.PATH, LinuxMediaSession.PLAYER_INTERFACE, "Seeked")
+        signal.setArguments([int64(position)])
+        self.bus.send(signal)
+
+
+def wait_until(predicate, timeout=5.0):
+    app = QCoreApplication.instance()
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out waiting for D-Bus"
+        app.processEvents()
+        time.sleep(0.005)
+
+
+def process_events(duration):
+    app = QCoreApplication.instance()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.005)
+
+
+@pytest.fixture(scope="module")
+def bus_address():
+    global _app
+    if QCoreApplication.instance() is None:
+        _app = QCoreApplication([])
+    daemon = subprocess.Popen(["dbus-daemon", "--session", "--nofork", "--print-address=1"],
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        yield daemon.stdout.readline().strip()
+    finally:
+        daemon.terminate()
+        daemon.wait()
+
+
+@pytest.fixture
+def mpris(bus_address):
+    """(假的 Spotify, 连接到它的 LinuxMediaSession)"""
+    index = next(_connection_names)
+    service_bus = QDBusConnection.connectToBus(bus_address, f"fake_spotify_{index}")
+    client_bus = QDBusConnection.connectToBus(bus_address, f"lyric_window_{index}")
+    player = FakeMprisPlayer(service_bus)
+    service_bus.registerObject(LinuxMediaSession.PATH, player, QDBusConnection.RegisterOption.ExportAdaptors)
+    assert service_bus.registerService(LinuxMediaSession.SERVICE)
+
+    session = LinuxMediaSession(session_bus=client_bus)
+    events = []
+    session.media_properties_changed_connect(lambda info: events.append(("media", info)))
+    session.playback_info_changed_connect(lambda info: events.append(("playback", info)))
+    session.timeline_properties_changed_connect(lambda info: events.append(("timeline", info)))
+    process_events(0.2)  # 等待信号订阅解析出服务的 owner
+    yield player, session, events
+
+    service_bus.unregisterService(LinuxMediaSession.SERVICE)
+    service_bus.unregisterObject(LinuxMediaSession.PATH)
+    del session, player  # Qt 对象需在断开连接前销毁
+    QDBusConnection.disconnectFromBus(f"fake_spotify_{index}")
+    QDBusConnection.disconnectFromBus(f"lyric_window_{index}")
+
+
+def test_track_change_queries_only_position(mpris):
+    player, session, events = mpris
+    assert session.is_connected()
+
+    player.change_track("track2")
+    wait_until(lambda: len(events) == 2)
+
+    (_, media_info), (_, playback_info) = events
+    assert media_info.title == "Title track2"
+    assert media_info.artist == "Artist"
+    assert playback_info.playStatus == 4
+    assert playback_info.duration == 200_000
+    assert 0 <= playback_info.position < 1000
+    assert player.calls == ["Get Position"]  # 其余属性由 PropertiesChanged 携带
+
+
+def test_seeked_reports_new_position(mpris):
+    player, session, events = mpris
+
+    player.seek(90_000_000)
+    wait_until(lambda: events)
+
+    assert events[0][0] == "timeline"
+    assert 90_000 <= events[0][1].position < 91_000
+
+
+class RecordingBus:
+    """记录同步调用的总线，同步调用直接返回错误而不等待"""
+
+    def __init__(self, bus: QDBusConnection):
+        self.bus = bus
+        self.sync_calls = []
+
+    def call(self, message, *args):
+        self.sync_calls.append(message.member())
+        return message.createErrorReply("org.freedesktop.DBus.Error.Failed", "synchronous call")
+
+    def __getattr__(self, name):
+        return getattr(self.bus, name)
+
+
+def test_metadata_only_change_does_not_block(mpris):
+    player, session, events = mpris
+    player.change_track("track6")
+    wait_until(lambda: len(events) == 2)
+    player.calls.clear()
+    session.session_bus = RecordingBus(session.session_bus)
+    # 与 LyricsWindow.media_properties_changed 相同，在回调中读取播放信息（弱引用避免循环引用）
+    session_proxy = weakref.proxy(session)
+    session.media_properties_changed_connect(
+        lambda info: events.append(("media", info, session_proxy.get_current_playback_info())))
+
+    player.change_track("track7", with_status=False)
+    wait_until(lambda: len(events) == 3)
+
+    _, media_info, playback_info = events[2]
+    assert media_info.title == "Title track7"
+    assert 0 <= playback_info.position < 1000
+    assert player.calls == ["Get Position"]
+    assert session.session_bus.sync_calls == []
+
+
+class FailingAsyncBus(RecordingBus):
+    """前 failures 次异步调用返回错误的总线"""
+
+    def __init__(self, bus: QDBusConnection, failures: int):
+        super().__init__(bus)
+        self.failures = failures
+
+    def asyncCall(self, message, *args):
+        if self.failures:
+            self.failures -= 1
+            return QDBusPendingCall.fromCompletedCall(
+                QDBusMessage.createError("org.freedesktop.DBus.Error.Failed", "asynchronous call"))
+        return self.bus.asyncCall(message, *args)
+
+
+def test_failed_query_is_retried_once(mpris):
+    player, session, events = mpris
+    session.session_bus = FailingAsyncBus(session.session_bus, failures=1)
+
+    player.change_track("track8")
+    wait_until(lambda: len(events) == 2)
+
+    (_, media_info), (_, playback_info) = events
+    assert media_info.title == "Title track8"
+    assert 0 <= playback_info.position < 1000
+    assert player.calls == ["Get Position"]
+    assert session.session_bus.sync_calls == []
+
+
+def test_failed_retry_still_notifies(mpris):
+    player, session, events = mpris
+    session.session_bus = FailingAsyncBus(session.session_bus, failures=2)
+
+    player.change_track("track9")
+    wait_until(lambda: len(events) == 2)
+
+    assert events[0][1].title == "Title track9"
+    assert events[1][1].duration == 200_000
+    assert player.calls == []
+    assert session.session_bus.sync_calls == ["GetAll"]  # 由 get_current_playback_info 回退获取
+
+
+def test_seeked_after_track_change_needs_no_query(mpris):
+    player, session, events = mpris
+    player.change_track("track5")
+    wait_until(lambda: len(events) == 2)
+    player.calls.clear()
+
+    player.seek(60_000_000)
+    wait_until(lambda: len(events) == 3)
+
+    assert events[2][0] == "timeline"
+    assert 60_000 <= events[2][1].position < 61_000
+    assert player.calls == []
+
+
+def test_bus_calls_per_event_benchmark(mpris):
+    """切歌与跳转各 N 次，总线调用数不超过每个信号都重新获取（2N）的一半"""
+    player, session, events = mpris
+    rounds = 20
+    for i in range(rounds):
+        player.change_track(f"bench{i}")
+        wait_until(lambda: len(events) == 3 * i + 2)
+        player.seek((i + 1) * 1_000_000)
+        wait_until(lambda: len(events) == 3 * i + 3)
+
+    assert [kind for kind, _ in events[-3:]] == ["media", "playback", "timeline"]
+    assert events[-3][1].title == f"Title bench{rounds - 1}"
+    assert len(player.calls) <= rounds
+    assert player.calls == ["Get Position"] * rounds
+
+
+def test_seek_uses_cached_track_id(mpris):
+    player, session, events = mpris
+    player.change_track("track3")
+    wait_until(lambda: len(events) == 2)
+    player.calls.clear()
+
+    session.seek_to_position_media(0)
+    assert session.skip_next_media()
+    wait_until(lambda: len(player.calls) == 2)
+
+    assert player.calls == [("SetPosition", "/com/spotify/track/track3", 0), "Next"]
+
+
+def test_service_restart_clears_cache(mpris):
+    player, session, events = mpris
+    player.change_track("track4")
+    wait_until(lambda: len(events) == 2)
+
+    player.bus.unregisterService(LinuxMediaSession.SERVICE)
+    wait_until(lambda: not session.is_connected())
+
+    assert not session.skip_next_media()
+    assert session._properties == {}
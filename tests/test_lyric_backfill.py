@@ -0,0 +1,115 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import json
+
+import pytest
+
+from common.api.exceptions import NetworkError
+from common.api.user_api.user_api import UserQueueTrack
+from common.lyric import lyric_backfill
+from common.lyric.lyric_backfill import BackfillReport, LyricBackfillJob
+
+
+class FakeLyricManage:
+    def __init__(self):
+        self.existing = {"track-1"}
+        self.not_found = {"track-2": {"track_title": "Song 2 - Artist", "last_time": 0}}
+
+    def is_lyric_exist(self, track_id):
+        return track_id in self.existing
+
+    def get_not_found_data(self):
+        return self.not_found
+
+    def set_not_found(self, track_id, track_title, reason="no_match"):
+        self.not_found[track_id] = {"track_title": track_title, "last_time": 0, "reason": reason}
+
+
+class FakeUserApi:
+    def get_user_playlist_tracks(self):
+        return [UserQueueTrack(f"track-{i}", f"Song {i}", "Artist", 200000) for i in (1, 3, 4, 5)]
+
+
+@pytest.fixture
+def fakes(monkeypatch, tmp_path):
+    lyric_manage = FakeLyricManage()
+    downloaded = []
+    def download_lrc_result(track_name, track_id, rate_budgets=None):
+        downloaded.append(track_id)
+        if track_id == "track-4":
+            raise NetworkError("timeout")
+        if track_id == "track-5":
+            return "no_match"
+        lyric_manage.existing.add(track_id)
+        return "found"
+
+    monkeypatch.setattr(lyric_backfill, "LyricFileManage", lambda: lyric_manage)
+    monkeypatch.setattr(lyric_backfill.lyric_download, "download_lrc_result", download_lrc_result)
+    return lyric_manage, downloaded, tmp_path / "backfill.json"
+
+
+def test_backfill_reports_results_and_removes_checkpoint(fakes):
+    lyric_manage, downloaded, checkpoint_path = fakes
+    job = LyricBackfillJob(FakeUserApi(), checkpoint_path=checkpoint_path, max_workers=2)
+    progress = []
+
+    report = job.run(progress_func=lambda done, total: progress.append((done, total)))
+
+    assert report == BackfillReport(total=4, found=2, not_found=1, failed=1, skipped=0)
+    assert sorted(downloaded) == ["track-2", "track-3", "track-4", "track-5"]
+    assert lyric_manage.not_found["track-5"]["track_title"] == "Song 5 - Artist"
+    assert lyric_manage.not_found["track-4"]["reason"] == "network"
+    assert sorted(progress)[-1] == (4, 4)
+    assert not checkpoint_path.exists()
+
+
+def test_backfill_resumes_from_checkpoint(fakes):
+    lyric_manage, downloaded, checkpoint_path = fakes
+    lyric_manage.existing.add("track-3")
+    checkpoint_path.write_text(json.dumps({
+        "tracks": [["track-2", "Song 2 - Artist"], ["track-3", "Song 3 - Artist"], ["track-5", "Song 5 - Artist"]],
+        "results": {"track-2": "found"},
+    }), encoding="utf-8")
+    job = LyricBackfillJob(FakeUserApi(), checkpoint_path=checkpoint_path, max_workers=1)
+
+    report = job.run()
+
+    assert downloaded == ["track-5"]
+    assert report == BackfillReport(total=3, found=1, not_found=1, failed=0, skipped=1)
+
+
+def test_backfill_passes_per_provider_rate_budgets(fakes, monkeypatch):
+    _, _, checkpoint_path = fakes
+    received = []
+
+    def download_lrc_result(track_name, track_id, rate_budgets=None):
+        received.append(rate_budgets)
+        return "found"
+
+    monkeypatch.setattr(lyric_backfill.lyric_download, "download_lrc_result", download_lrc_result)
+    job = LyricBackfillJob(FakeUserApi(), checkpoint_path=checkpoint_path, max_workers=2,
+                           rate_limits={"kugou": (5, 1.0), "cloudmusic": (3, 1.0)})
+    job.run()
+
+    # 同一任务的所有歌曲共用各提供方各自的预算
+    assert len(received) == 4 and all(budgets is job.rate_budgets for budgets in received)
+    assert {provider: (budget.limit, budget.period) for provider, budget in job.rate_budgets.items()} == {
+        "kugou": (5, 1.0), "cloudmusic": (3, 1.0)}
+
+
+def test_backfill_stop_keeps_checkpoint(fakes, monkeypatch):
+    _, downloaded, checkpoint_path = fakes
+    job = LyricBackfillJob(FakeUserApi(), checkpoint_path=checkpoint_path, max_workers=1)
+
+    def download_and_stop(track_name, track_id, rate_budgets=None):
+        downloaded.append(track_id)
+        job.stop()
+        return "found"
+
+    monkeypatch.setattr(lyric_backfill.lyric_download, "download_lrc_result", download_and_stop)
+    report = job.run()
+
+    assert len(downloaded) == 1
+    assert report.total == 4 and report.found == 1
+    checkpoint = json.loads(checkpoint_path.read_text(encoding="utf-8"))
+    assert checkpoint["results"] == {downloaded[0]: "found"}
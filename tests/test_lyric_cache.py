@@ -0,0 +1,85 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import os
+
+from common.lyric.lyric_cache import get_cache_path, load_lyric_cache, save_lyric_cache
+from common.lyric.lyric_type import KrcFile, MrcFile, TransType
+
+
+def make_mrc_file(tmp_path):
+    lyric_path = tmp_path / "track-1.mrc"
+    lyric_path.write_text(
+        "-*- type:non -*-\n[00:01:000]第一句\n[00:03:000]\n\n"
+        "-*- type:chinese -*-\n[00:01:000]one\n[00:05:000]only translation\n",
+        encoding="utf-8",
+    )
+    return lyric_path
+
+
+def test_cache_round_trips_all_columns(tmp_path):
+    lyric_path = make_mrc_file(tmp_path)
+    lrc_file = MrcFile(lyric_path)
+
+    save_lyric_cache(lrc_file, lyric_path)
+    cached = load_lyric_cache(lyric_path)
+
+    assert get_cache_path(lyric_path).exists()
+    assert type(cached) is MrcFile
+    cached_timeline, cached_columns, cached_words = cached.to_columns()
+    timeline, columns, _ = lrc_file.to_columns()
+    assert list(cached_timeline) == list(timeline)
+    assert cached_columns == columns
+    assert cached_words is None
+    assert cached.get_order_position(4000) == lrc_file.get_order_position(4000)
+
+
+def test_cache_is_invalidated_when_lyric_file_changes(tmp_path):
+    lyric_path = make_mrc_file(tmp_path)
+    save_lyric_cache(MrcFile(lyric_path), lyric_path)
+
+    lyric_path.write_text("-*- type:non -*-\n[00:01:000]修改后\n", encoding="utf-8")
+    assert load_lyric_cache(lyric_path) is None
+
+    save_lyric_cache(MrcFile(lyric_path), lyric_path)
+    stat = lyric_path.stat()
+    os.utime(lyric_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert load_lyric_cache(lyric_path) is None
+
+
+def test_cache_keeps_krc_word_timing(tmp_path):
+    lyric_path = tmp_path / "track-2.krc"
+    lyric_path.write_bytes("[00:01.000]<0,200,0>Hel<200,300,0>lo\n".encode("utf-8"))
+    krc_file = KrcFile(lyric_path)
+
+    save_lyric_cache(krc_file, lyric_path)
+    cached = load_lyric_cache(lyric_path)
+
+    assert type(cached) is KrcFile
+    assert cached.get_text(0) == "Hello"
+    assert cached.get_word_line(0).words == ["Hel", "lo"]
+
+
+def test_cache_of_krc_saved_as_mrc_matches_reparsed_file(tmp_path):
+    krc_path = tmp_path / "track-3.krc"
+    krc_path.write_bytes("[00:01.000]<0,200,0>Hel<200,300,0>lo\n".encode("utf-8"))
+    krc_file = KrcFile(krc_path)
+    mrc_path = tmp_path / "track-3.mrc"
+    krc_file.save_to_mrc(mrc_path)
+
+    save_lyric_cache(krc_file, mrc_path)
+    cached = load_lyric_cache(mrc_path)
+    reparsed = MrcFile(mrc_path)
+
+    # 缓存命中与重新解析得到相同的对象
+    assert type(cached) is type(reparsed) is MrcFile
+    assert cached.get_word_line(0) is None and reparsed.get_word_line(0) is None
+    assert cached.to_columns()[1] == reparsed.to_columns()[1]
+
+
+def test_load_cache_returns_none_for_missing_or_broken_cache(tmp_path):
+    lyric_path = make_mrc_file(tmp_path)
+    assert load_lyric_cache(lyric_path) is None
+
+    get_cache_path(lyric_path).parent.mkdir()
+    get_cache_path(lyric_path).write_bytes(b"broken")
+    assert load_lyric_cache(lyric_path) is None
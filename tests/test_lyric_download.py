@@ -1,6 +1,10 @@
 #!/usr/bin/python
 # -*- coding:utf-8 -*-
-from common.api.exceptions import NetworkError
+import threading
+import time
+
+from common.api import provider_health
+from common.api.exceptions import NetworkError, NoneResultError
 from common.lyric import lyric_download
 from common.song_metadata.metadata_type import SongInfo
 
@@ -17,9 +21,27 @@ class FakeLyric:
         self.saved_to.append(path)
 
 
+class FakeNotifier:
+    def __init__(self):
+        self.updated = []
+        self.lyric_updated = self
+
+    def emit(self, track_id):
+        self.updated.append(track_id)
+
+
 class FakeManager:
     def __init__(self):
         self.mapped = []
+        self.saved = []
+        self._notifier = FakeNotifier()
+
+    def notifier(self):
+        return self._notifier
+
+    def save_lyric_file(self, track_id, lrc_file):
+        self.saved.append(lrc_file)
+        lrc_file.save_to_mrc(f"{track_id}.mrc")
 
     def set_track_id_map(self, track_id, track_name):
         self.mapped.append((track_id, track_name))
@@ -29,6 +51,11 @@ def make_song(name, singer, duration="03:30", album="Album"):
     return SongInfo(singer=singer, songName=name, album=album, year="", trackNumber="", duration=duration, genre="", picBuffer=None)
 
 
+def score_each(compare):
+    """把逐个评分的函数包装为 compare_song_infos 的批量形式"""
+    return lambda candidates, spotify_info: [compare(candidate, spotify_info) for candidate in candidates]
+
+
 def test_download_lrc_prefers_kugou_when_score_is_highest(monkeypatch):
     fake_manager = FakeManager()
     fake_lyric = FakeLyric()
@@ -39,7 +66,7 @@ def test_download_lrc_prefers_kugou_when_score_is_highest(monkeypatch):
     monkeypatch.setattr(lyric_download.cloud_api, "search_song_info", lambda song_id: make_song("Song", "Artist"))
     monkeypatch.setattr(lyric_download.kugou_api, "search_song_id", lambda track_name: [type("Item", (), {"idOrMd5": "kugou-id"})()])
     monkeypatch.setattr(lyric_download.kugou_api, "search_song_info", lambda song_id: make_song("Song", "Artist"))
-    monkeypatch.setattr(lyric_download, "compare_song_info", lambda candidate, spotify: 90 if candidate.album == "Album" else 0)
+    monkeypatch.setattr(lyric_download, "compare_song_infos", score_each(lambda candidate, spotify: 90 if candidate.album == "Album" else 0))
     monkeypatch.setattr(lyric_download.kugou_api, "fetch_song_lyric", lambda song_md5: fake_lyric)
     monkeypatch.setattr(lyric_download.cloud_api, "fetch_song_lyric", lambda song_id: (_ for _ in ()).throw(AssertionError("cloud should not be used")))
     assert lyric_download.download_lrc("Song - Artist", "track-1", min_score=74) is True
@@ -52,3 +79,323 @@ def test_download_lrc_returns_false_when_all_sources_fail(monkeypatch):
     monkeypatch.setattr(lyric_download.kugou_api, "search_song_id", lambda track_name: (_ for _ in ()).throw(NetworkError("kugou error")))
 
     assert lyric_download.download_lrc("Song - Artist", "track-3", min_score=74) is False
+    assert lyric_download.download_lrc_result("Song - Artist", "track-3", min_score=74) == "network"
+
+
+def test_download_lrc_result_reports_no_match_when_every_provider_answered(monkeypatch):
+    monkeypatch.setattr(lyric_download.spotify_api, "search_song_info", lambda track_id: make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download.cloud_api, "search_song_id", lambda track_name: (_ for _ in ()).throw(NoneResultError("none")))
+    monkeypatch.setattr(lyric_download.kugou_api, "search_song_id", lambda track_name: [type("Item", (), {"idOrMd5": "kugou-id"})()])
+    monkeypatch.setattr(lyric_download.kugou_api, "search_song_info", lambda song_id: make_song("Other", "Someone"))
+    monkeypatch.setattr(lyric_download, "compare_song_infos", score_each(lambda candidate, spotify: 0))
+
+    assert lyric_download.download_lrc_result("Song - Artist", "track-3", min_score=74) == "no_match"
+
+
+def test_download_lrc_queries_providers_concurrently(monkeypatch):
+    fake_manager = FakeManager()
+
+    def slow_search(name):
+        def search_song_id(track_name):
+            time.sleep(0.2)
+            return [type("Item", (), {"idOrMd5": name})()]
+        return search_song_id
+
+    monkeypatch.setattr(lyric_download, "LyricFileManage", lambda: fake_manager)
+    monkeypatch.setattr(lyric_download.spotify_api, "search_song_info", lambda track_id: time.sleep(0.2) or make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download.cloud_api, "search_song_id", slow_search("cloud-id"))
+    monkeypatch.setattr(lyric_download.cloud_api, "search_song_info", lambda song_id: make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download.kugou_api, "search_song_id", slow_search("kugou-id"))
+    monkeypatch.setattr(lyric_download.kugou_api, "search_song_info", lambda song_id: make_song("Song", "Artist", album="Other"))
+    monkeypatch.setattr(lyric_download, "compare_song_infos", score_each(lambda candidate, spotify: 90 if candidate.album == "Album" else 0))
+    monkeypatch.setattr(lyric_download.cloud_api, "fetch_song_lyric", lambda song_id: FakeLyric())
+
+    start = time.perf_counter()
+    assert lyric_download.download_lrc("Song - Artist", "track-4", min_score=74) is True
+    assert time.perf_counter() - start < 0.5
+    assert fake_manager.mapped == [("track-4", "Song - Artist")]
+
+
+def test_download_lrc_cancels_slower_provider_once_preferred_one_passes(monkeypatch):
+    fake_manager = FakeManager()
+    cloud_started = threading.Event()
+    release_cloud = threading.Event()
+    cloud_info_calls = []
+
+    def cloud_search_song_id(track_name):
+        cloud_started.set()
+        release_cloud.wait(1)
+        return [type("Item", (), {"idOrMd5": "cloud-id"})()]
+
+    monkeypatch.setattr(lyric_download, "LyricFileManage", lambda: fake_manager)
+    monkeypatch.setattr(lyric_download.spotify_api, "search_song_info", lambda track_id: make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download.cloud_api, "search_song_id", cloud_search_song_id)
+    monkeypatch.setattr(lyric_download.cloud_api, "search_song_info", lambda song_id: cloud_info_calls.append(song_id))
+    monkeypatch.setattr(lyric_download.kugou_api, "search_song_id", lambda track_name: [type("Item", (), {"idOrMd5": "kugou-id"})()])
+    monkeypatch.setattr(lyric_download.kugou_api, "search_song_info", lambda song_id: make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download, "compare_song_infos", score_each(lambda candidate, spotify: 90))
+    monkeypatch.setattr(lyric_download.kugou_api, "fetch_song_lyric", lambda song_md5: FakeLyric())
+
+    assert lyric_download.download_lrc("Song - Artist", "track-5", min_score=74) is True
+    assert cloud_started.wait(1)
+    release_cloud.set()
+    time.sleep(0.05)
+    assert cloud_info_calls == []
+
+
+def test_download_lrc_falls_back_when_preferred_lyric_is_empty(monkeypatch):
+    fake_manager = FakeManager()
+
+    monkeypatch.setattr(lyric_download, "LyricFileManage", lambda: fake_manager)
+    monkeypatch.setattr(lyric_download.spotify_api, "search_song_info", lambda track_id: make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download.cloud_api, "search_song_id", lambda track_name: [type("Item", (), {"idOrMd5": "cloud-id"})()])
+    monkeypatch.setattr(lyric_download.cloud_api, "search_song_info", lambda song_id: make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download.kugou_api, "search_song_id", lambda track_name: [type("Item", (), {"idOrMd5": "kugou-id"})()])
+    monkeypatch.setattr(lyric_download.kugou_api, "search_song_info", lambda song_id: make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download, "compare_song_infos", score_each(lambda candidate, spotify: 90))
+    monkeypatch.setattr(lyric_download.kugou_api, "fetch_song_lyric", lambda song_md5: FakeLyric(empty=True))
+    monkeypatch.setattr(lyric_download.cloud_api, "fetch_song_lyric", lambda song_id: FakeLyric())
+
+    assert lyric_download.download_lrc("Song - Artist", "track-6", min_score=74) is True
+    assert fake_manager.mapped == [("track-6", "Song - Artist")]
+
+
+def test_deadline_returns_early_and_swaps_in_better_lyric(monkeypatch):
+    fake_manager = FakeManager()
+    release_kugou = threading.Event()
+    kugou_lyric, cloud_lyric = FakeLyric(), FakeLyric()
+
+    def kugou_search_song_id(track_name):
+        release_kugou.wait(2)
+        return [type("Item", (), {"idOrMd5": "kugou-id"})()]
+
+    monkeypatch.setattr(lyric_download, "LyricFileManage", lambda: fake_manager)
+    monkeypatch.setattr(lyric_download.spotify_api, "search_song_info", lambda track_id: make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download.kugou_api, "search_song_id", kugou_search_song_id)
+    monkeypatch.setattr(lyric_download.kugou_api, "search_song_info", lambda song_id: make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download.cloud_api, "search_song_id", lambda track_name: [type("Item", (), {"idOrMd5": "cloud-id"})()])
+    monkeypatch.setattr(lyric_download.cloud_api, "search_song_info", lambda song_id: make_song("Song", "Artist", album="Other"))
+    monkeypatch.setattr(lyric_download, "compare_song_infos", score_each(lambda candidate, spotify: 95 if candidate.album == "Album" else 80))
+    monkeypatch.setattr(lyric_download.kugou_api, "fetch_song_lyric", lambda song_md5: kugou_lyric)
+    monkeypatch.setattr(lyric_download.cloud_api, "fetch_song_lyric", lambda song_id: cloud_lyric)
+
+    start = time.perf_counter()
+    assert lyric_download.download_lrc_result("Song - Artist", "track-7", deadline=0.1) == lyric_download.FOUND
+    assert time.perf_counter() - start < 0.5
+    assert fake_manager.saved == [cloud_lyric]
+
+    release_kugou.set()
+    for _ in range(100):
+        if fake_manager.notifier().updated:
+            break
+        time.sleep(0.01)
+    assert fake_manager.saved == [cloud_lyric, kugou_lyric]
+    assert fake_manager.notifier().updated == ["track-7"]
+
+
+class FakeApi:
+    """可控制返回时机的歌词源"""
+
+    def __init__(self, provider, album, release=None):
+        self._PROVIDER = provider
+        self.album = album
+        self.release = release
+        self.lyric = FakeLyric()
+
+    def search_song_id(self, track_name):
+        if self.release is not None:
+            self.release.wait(2)
+        return [type("Item", (), {"idOrMd5": f"{self._PROVIDER}-id"})()]
+
+    def search_song_info(self, song_id):
+        return make_song("Song", "Artist", album=self.album)
+
+    def fetch_song_lyric(self, song_id):
+        return self.lyric
+
+
+def test_background_keeps_improving_after_first_better_lyric(monkeypatch):
+    fake_manager = FakeManager()
+    release_first, release_second = threading.Event(), threading.Event()
+    first = FakeApi("fake_first", "Good", release_first)
+    second = FakeApi("fake_second", "Best", release_second)
+    fallback = FakeApi("fake_fallback", "Fair")
+    scores = {"Fair": 80, "Good": 85, "Best": 95}
+
+    monkeypatch.setattr(provider_health, "_health", {})
+    monkeypatch.setattr(lyric_download, "_providers", (first, second, fallback))
+    monkeypatch.setattr(lyric_download, "LyricFileManage", lambda: fake_manager)
+    monkeypatch.setattr(lyric_download.spotify_api, "search_song_info", lambda track_id: make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download, "compare_song_infos", score_each(lambda candidate, spotify: scores[candidate.album]))
+
+    def wait_updated(count):
+        for _ in range(100):
+            if len(fake_manager.notifier().updated) >= count:
+                return
+            time.sleep(0.01)
+
+    assert lyric_download.download_lrc_result("Song - Artist", "track-10", deadline=0.1) == lyric_download.FOUND
+    assert fake_manager.saved == [fallback.lyric]
+
+    release_first.set()
+    wait_updated(1)
+    assert fake_manager.saved == [fallback.lyric, first.lyric]
+
+    # 第一次替换后仍继续等待评分更高的歌词源
+    release_second.set()
+    wait_updated(2)
+    assert fake_manager.saved == [fallback.lyric, first.lyric, second.lyric]
+    assert fake_manager.notifier().updated == ["track-10", "track-10"]
+
+
+def test_deadline_accepts_downloaded_lyric_while_top_provider_is_slow(monkeypatch):
+    fake_manager = FakeManager()
+    release_kugou = threading.Event()
+    kugou_lyric, cloud_lyric = FakeLyric(), FakeLyric()
+
+    def kugou_fetch_song_lyric(song_md5):
+        release_kugou.wait(2)  # 优先级最高、评分最高的歌词下载缓慢
+        return kugou_lyric
+
+    monkeypatch.setattr(provider_health, "_health", {})
+    monkeypatch.setattr(lyric_download, "LyricFileManage", lambda: fake_manager)
+    monkeypatch.setattr(lyric_download.spotify_api, "search_song_info", lambda track_id: make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download.kugou_api, "search_song_id", lambda track_name: [type("Item", (), {"idOrMd5": "kugou-id"})()])
+    monkeypatch.setattr(lyric_download.kugou_api, "search_song_info", lambda song_id: make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download.kugou_api, "fetch_song_lyric", kugou_fetch_song_lyric)
+    monkeypatch.setattr(lyric_download.cloud_api, "search_song_id", lambda track_name: [type("Item", (), {"idOrMd5": "cloud-id"})()])
+    monkeypatch.setattr(lyric_download.cloud_api, "search_song_info", lambda song_id: make_song("Song", "Artist", album="Other"))
+    monkeypatch.setattr(lyric_download.cloud_api, "fetch_song_lyric", lambda song_id: cloud_lyric)
+    monkeypatch.setattr(lyric_download, "compare_song_infos", score_each(lambda candidate, spotify: 95 if candidate.album == "Album" else 80))
+
+    assert lyric_download.download_lrc_result("Song - Artist", "track-11", deadline=0.1) == lyric_download.FOUND
+    # 返回时酷狗的歌词仍在下载，采用已下载完的歌词
+    assert not release_kugou.is_set()
+    assert fake_manager.saved == [cloud_lyric]
+
+    release_kugou.set()
+    for _ in range(100):
+        if fake_manager.notifier().updated:
+            break
+        time.sleep(0.01)
+    assert fake_manager.saved == [cloud_lyric, kugou_lyric]
+
+
+def test_deadline_returns_without_lyric_and_keeps_searching(monkeypatch):
+    fake_manager = FakeManager()
+    release = threading.Event()
+    lyric = FakeLyric()
+
+    def slow_search_song_id(track_name):
+        release.wait(2)
+        return [type("Item", (), {"idOrMd5": "song-id"})()]
+
+    monkeypatch.setattr(provider_health, "_health", {})
+    monkeypatch.setattr(lyric_download, "LyricFileManage", lambda: fake_manager)
+    monkeypatch.setattr(lyric_download.spotify_api, "search_song_info", lambda track_id: make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download.kugou_api, "search_song_id", slow_search_song_id)
+    monkeypatch.setattr(lyric_download.kugou_api, "search_song_info", lambda song_id: make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download.kugou_api, "fetch_song_lyric", lambda song_md5: lyric)
+    monkeypatch.setattr(lyric_download.cloud_api, "search_song_id", slow_search_song_id)
+    monkeypatch.setattr(lyric_download.cloud_api, "search_song_info", lambda song_id: make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download.cloud_api, "fetch_song_lyric", lambda song_id: FakeLyric())
+    monkeypatch.setattr(lyric_download, "compare_song_infos", score_each(lambda candidate, spotify: 90))
+
+    assert lyric_download.download_lrc_result("Song - Artist", "track-12", deadline=0.1) == lyric_download.NO_MATCH
+    assert not release.is_set() and fake_manager.saved == []
+
+    release.set()
+    for _ in range(100):
+        if fake_manager.notifier().updated:
+            break
+        time.sleep(0.01)
+    assert fake_manager.saved == [lyric]
+    assert fake_manager.notifier().updated == ["track-12"]
+
+
+class CountingBudget:
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self, stop_event=None):
+        self.acquired += 1
+        return True
+
+
+def test_rate_budgets_are_acquired_per_provider(monkeypatch):
+    fake_manager = FakeManager()
+    budgets = {"spotify": CountingBudget(), "kugou": CountingBudget(), "cloudmusic": CountingBudget()}
+
+    monkeypatch.setattr(provider_health, "_health", {})
+    monkeypatch.setattr(lyric_download, "LyricFileManage", lambda: fake_manager)
+    monkeypatch.setattr(lyric_download.spotify_api, "search_song_info", lambda track_id: make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download.kugou_api, "search_song_id", lambda track_name: [type("Item", (), {"idOrMd5": "kugou-id"})()])
+    monkeypatch.setattr(lyric_download.kugou_api, "search_song_info", lambda song_id: make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download.kugou_api, "fetch_song_lyric", lambda song_md5: FakeLyric())
+    monkeypatch.setattr(lyric_download.cloud_api, "search_song_id", lambda track_name: (_ for _ in ()).throw(NoneResultError("none")))
+    monkeypatch.setattr(lyric_download, "compare_song_infos", score_each(lambda candidate, spotify: 90))
+
+    assert lyric_download.download_lrc_result("Song - Artist", "track-13", rate_budgets=budgets) == lyric_download.FOUND
+    # spotify 歌曲信息 1 次；酷狗 搜索、歌曲信息、歌词各 1 次；网易云 搜索 1 次
+    assert {provider: budget.acquired for provider, budget in budgets.items()} == {
+        "spotify": 1, "kugou": 3, "cloudmusic": 1}
+
+
+def test_slow_provider_gets_hedged_request(monkeypatch):
+    fake_manager = FakeManager()
+    calls = []
+    release = threading.Event()
+
+    def kugou_search_song_id(track_name):
+        calls.append(track_name)
+        if len(calls) == 1:
+            release.wait(2)  # 第一次请求卡住，对冲请求立即返回
+        return [type("Item", (), {"idOrMd5": "kugou-id"})()]
+
+    monkeypatch.setattr(provider_health, "_health", {})
+    kugou_health = provider_health.get_provider_health(lyric_download.kugou_api._PROVIDER)
+    for _ in range(5):
+        kugou_health.record_success(0.01)
+
+    monkeypatch.setattr(lyric_download, "LyricFileManage", lambda: fake_manager)
+    monkeypatch.setattr(lyric_download.spotify_api, "search_song_info", lambda track_id: make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download.kugou_api, "search_song_id", kugou_search_song_id)
+    monkeypatch.setattr(lyric_download.kugou_api, "search_song_info", lambda song_id: make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download.cloud_api, "search_song_id", lambda track_name: (_ for _ in ()).throw(NoneResultError("none")))
+    monkeypatch.setattr(lyric_download, "compare_song_infos", score_each(lambda candidate, spotify: 90 if candidate else 0))
+    monkeypatch.setattr(lyric_download.kugou_api, "fetch_song_lyric", lambda song_md5: FakeLyric())
+
+    start = time.perf_counter()
+    assert lyric_download.download_lrc_result("Song - Artist", "track-8", deadline=1.5) == lyric_download.FOUND
+    assert time.perf_counter() - start < 0.5
+    assert len(calls) == 2
+    release.set()
+
+
+def test_download_lrc_scores_top_k_results_per_provider(monkeypatch):
+    fake_manager = FakeManager()
+    fetched = []
+    info_calls = []
+    search_items = [type("Item", (), {"idOrMd5": song_id})() for song_id in ("k-1", "k-2", "k-3", "k-4")]
+    albums = {"k-1": "Live", "k-2": "Album", "k-3": "Album", "k-4": "Album"}
+
+    def kugou_search_song_info(song_id):
+        info_calls.append(song_id)
+        return make_song("Song", "Artist", album=albums[song_id])
+
+    def kugou_fetch_song_lyric(song_id):
+        fetched.append(song_id)
+        return FakeLyric(empty=song_id == "k-2")
+
+    monkeypatch.setattr(lyric_download, "LyricFileManage", lambda: fake_manager)
+    monkeypatch.setattr(lyric_download.spotify_api, "search_song_info", lambda track_id: make_song("Song", "Artist"))
+    monkeypatch.setattr(lyric_download.kugou_api, "search_song_id", lambda track_name: search_items)
+    monkeypatch.setattr(lyric_download.kugou_api, "search_song_info", kugou_search_song_info)
+    monkeypatch.setattr(lyric_download.kugou_api, "fetch_song_lyric", kugou_fetch_song_lyric)
+    monkeypatch.setattr(lyric_download.cloud_api, "search_song_id", lambda track_name: (_ for _ in ()).throw(NoneResultError("none")))
+    monkeypatch.setattr(lyric_download, "compare_song_infos", score_each(lambda candidate, spotify: 90 if candidate.album == "Album" else 60))
+
+    assert lyric_download.download_lrc("Song - Artist", "track-9", min_score=74) is True
+    assert sorted(info_calls) == ["k-1", "k-2", "k-3"]
+    # 第一个结果评分不足，第二个歌词为空，采用第三个
+    assert fetched == ["k-2", "k-3"]
@@ -1,11 +1,19 @@
 #!/usr/bin/python
 # -*- coding:utf-8 -*-
 import json
+import sqlite3
+import time
 
 import pytest
+from PyQt6.QtCore import QCoreApplication
 
-from common.lyric.lyric_manage import LyricFileManage
-from common.lyric.lyric_type import LrcFile, TransType
+from common.lyric import lyric_manage
+from common.lyric.lyric_cache import get_cache_path
+from common.lyric.lyric_manage import LyricFileManage, NETWORK_ERROR, NO_MATCH, next_retry_time
+from common.lyric.lyric_store import LyricDataStore
+from common.lyric.lyric_type import LrcFile, MrcFile, TransType
+
+_app = None
 
 
 @pytest.fixture
@@ -17,17 +25,23 @@ def isolated_lyric_manage(tmp_path, monkeypatch):
 
     monkeypatch.setattr("common.lyric.lyric_manage.LRC_PATH", lyric_dir)
     monkeypatch.setattr("common.lyric.lyric_manage.LYRIC_DATA_FILE_PATH", lyric_data_path)
+    monkeypatch.setattr("common.lyric.lyric_manage.LYRIC_DB_PATH", lyric_dir / "lyric.db")
 
     LyricFileManage._instance = None
     LyricFileManage._is_init = False
     manager = LyricFileManage()
     yield manager, lyric_dir, lyric_data_path
+    manager.lyric_data_store.close()
     LyricFileManage._instance = None
     LyricFileManage._is_init = False
 
 
+def reopen_store(lyric_dir):
+    return LyricDataStore(lyric_dir / "lyric.db")
+
+
 def test_track_id_mapping_and_offsets_round_trip(isolated_lyric_manage):
-    manager, _, lyric_data_path = isolated_lyric_manage
+    manager, lyric_dir, _ = isolated_lyric_manage
 
     manager.set_track_id_map("track-1", "Song A - Artist A")
     manager.set_offset_file("track-1", 500)
@@ -36,13 +50,14 @@ def test_track_id_mapping_and_offsets_round_trip(isolated_lyric_manage):
     assert manager.get_title("track-1") == "Song A - Artist A"
     assert manager.get_offset_file("track-1") == 500
 
-    saved_data = json.loads(lyric_data_path.read_text(encoding="utf-8"))
-    assert saved_data["id2title"]["track-1"] == "Song A - Artist A"
-    assert saved_data["offset"]["track-1"] == 500
+    saved_store = reopen_store(lyric_dir)
+    assert saved_store.get_all_titles() == {"track-1": "Song A - Artist A"}
+    assert saved_store.get_offset("track-1") == 500
+    saved_store.close()
 
 
 def test_set_not_found_can_write_and_clear(isolated_lyric_manage):
-    manager, _, lyric_data_path = isolated_lyric_manage
+    manager, lyric_dir, _ = isolated_lyric_manage
 
     manager.set_not_found("track-2", "Song B - Artist B")
     assert manager.get_not_found("track-2")["track_title"] == "Song B - Artist B"
@@ -50,8 +65,9 @@ def test_set_not_found_can_write_and_clear(isolated_lyric_manage):
     manager.set_not_found("track-2", "")
     assert manager.get_not_found("track-2") is None
 
-    saved_data = json.loads(lyric_data_path.read_text(encoding="utf-8"))
-    assert "track-2" not in saved_data["no_lyric"]
+    saved_store = reopen_store(lyric_dir)
+    assert saved_store.get_no_lyric("track-2") is None
+    saved_store.close()
 
 
 def test_save_lyric_file_creates_mrc_and_clears_not_found(isolated_lyric_manage):
@@ -66,3 +82,166 @@ def test_save_lyric_file_creates_mrc_and_clears_not_found(isolated_lyric_manage)
     assert (lyric_dir / "track-3.mrc").exists()
     assert manager.get_not_found("track-3") is None
     assert manager.get_title("track-3") == "Song C - Artist C"
+
+
+def test_read_lyric_file_builds_and_uses_binary_cache(isolated_lyric_manage, monkeypatch):
+    manager, lyric_dir, _ = isolated_lyric_manage
+    lrc_file = LrcFile()
+    lrc_file.load_content("[00:00.00]第一句\n[00:01.00]第二句", TransType.NON)
+    manager.save_lyric_file("track-4", lrc_file)
+
+    assert get_cache_path(lyric_dir / "track-4.mrc").exists()
+    monkeypatch.setattr(MrcFile, "load_content", lambda *args: (_ for _ in ()).throw(AssertionError("parsed")))
+
+    cached = manager.read_lyric_file("track-4")
+    assert cached.get_text(1) == "第二句"
+
+    manager.set_not_found("track-4", "Song D - Artist D")
+    assert not get_cache_path(lyric_dir / "track-4.mrc").exists()
+
+
+def test_lyric_index_tracks_saved_and_removed_files(isolated_lyric_manage):
+    manager, lyric_dir, _ = isolated_lyric_manage
+    assert not manager.is_lyric_exist("track-5")
+    assert manager.read_lyric_file("track-5").empty()
+
+    lrc_file = LrcFile()
+    lrc_file.load_content("[00:00.00]第一句", TransType.NON)
+    manager.save_lyric_file("track-5", lrc_file)
+    assert manager.is_lyric_exist("track-5")
+    assert manager.lyric_index["track-5"].path == lyric_dir / "track-5.mrc"
+
+    manager.set_not_found("track-5", "Song E - Artist E")
+    assert not manager.is_lyric_exist("track-5")
+    assert "track-5" not in manager.lyric_index
+
+
+def test_refresh_index_picks_up_external_files(isolated_lyric_manage):
+    manager, lyric_dir, _ = isolated_lyric_manage
+    (lyric_dir / "track-6.lrc").write_text("[00:00.00]外部歌词", encoding="utf-8")
+    assert manager.read_lyric_file("track-6").empty()
+
+    manager.refresh_index()
+
+    assert manager.lyric_index["track-6"].suffix == ".lrc"
+    assert manager.read_lyric_file("track-6").get_text(0) == "外部歌词"
+    assert not manager.is_lyric_exist("track-6")
+
+
+def test_lyric_dir_changes_are_debounced_and_ignore_other_files(isolated_lyric_manage, monkeypatch):
+    global _app
+    manager, lyric_dir, _ = isolated_lyric_manage
+    if QCoreApplication.instance() is None:
+        _app = QCoreApplication([])
+    app = QCoreApplication.instance()
+    monkeypatch.setattr(lyric_manage, "WATCH_DEBOUNCE", 10)
+    manager.watch_lyric_dir()
+    refreshed = []
+    original_refresh = manager.refresh_index
+    monkeypatch.setattr(manager, "refresh_index", lambda: refreshed.append(1) or original_refresh())
+
+    def settle():
+        deadline = time.monotonic() + 0.2
+        while time.monotonic() < deadline:
+            app.processEvents()
+            time.sleep(0.005)
+
+    # 自身保存的歌词、缓存与数据库文件的变化不重建索引
+    lrc_file = LrcFile()
+    lrc_file.load_content("[00:00.00]第一句", TransType.NON)
+    manager.save_lyric_file("track-7", lrc_file)
+    (lyric_dir / "lyric.db-journal").write_bytes(b"")
+    manager._lyric_dir_changed(str(lyric_dir))
+    settle()
+    assert refreshed == []
+    assert not any(path.suffix == ".cache" for path in lyric_dir.iterdir())
+
+    # 连续的变化只检查一次
+    (lyric_dir / "track-8.lrc").write_text("[00:00.00]外部歌词", encoding="utf-8")
+    for _ in range(3):
+        manager._lyric_dir_changed(str(lyric_dir))
+    settle()
+    assert refreshed == [1]
+    assert manager.lyric_index["track-8"].suffix == ".lrc"
+
+
+def test_lyric_json_is_migrated_once(tmp_path):
+    json_path = tmp_path / "lyric.json"
+    json_path.write_text(json.dumps({
+        "offset": {"track-1": 500},
+        "no_lyric": {"track-2": {"track_title": "Song B - Artist B", "last_time": 123}},
+        "id2title": {"track-1": "Song A - Artist A", "track-3": "Song A - Artist A"},
+    }, ensure_ascii=False), encoding="utf-8")
+
+    store = LyricDataStore(tmp_path / "lyric.db", json_path)
+    assert store.get_offset("track-1") == 500
+    assert store.get_no_lyric("track-2") == {"track_title": "Song B - Artist B", "last_time": 123, "attempts": 1,
+                                             "reason": "no_match", "next_time": 123 + 86400}
+    assert store.get_id("Song A - Artist A") == "track-3"
+    store.set_offset("track-1", 1000)
+    store.close()
+
+    store = LyricDataStore(tmp_path / "lyric.db", json_path)
+    assert store.get_offset("track-1") == 1000
+    store.close()
+
+
+def test_get_id_returns_last_mapped_track(tmp_path):
+    store = LyricDataStore(tmp_path / "lyric.db")
+    store.set_title("track-1", "Song - Artist")
+    store.set_title("track-2", "Song - Artist")
+    assert store.get_id("Song - Artist") == "track-2"
+
+    store.set_title("track-1", "Song - Artist")
+    assert store.get_id("Song - Artist") == "track-1"
+
+    store.delete_title("track-1")
+    assert store.get_id("Song - Artist") == "track-2"
+    store.close()
+
+
+def test_v1_database_gains_retry_columns(tmp_path):
+    db_path = tmp_path / "lyric.db"
+    conn = sqlite3.connect(str(db_path))
+    conn.executescript("""
+        CREATE TABLE no_lyric (track_id TEXT PRIMARY KEY, track_title TEXT NOT NULL, last_time INTEGER NOT NULL);
+        INSERT INTO no_lyric VALUES ('track-1', 'Song - Artist', 1000);
+        PRAGMA user_version = 1;
+    """)
+    conn.close()
+
+    store = LyricDataStore(db_path)
+    assert store.get_no_lyric("track-1") == {"track_title": "Song - Artist", "last_time": 1000, "attempts": 1,
+                                             "reason": "no_match", "next_time": 1000 + 86400}
+    assert store.get_due_no_lyric(1000 + 86400) == [("track-1", "Song - Artist")]
+    assert store.get_due_no_lyric(1000) == []
+    store.close()
+
+
+def test_next_retry_time_backs_off_with_cap():
+    assert next_retry_time(NETWORK_ERROR, 1, 0) == 300
+    assert next_retry_time(NETWORK_ERROR, 3, 0) == 1200
+    assert next_retry_time(NETWORK_ERROR, 20, 0) == 6 * 3600
+    assert next_retry_time(NO_MATCH, 1, 0) == 24 * 3600
+    assert next_retry_time(NO_MATCH, 5, 0) == 16 * 24 * 3600
+    assert next_retry_time(NO_MATCH, 6, 0) is None
+
+
+def test_set_not_found_counts_attempts_per_reason(isolated_lyric_manage, monkeypatch):
+    manager, _, _ = isolated_lyric_manage
+    now = [10000]
+    monkeypatch.setattr(lyric_manage.time, "time", lambda: now[0])
+
+    manager.set_not_found("track-7", "Song G - Artist G", NETWORK_ERROR)
+    manager.set_not_found("track-7", "Song G - Artist G", NETWORK_ERROR)
+    found_data = manager.get_not_found("track-7")
+    assert (found_data["attempts"], found_data["reason"], found_data["next_time"]) == (2, NETWORK_ERROR, 10600)
+    assert not manager.is_retry_due("track-7")
+
+    now[0] = 10600
+    assert manager.is_retry_due("track-7")
+    assert manager.get_due_retries() == [("track-7", "Song G - Artist G")]
+
+    manager.set_not_found("track-7", "Song G - Artist G", NO_MATCH)
+    assert manager.get_not_found("track-7")["attempts"] == 1
+    assert manager.is_retry_due("track-8")
@@ -1,14 +1,25 @@
 #!/usr/bin/python
 # -*- coding:utf-8 -*-
-from common.player.lyric_player import LrcPlayer, LyricThread
-from common.lyric.lyric_type import LrcFile, TransType
+import threading
+import time
 
+import pytest
 
-def test_set_trans_mode_and_show_content(monkeypatch):
-    monkeypatch.setattr(LyricThread, "start", lambda self: None)
+from common.player.lyric_player import LrcPlayer
+from common.player.lyric_scheduler import LyricScheduler, LyricTask
+from common.lyric.lyric_type import KrcFile, LrcFile, TransType
 
+
+@pytest.fixture
+def scheduler():
+    # 不启动调度线程，由测试手动调用 run_due
+    return LyricScheduler()
+
+
+def test_set_trans_mode_and_show_content(scheduler):
     outputs = []
-    player = LrcPlayer(output_func=lambda row, text, roll_time: outputs.append((row, text, roll_time)))
+    player = LrcPlayer(output_func=lambda row, text, roll_time: outputs.append((row, text, roll_time)),
+                       scheduler=scheduler)
     player.lrc_file = LrcFile()
     player.lrc_file.load_content("[00:00.00]原文\n", TransType.NON)
     player.lrc_file.load_content("[00:00.00]翻译\n", TransType.CHINESE)
@@ -21,13 +32,11 @@ def test_set_trans_mode_and_show_content(monkeypatch):
     assert outputs == [(1, "原文", 500), (2, "翻译", 500)]
 
 
-def test_seek_to_position_resets_timer_and_wakes_thread(monkeypatch):
-    monkeypatch.setattr(LyricThread, "start", lambda self: None)
-
+def test_seek_to_position_resets_timer_and_wakes_task(monkeypatch, scheduler):
+    player = LrcPlayer(output_func=lambda *args: None, scheduler=scheduler)
     reset_calls = []
-    monkeypatch.setattr(LyricThread, "reset_position", lambda self: reset_calls.append("reset"))
+    monkeypatch.setattr(LyricTask, "wake", lambda self: reset_calls.append("reset"))
 
-    player = LrcPlayer(output_func=lambda *args: None)
     player.seek_to_position(1200, is_show_last_lyric=False)
 
     assert reset_calls == []
@@ -37,16 +46,175 @@ def test_seek_to_position_resets_timer_and_wakes_thread(monkeypatch):
     assert reset_calls == ["reset"]
 
 
-def test_close_terminates_and_joins_thread(monkeypatch):
-    monkeypatch.setattr(LyricThread, "start", lambda self: None)
+def test_close_cancels_scheduled_task(scheduler):
+    player = LrcPlayer(output_func=lambda *args: None, scheduler=scheduler)
+    assert scheduler.next_deadline() == 0
+
+    player.close()
 
-    terminate_calls = []
-    join_calls = []
-    monkeypatch.setattr(LyricThread, "terminate", lambda self: terminate_calls.append("terminate"))
-    monkeypatch.setattr(LyricThread, "join", lambda self, timeout=None: join_calls.append(timeout))
+    assert scheduler.next_deadline() is None
+    assert scheduler.run_due() == 0
+
+
+def test_show_content_emits_word_line_for_krc(scheduler):
+    word_outputs = []
+    player = LrcPlayer(output_func=lambda *args: None, scheduler=scheduler)
+    player.word_output_connect(lambda word_line, elapsed: word_outputs.append((word_line.text, elapsed)))
+    player.lrc_file = KrcFile()
+    player.lrc_file.load_content("[00:00.00]<0,100,0>原<100,100,0>文\n".encode("utf-8"))
+    player.seek_to_position(50, is_show_last_lyric=False)
+
+    player.show_content(0, 0)
+    assert word_outputs == []
+
+    player.show_content(0, 500)
+    assert len(word_outputs) == 1
+    assert word_outputs[0][0] == "原文"
+    assert 50 <= word_outputs[0][1] < 250
 
-    player = LrcPlayer(output_func=lambda *args: None)
-    player.close(timeout=0.5)
 
-    assert terminate_calls == ["terminate"]
-    assert join_calls == [0.5]
+def test_reload_lyric_keeps_track_and_position(monkeypatch, scheduler):
+    player = LrcPlayer(output_func=lambda *args: None, scheduler=scheduler)
+    reset_calls = []
+    monkeypatch.setattr(LyricTask, "wake", lambda self: reset_calls.append("reset"))
+    player.track_id = "track-1"
+    player.trans_mode = TransType.CHINESE
+    player.seek_to_position(1500, is_show_last_lyric=False)
+    new_lrc = LrcFile()
+    new_lrc.load_content("[00:00.00]新歌词\n", TransType.NON)
+    player.lyric_file_manage = type("FakeManage", (), {"read_lyric_file": lambda self, track_id: new_lrc})()
+
+    player.reload_lyric()
+
+    assert player.lrc_file is new_lrc
+    assert player.trans_mode == TransType.NON
+    assert abs(player.get_time() - 1500) < 200
+    assert reset_calls == ["reset"]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000_000_000
+
+    def __call__(self):
+        return self.now
+
+
+def make_scheduled_player(monkeypatch, lyric_text, duration, clock=None, scheduler=None):
+    clock = clock or FakeClock()
+    monkeypatch.setattr(LrcPlayer, "_clock", staticmethod(clock))
+    scheduler = scheduler or LyricScheduler(clock=clock)
+    outputs = []
+    player = LrcPlayer(output_func=lambda row, text, roll_time: outputs.append((text, roll_time)) if row == 1 else None,
+                       scheduler=scheduler)
+    player.lrc_file = LrcFile()
+    player.lrc_file.load_content(lyric_text, TransType.NON)
+    player.duration = duration
+    player.seek_to_position(0, is_show_last_lyric=False)
+    return player, clock, scheduler, outputs
+
+
+def run_until_idle(clock, scheduler, start_ms):
+    """每次把时钟推进到最近的时刻，返回各次唤醒的时刻（相对 start_ms）"""
+    wakeups = []
+    while (deadline := scheduler.next_deadline()) is not None:
+        clock.now = max(clock.now, deadline)
+        wakeups.append(clock.now // 1_000_000 - start_ms)
+        assert scheduler.run_due() >= 1
+    return wakeups
+
+
+def test_player_wakes_only_at_line_deadlines(monkeypatch):
+    player, clock, scheduler, outputs = make_scheduled_player(
+        monkeypatch, "[00:00.00]一\n[00:01.50]二\n[00:04.00]三\n", duration=10000)
+    done_calls = []
+    player.play_done_event_connect(lambda: done_calls.append(player.get_time()))
+
+    # 两句之间推进时钟不会触发任何回调
+    assert scheduler.run_due() == 1
+    clock.now += 1_499_000_000
+    assert scheduler.run_due() == 0
+
+    assert run_until_idle(clock, scheduler, player.timer_start_value) == [1500, 4000, 8801]
+    assert outputs == [("一", 1500), ("二", 2500), ("三", 6000)]
+    assert done_calls == [8801]
+
+
+def test_player_parks_while_paused(monkeypatch):
+    player, clock, scheduler, outputs = make_scheduled_player(
+        monkeypatch, "[00:00.00]一\n[00:01.00]二\n", duration=10000)
+    player.set_pause(True)
+
+    assert run_until_idle(clock, scheduler, player.timer_start_value) == [0]
+    assert outputs == []
+
+
+def test_players_share_one_scheduler(monkeypatch):
+    clock = FakeClock()
+    scheduler = LyricScheduler(clock=clock)
+    player_1, _, _, outputs_1 = make_scheduled_player(
+        monkeypatch, "[00:00.00]a\n[00:01.00]b\n", duration=3000, clock=clock, scheduler=scheduler)
+    player_2, _, _, outputs_2 = make_scheduled_player(
+        monkeypatch, "[00:00.00]x\n[00:00.40]y\n", duration=3000, clock=clock, scheduler=scheduler)
+
+    assert run_until_idle(clock, scheduler, player_1.timer_start_value) == [0, 400, 1000, 1801]
+    assert [text for text, _ in outputs_1] == ["a", "b"]
+    assert [text for text, _ in outputs_2] == ["x", "y"]
+
+
+def test_scheduler_drops_collected_players(monkeypatch):
+    player, clock, scheduler, outputs = make_scheduled_player(monkeypatch, "[00:00.00]一\n", duration=10000)
+    del player
+
+    assert scheduler.run_due() == 1
+    assert scheduler.next_deadline() is None
+    assert outputs == []
+
+
+def test_sync_position_ignores_small_drift(monkeypatch, scheduler):
+    clock = FakeClock()
+    monkeypatch.setattr(LrcPlayer, "_clock", staticmethod(clock))
+    player = LrcPlayer(output_func=lambda *args: None, scheduler=scheduler)
+    wake_calls = []
+    monkeypatch.setattr(LyricTask, "wake", lambda self: wake_calls.append("wake"))
+    player.seek_to_position(5000, is_show_last_lyric=False)
+    clock.now += 1_000_000_000
+
+    assert player.sync_position(6050) is False
+    assert player.get_time() == 6000
+    assert wake_calls == []
+
+    assert player.sync_position(6500) is True
+    assert player.get_time() == 6500
+    assert wake_calls == ["wake"]
+
+
+def test_scheduler_thread_runs_due_tasks():
+    scheduler = LyricScheduler()
+    done = threading.Event()
+    scheduler.start()
+    try:
+        task = scheduler.register(lambda: done.set())
+        scheduler.schedule(task, time.monotonic_ns() + 20_000_000)
+        assert done.wait(2)
+    finally:
+        scheduler.close()
+
+
+def test_player_emits_lookahead_lines(monkeypatch):
+    player, clock, scheduler, outputs = make_scheduled_player(
+        monkeypatch, "[00:00.00]一\n[00:01.00]\n[00:02.00]二\n[00:03.00]三\n[00:04.00]四\n[00:05.00]五\n",
+        duration=20000)
+    player.lrc_file.load_content("[00:00.00]1\n[00:02.00]2\n[00:04.00]4\n", TransType.CHINESE)
+    player.set_trans_mode(TransType.CHINESE)
+    lookahead = []
+    player.lookahead_output_connect(lookahead.append)
+
+    scheduler.run_due()
+    assert lookahead == [[("二", "2"), ("三", ""), ("四", "4")]]
+
+    clock.now += 4_000_000_000
+    scheduler.run_due()
+    clock.now += 1_000_000_000
+    scheduler.run_due()
+    assert lookahead[1:] == [[("五", "")]]
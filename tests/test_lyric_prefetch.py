@@ -0,0 +1,120 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import io
+import threading
+
+import pytest
+
+from common.api.exceptions import NetworkError
+from common.api.user_api.user_api import UserQueueTrack
+from common.lyric import lyric_prefetch
+from common.lyric.lyric_prefetch import LyricPrefetcher
+from common.song_metadata.metadata_type import SongInfo
+
+
+class FakeLyricManage:
+    def __init__(self):
+        self.existing = {"track-1"}
+        self.not_found = {}
+
+    def is_lyric_exist(self, track_id):
+        return track_id in self.existing
+
+    def is_retry_due(self, track_id):
+        return track_id not in self.not_found
+
+    def set_not_found(self, track_id, track_title, reason="no_match"):
+        self.not_found[track_id] = {"track_title": track_title, "reason": reason}
+
+
+class FakeTempManage:
+    def __init__(self):
+        self.images = {"track-1": b"jpeg"}
+
+    def has_temp_image(self, track_id):
+        return track_id in self.images
+
+    def save_temp_image(self, track_id, img_io):
+        self.images[track_id] = img_io.getvalue()
+
+
+class FakeUserApi:
+    def __init__(self, tracks):
+        self.tracks = tracks
+
+    def get_user_queue(self):
+        return self.tracks
+
+
+def make_track(index):
+    return UserQueueTrack(f"track-{index}", f"Song {index}", "Artist", 200000)
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    lyric_manage = FakeLyricManage()
+    temp_manage = FakeTempManage()
+    downloaded = []
+
+    def download_lrc_result(track_name, track_id):
+        downloaded.append(track_id)
+        if track_id == "track-4":
+            raise NetworkError("timeout")
+        return "no_match" if track_id == "track-3" else "found"
+
+    monkeypatch.setattr(lyric_prefetch, "LyricFileManage", lambda: lyric_manage)
+    monkeypatch.setattr(lyric_prefetch, "TempFileManage", lambda: temp_manage)
+    monkeypatch.setattr(lyric_prefetch.lyric_download, "download_lrc_result", download_lrc_result)
+    monkeypatch.setattr(lyric_prefetch.lyric_download.spotify_api, "search_song_info",
+                        lambda track_id, **kwargs: SongInfo("Artist", "Song", None, None, None, "3:20", None,
+                                                            io.BytesIO(b"cover")))
+    monkeypatch.setattr(lyric_prefetch.Config.CommonConfig, "prefetch_count", 5)
+    return lyric_manage, temp_manage, downloaded
+
+
+def test_prefetch_downloads_missing_lyrics_and_covers(fakes):
+    lyric_manage, temp_manage, downloaded = fakes
+    lyric_manage.not_found["track-5"] = {"track_title": "Song 5 - Artist", "reason": "no_match"}
+    prefetcher = LyricPrefetcher(FakeUserApi([make_track(i) for i in range(1, 6)]))
+
+    prefetcher.prefetch_user_queue()
+    prefetcher._queue_executor.shutdown(wait=True)
+    prefetcher._executor.shutdown(wait=True)
+
+    assert sorted(downloaded) == ["track-2", "track-3", "track-4"]
+    assert lyric_manage.not_found["track-3"]["reason"] == "no_match"
+    assert lyric_manage.not_found["track-4"]["reason"] == "network"
+    assert temp_manage.images["track-2"] == b"cover"
+    assert temp_manage.images["track-4"] == b"cover"
+
+
+def test_prefetch_respects_count_and_rate_budget(fakes, monkeypatch):
+    _, _, downloaded = fakes
+    monkeypatch.setattr(lyric_prefetch.Config.CommonConfig, "prefetch_count", 4)
+    prefetcher = LyricPrefetcher(FakeUserApi([make_track(i) for i in range(2, 10)]), rate_limit=2)
+
+    prefetcher.prefetch_user_queue()
+    prefetcher._queue_executor.shutdown(wait=True)
+    prefetcher._executor.shutdown(wait=True)
+
+    assert sorted(downloaded) == ["track-2", "track-3"]
+
+
+def test_prefetch_skips_tracks_in_flight(fakes, monkeypatch):
+    _, _, downloaded = fakes
+    release = threading.Event()
+
+    def slow_download(track_name, track_id):
+        release.wait(1)
+        downloaded.append(track_id)
+        return "found"
+
+    monkeypatch.setattr(lyric_prefetch.lyric_download, "download_lrc_result", slow_download)
+    prefetcher = LyricPrefetcher(FakeUserApi([]), max_workers=1)
+
+    assert prefetcher.prefetch([make_track(2)]) == ["track-2"]
+    assert prefetcher.prefetch([make_track(2)]) == []
+    release.set()
+    prefetcher._executor.shutdown(wait=True)
+    assert downloaded == ["track-2"]
+
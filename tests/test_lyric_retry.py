@@ -0,0 +1,106 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import time
+
+import pytest
+
+from common.api.exceptions import NetworkError
+from common.lyric import lyric_retry
+from common.lyric.lyric_retry import LyricRetryScheduler
+
+
+class FakeLyricManage:
+    def __init__(self):
+        self.existing = set()
+        self.not_found = {}
+        self.due = set()
+
+    def is_lyric_exist(self, track_id):
+        return track_id in self.existing
+
+    def is_retry_due(self, track_id):
+        return track_id not in self.not_found or track_id in self.due
+
+    def get_due_retries(self, limit=-1):
+        return [(track_id, self.not_found[track_id]) for track_id in sorted(self.due)][:limit]
+
+    def set_not_found(self, track_id, track_title, reason="no_match"):
+        self.not_found[track_id] = reason
+        self.due.discard(track_id)
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    lyric_manage = FakeLyricManage()
+    downloaded = []
+
+    def download_lrc_result(track_name, track_id):
+        downloaded.append(track_id)
+        if track_id == "track-net":
+            raise NetworkError("timeout")
+        if track_id == "track-none":
+            return "no_match"
+        lyric_manage.existing.add(track_id)
+        lyric_manage.not_found.pop(track_id, None)
+        lyric_manage.due.discard(track_id)
+        return "found"
+
+    monkeypatch.setattr(lyric_retry, "LyricFileManage", lambda: lyric_manage)
+    monkeypatch.setattr(lyric_retry.lyric_download, "download_lrc_result", download_lrc_result)
+    return lyric_manage, downloaded
+
+
+def test_request_only_queues_due_tracks_once(fakes):
+    lyric_manage, _ = fakes
+    lyric_manage.not_found["track-1"] = "Song 1 - Artist"
+    scheduler = LyricRetryScheduler()
+
+    assert not scheduler.request("track-1", "Song 1 - Artist")
+    lyric_manage.due.add("track-1")
+    assert scheduler.request("track-1", "Song 1 - Artist")
+    assert not scheduler.request("track-1", "Song 1 - Artist")
+
+
+def test_retry_records_reason_and_reports_found(fakes):
+    lyric_manage, downloaded = fakes
+    for track_id in ("track-found", "track-net", "track-none"):
+        lyric_manage.not_found[track_id] = f"{track_id} - Artist"
+        lyric_manage.due.add(track_id)
+    found = []
+    scheduler = LyricRetryScheduler(found_func=found.append)
+
+    scheduler._enqueue_due()
+    while not scheduler._queue.empty():
+        scheduler._retry(*scheduler._queue.get_nowait())
+
+    assert downloaded == ["track-found", "track-net", "track-none"]
+    assert found == ["track-found"]
+    assert lyric_manage.not_found == {"track-net": "network", "track-none": "no_match"}
+    assert not lyric_manage.due
+
+
+def test_close_stops_background_thread(fakes):
+    scheduler = LyricRetryScheduler(check_interval=10)
+    scheduler.start()
+    scheduler.close()
+    scheduler._thread.join(1)
+    assert not scheduler._thread.is_alive()
+
+
+def test_steady_requests_do_not_starve_due_retries(fakes):
+    lyric_manage, downloaded = fakes
+    scheduler = LyricRetryScheduler(check_interval=0.05, rate_limit=1000, rate_period=1)
+    scans = []
+    scheduler._enqueue_due = lambda: scans.append(len(downloaded))
+    scheduler.start()
+    try:
+        # 请求间隔短于 check_interval，队列从不空闲超时
+        for i in range(30):
+            scheduler.request(f"track-{i}", f"Song {i} - Artist")
+            time.sleep(0.01)
+    finally:
+        scheduler.close()
+        scheduler._thread.join(1)
+
+    assert len(downloaded) == 30
+    assert len(scans) >= 3
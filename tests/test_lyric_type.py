@@ -0,0 +1,230 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import base64
+import json
+import time
+import zlib
+
+import pytest
+
+from common.lyric import lyric_type
+from common.lyric.lyric_type import KrcFile, LrcFile, TransType
+
+KRC_KEY = bytes([0x40, 0x47, 0x61, 0x77, 0x5e, 0x32, 0x74, 0x47, 0x51, 0x36, 0x31, 0x2d, 0xce, 0xd2, 0x6e, 0x69])
+
+
+def encrypt_krc(text: str) -> bytes:
+    compressed = zlib.compress(text.encode("utf-8"))
+    return b"krc1" + bytes(ch ^ KRC_KEY[i % 16] for i, ch in enumerate(compressed))
+
+
+def make_lrc_file():
+    lrc_file = LrcFile()
+    lrc_file.load_content("[00:01.00]第一句\n[00:03.00]第二句\n[00:05.00]第三句\n", TransType.NON)
+    return lrc_file
+
+
+def test_get_order_position_uses_sorted_timeline():
+    lrc_file = make_lrc_file()
+
+    assert lrc_file.get_order_position(0) == 0
+    assert lrc_file.get_order_position(1000) == 0
+    assert lrc_file.get_order_position(2999) == 0
+    assert lrc_file.get_order_position(3000) == 1
+    assert lrc_file.get_order_position(99999) == 2
+
+
+def test_get_time_returns_sentinels():
+    lrc_file = make_lrc_file()
+
+    assert lrc_file.get_time(1) == 3000
+    assert lrc_file.get_time(3) == -2
+    assert LrcFile().get_time(0) == -1
+    assert LrcFile().get_order_position(1000) == -1
+
+
+def test_load_dict_rebuilds_timeline():
+    lrc_file = LrcFile()
+    lrc_file.load_dict({5000: "c", 1000: "a", 3000: "b"}, TransType.NON)
+
+    assert [lrc_file.get_time(order) for order in range(3)] == [1000, 3000, 5000]
+    assert lrc_file.get_order_position(4000) == 1
+
+
+def test_translation_columns_share_timeline_and_back_fill():
+    lrc_file = make_lrc_file()
+    lrc_file.load_content("[00:01.00]one\n[00:05.00]three\n", TransType.CHINESE)
+
+    assert lrc_file.get_column(TransType.CHINESE) == ["one", "", "three"]
+    assert dict(lrc_file.trans_chinese_dict) == {1000: "one", 3000: "", 5000: "three"}
+    assert lrc_file.get_text(1, TransType.CHINESE) == ""
+    assert lrc_file.empty(TransType.ROMAJI)
+    assert lrc_file.available_trans() == [TransType.NON, TransType.CHINESE]
+
+
+def test_dict_views_are_read_only():
+    lrc_file = make_lrc_file()
+
+    assert lrc_file.trans_non_dict[3000] == "第二句"
+    assert 4000 not in lrc_file.trans_non_dict
+    assert not lrc_file.trans_romaji_dict
+    with pytest.raises(TypeError):
+        lrc_file.trans_non_dict[4000] = "new"
+
+
+def test_reloading_one_type_keeps_other_columns():
+    lrc_file = make_lrc_file()
+    lrc_file.load_content("[00:03.00]two\n", TransType.ROMAJI)
+    lrc_file.load_content("[00:03.00]新第二句\n[00:07.00]第四句\n", TransType.NON)
+
+    assert list(lrc_file.trans_non_dict.items()) == [(3000, "新第二句"), (7000, "第四句")]
+    # 原文删除的行不会以补齐的空字符串留在翻译中
+    assert dict(lrc_file.trans_romaji_dict) == {3000: "two", 7000: ""}
+    assert list(lrc_file._timeline) == [3000, 7000]
+    assert lrc_file.get_time(0) == 3000
+    assert lrc_file.get_text(0) == "新第二句"
+
+
+def test_translation_only_timestamps_do_not_split_original_lines():
+    lrc_file = make_lrc_file()
+    lrc_file.load_content("[00:01.00]first\n[00:02.00]only translation\n", TransType.CHINESE)
+
+    # 时间轴与原文一致，原文第一句持续到 3000
+    assert list(lrc_file._timeline) == [1000, 3000, 5000]
+    assert lrc_file.get_time(1) == 3000
+    assert lrc_file.get_order_position(2500) == 0
+    assert dict(lrc_file.trans_chinese_dict) == {1000: "first", 3000: "", 5000: ""}
+
+
+def test_translation_is_timeline_without_original():
+    lrc_file = LrcFile()
+    lrc_file.load_content("[00:01.00]first\n[00:02.00]second\n", TransType.CHINESE)
+    lrc_file.load_content("[00:02.00]two\n[00:04.00]four\n", TransType.ROMAJI)
+
+    assert list(lrc_file._timeline) == [1000, 2000]
+    assert dict(lrc_file.trans_romaji_dict) == {2000: "two"}
+
+    lrc_file.load_content("[00:01.00]第一句\n", TransType.NON)
+    assert list(lrc_file._timeline) == [1000]
+    assert dict(lrc_file.trans_chinese_dict) == {1000: "first"}
+    assert lrc_file.available_trans() == [TransType.NON, TransType.CHINESE]
+
+
+def test_load_content_expands_multiple_tags_and_time_formats():
+    lrc_file = LrcFile()
+    lrc_file.load_content(
+        "[ar:Artist]\n[00:01.00][00:30.00]chorus\r\n[00:02]no fraction\n[01:00:00.5]hours\n[00:03:123]mrc\n",
+        TransType.NON,
+    )
+
+    assert dict(lrc_file.trans_non_dict) == {
+        1000: "chorus",
+        2000: "no fraction",
+        3123: "mrc",
+        30000: "chorus",
+        3600500: "hours",
+    }
+
+
+def test_load_content_shifts_duplicate_timestamps():
+    lrc_file = LrcFile()
+    lrc_file.load_content("[00:01.00]a\n[00:01.00]b\n[00:01.00][00:01.01]c\n", TransType.NON)
+
+    assert list(lrc_file.trans_non_dict.items()) == [(1000, "a"), (1010, "b"), (1020, "c"), (1030, "c")]
+
+
+def test_load_content_round_trips_get_content():
+    lrc_file = make_lrc_file()
+    reloaded = LrcFile()
+    reloaded.load_content(lrc_file.get_content(), TransType.NON)
+
+    assert dict(reloaded.trans_non_dict) == dict(lrc_file.trans_non_dict)
+
+
+def make_long_lrc(lines: int = 5000) -> str:
+    return "\n".join("[%02d:%02d.%02d]第%d句" % (i // 6000, i // 100 % 60, i % 100, i) for i in range(lines))
+
+
+class CountingPattern:
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.scans = 0
+
+    def finditer(self, content):
+        self.scans += 1
+        return self.pattern.finditer(content)
+
+
+def test_load_content_parses_5000_lines_in_one_pass(monkeypatch):
+    line_pattern = CountingPattern(lyric_type._LRC_LINE_PATTERN)
+    monkeypatch.setattr(lyric_type, "_LRC_LINE_PATTERN", line_pattern)
+
+    def no_per_line_regex(*args, **kwargs):
+        raise AssertionError("load_content should only use the precompiled patterns")
+
+    for name in ("match", "split", "findall", "compile"):
+        monkeypatch.setattr(lyric_type.re, name, no_per_line_regex)
+    lrc_file = LrcFile()
+
+    lrc_file.load_content(make_long_lrc(), TransType.NON)
+
+    assert line_pattern.scans == 1
+    assert len(lrc_file.trans_non_dict) == 5000
+    assert lrc_file.get_text(4999) == "第4999句"
+
+
+@pytest.mark.benchmark
+def test_load_content_5000_lines_benchmark():
+    content = make_long_lrc()
+    lrc_file = LrcFile()
+
+    start = time.perf_counter()
+    lrc_file.load_content(content, TransType.NON)
+    elapsed = time.perf_counter() - start
+
+    assert len(lrc_file.trans_non_dict) == 5000
+    assert elapsed < 0.5
+
+
+def test_krc_file_decrypts_and_rewrites_line_times():
+    language = base64.b64encode(json.dumps({"content": [
+        {"type": 1, "lyricContent": [["你好"], ["世界"]]},
+    ]}).encode()).decode()
+    krc_text = ("[ar:Artist]\n[language:%s]\n"
+                "[1000,500]<0,200,0>Hel<200,300,0>lo\n"
+                "[3723456,800]<0,800,0>World\n" % language)
+
+    krc_file = KrcFile()
+    krc_file.load_content(encrypt_krc(krc_text))
+
+    assert dict(krc_file.trans_non_dict) == {1000: "Hello", 3723456: "World"}
+    assert dict(krc_file.trans_chinese_dict) == {1000: "你好", 3723456: "世界"}
+
+
+def test_krc_word_lines_are_parsed_lazily():
+    krc_file = KrcFile()
+    krc_file.load_content(encrypt_krc("[1000,500]<0,200,0>Hel<200,300,0>lo\n[2000,100]plain\n"))
+
+    assert krc_file._word_lines == {}
+    word_line = krc_file.get_word_line(0)
+
+    assert word_line.start == 1000
+    assert word_line.words == ["Hel", "lo"]
+    assert list(word_line.offsets) == [0, 200]
+    assert list(word_line.durations) == [200, 300]
+    assert krc_file.get_word_line(0) is word_line
+    assert krc_file.get_word_line(1) is None
+    assert LrcFile().get_word_line(0) is None
+
+
+def test_word_timed_line_progress():
+    krc_file = KrcFile()
+    krc_file.load_content(encrypt_krc("[1000,500]<0,200,0>Hel<200,300,0>lo\n"))
+    word_line = krc_file.get_word_line(0)
+
+    assert word_line.word_index(100) == 0
+    assert word_line.word_index(250) == 1
+    assert word_line.progress(0) == 0
+    assert word_line.progress(100) == pytest.approx(0.3)
+    assert word_line.progress(200) == pytest.approx(0.6)
+    assert word_line.progress(1000) == 1
@@ -0,0 +1,98 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import pytest
+
+from common.api import provider_health
+from common.api.exceptions import NetworkError, NoneResultError
+from common.api.provider_health import ProviderHealth, track_health, CLOSED, OPEN, HALF_OPEN
+from common.lyric import lyric_download
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(provider_health.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def isolated_health(monkeypatch):
+    monkeypatch.setattr(provider_health, "_health", {})
+
+
+def test_circuit_opens_after_consecutive_failures_and_probes(clock):
+    health = ProviderHealth("kugou", failure_threshold=3, open_time=30)
+    for _ in range(3):
+        assert health.allow_request()
+        health.record_failure()
+    assert health.state == OPEN
+    assert not health.allow_request()
+
+    clock[0] += 30
+    assert health.snapshot().state == HALF_OPEN
+    assert health.allow_request()
+    assert not health.allow_request()  # 只放行一个探测请求
+
+    health.record_failure()
+    assert health.state == OPEN and health.open_time == 60
+
+    clock[0] += 60
+    assert health.allow_request()
+    health.record_success(0.2)
+    assert health.state == CLOSED and health.open_time == 30
+    assert health.allow_request()
+
+
+def test_latency_percentiles_and_error_rate(clock):
+    health = ProviderHealth("cloudmusic", window=10)
+    assert health.percentile(95) is None
+    for latency in (0.1, 0.2, 0.3, 0.4, 1.0):
+        health.record_success(latency)
+    health.record_failure()
+
+    assert health.percentile(50) == 0.3
+    assert health.percentile(95) == 1.0
+    assert health.error_rate() == pytest.approx(1 / 6)
+
+
+class FakeApi:
+    _PROVIDER = "fake"
+
+    def __init__(self):
+        self.calls = 0
+        self.error = None
+
+    @track_health
+    def search_song_id(self, keyword):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return [keyword]
+
+
+def test_track_health_short_circuits_open_provider(clock, isolated_health):
+    api = FakeApi()
+    api.error = NoneResultError()
+    with pytest.raises(NoneResultError):
+        api.search_song_id("song")
+    assert provider_health.get_provider_health("fake").consecutive_failures == 0
+
+    api.error = NetworkError("timeout")
+    for _ in range(3):
+        with pytest.raises(NetworkError):
+            api.search_song_id("song")
+    calls = api.calls
+    with pytest.raises(NetworkError):
+        api.search_song_id("song")
+    assert api.calls == calls
+
+    info, = provider_health.get_all_provider_health()
+    assert (info.provider, info.state, info.samples) == ("fake", OPEN, 4)
+
+
+def test_unhealthy_provider_is_deprioritized(clock, isolated_health):
+    kugou_health = provider_health.get_provider_health(lyric_download.kugou_api._PROVIDER)
+    for _ in range(kugou_health.failure_threshold):
+        kugou_health.record_failure()
+
+    assert lyric_download._ordered_providers() == [lyric_download.cloud_api, lyric_download.kugou_api]
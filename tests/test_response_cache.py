@@ -0,0 +1,106 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import io
+
+import pytest
+
+from common.api import response_cache
+from common.api.exceptions import NoneResultError, NetworkError
+from common.api.response_cache import ResponseCache, cached_response
+from common.song_metadata.metadata_type import SongInfo, SongSearchInfo
+
+
+class FakeApi:
+    _PROVIDER = "fake"
+
+    def __init__(self):
+        self.calls = []
+        self.error = None
+
+    @cached_response("search_song_id", 60)
+    def search_song_id(self, keyword: str, page: int = 1, _retry: bool = True):
+        self.calls.append(("search", keyword, page))
+        if self.error:
+            raise self.error
+        return [SongSearchInfo(songName="Song", singer="Artist", duration="3:30", idOrMd5="id-1")]
+
+    @cached_response("search_song_info", 3600, uncached_params=("download_pic",))
+    def search_song_info(self, song_id: str, *, download_pic: bool = False, pic_size: int = 0):
+        self.calls.append(("info", song_id, download_pic))
+        return SongInfo(singer="Artist", songName="Song", album="Album", year="2020", trackNumber=(1, 10),
+                        duration="3:30", genre=None, picBuffer=io.BytesIO(b"jpeg") if download_pic else None)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ResponseCache(tmp_path / "api_cache.db")
+    monkeypatch.setattr(response_cache, "get_response_cache", lambda: cache)
+    yield cache
+    cache.close()
+
+
+def test_search_is_cached_by_normalized_keyword(cache):
+    api = FakeApi()
+
+    first = api.search_song_id("Song  - Artist")
+    assert api.search_song_id(" song - artist", _retry=False) == first
+    assert api.search_song_id("Song - Artist", page=2)
+    assert api.calls == [("search", "Song  - Artist", 1), ("search", "Song - Artist", 2)]
+
+
+def test_song_info_round_trips_through_disk(cache, tmp_path, monkeypatch):
+    api = FakeApi()
+    song_info = api.search_song_info("id-1")
+
+    reopened = ResponseCache(tmp_path / "api_cache.db")
+    monkeypatch.setattr(response_cache, "get_response_cache", lambda: reopened)
+    cached = api.search_song_info("id-1")
+    reopened.close()
+
+    assert api.calls == [("info", "id-1", False)]
+    assert cached == song_info
+    assert cached.trackNumber == (1, 10)
+
+
+def test_song_info_with_picture_is_not_cached(cache):
+    api = FakeApi()
+    api.search_song_info("id-1")
+
+    first = api.search_song_info("id-1", download_pic=True)
+    second = api.search_song_info("id-1", download_pic=True)
+
+    assert api.calls == [("info", "id-1", False), ("info", "id-1", True), ("info", "id-1", True)]
+    assert first.picBuffer.read() == b"jpeg"
+    assert second.picBuffer.read() == b"jpeg"
+    assert cache._conn.execute("SELECT COUNT(*) FROM response").fetchone() == (1,)
+
+
+def test_none_result_is_cached_but_network_error_is_not(cache):
+    api = FakeApi()
+    api.error = NoneResultError("no result")
+    with pytest.raises(NoneResultError):
+        api.search_song_id("missing")
+    with pytest.raises(NoneResultError):
+        api.search_song_id("missing")
+    assert len(api.calls) == 1
+
+    api.error = NetworkError("offline")
+    with pytest.raises(NetworkError):
+        api.search_song_id("offline")
+    api.error = None
+    assert api.search_song_id("offline")
+    assert len(api.calls) == 3
+
+
+def test_expired_entries_are_refetched(cache, monkeypatch):
+    api = FakeApi()
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+
+    api.search_song_id("song")
+    now[0] += 59
+    api.search_song_id("song")
+    now[0] += 2
+    api.search_song_id("song")
+
+    assert len(api.calls) == 2
@@ -0,0 +1,130 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+import io
+import json
+
+import pytest
+
+from common.persistence import DebouncedJsonWriter
+from common.temp_manage import TempFileManage
+
+
+@pytest.fixture
+def isolated_temp_manage(tmp_path, monkeypatch):
+    image_dir = tmp_path / "image"
+    image_dir.mkdir()
+    temp_data_path = tmp_path / "temp.json"
+    temp_data_path.write_text(json.dumps({}), encoding="utf-8")
+
+    monkeypatch.setattr("common.temp_manage.TEMP_DATA_FILE_PATH", temp_data_path)
+    monkeypatch.setattr("common.temp_manage.TEMP_IMAGE_PATH", image_dir)
+
+    TempFileManage._instance = None
+    TempFileManage._is_init = False
+    manager = TempFileManage()
+    manager.temp_data_writer.interval = 60
+    yield manager, temp_data_path, image_dir
+    manager.temp_data_writer.flush()
+    TempFileManage._instance = None
+    TempFileManage._is_init = False
+
+
+def test_get_temp_image_does_not_write_until_flush(isolated_temp_manage):
+    manager, temp_data_path, _ = isolated_temp_manage
+
+    manager.save_temp_image("track-1", io.BytesIO(b"jpeg"))
+    assert json.loads(temp_data_path.read_text(encoding="utf-8")) == {}
+
+    for _ in range(10):
+        assert manager.get_temp_image("track-1").getvalue() == b"jpeg"
+    assert manager.temp_data_writer.dirty
+
+    manager.flush()
+    saved_data = json.loads(temp_data_path.read_text(encoding="utf-8"))
+    assert list(saved_data["image"]) == ["track-1"]
+    assert not manager.temp_data_writer.dirty
+    assert not (temp_data_path.parent / "temp.json.tmp").exists()
+
+
+def test_identical_covers_are_stored_once(isolated_temp_manage):
+    manager, _, image_dir = isolated_temp_manage
+
+    manager.save_temp_image("track-1", io.BytesIO(b"album"))
+    manager.save_temp_image("track-2", io.BytesIO(b"album"))
+
+    assert len(list(image_dir.iterdir())) == 1
+    assert manager.get_temp_image("track-2").getvalue() == b"album"
+
+    manager.delete_temp_image("track-1")
+    assert manager.get_temp_image("track-1").getvalue() == b""
+    assert manager.get_temp_image("track-2").getvalue() == b"album"
+
+
+def test_least_recently_used_cover_is_evicted_over_limit(isolated_temp_manage):
+    manager, _, image_dir = isolated_temp_manage
+    manager.cache_limit = 10
+
+    manager.save_temp_image("track-1", io.BytesIO(b"aaaa"))
+    manager.save_temp_image("track-2", io.BytesIO(b"bbbb"))
+    manager.get_temp_image("track-1")
+    manager.save_temp_image("track-3", io.BytesIO(b"cccc"))
+
+    assert manager.get_temp_image("track-2").getvalue() == b""
+    assert manager.get_temp_image("track-1").getvalue() == b"aaaa"
+    assert manager.get_temp_image("track-3").getvalue() == b"cccc"
+    assert len(list(image_dir.iterdir())) == 2
+    assert "track-2" not in manager.temp_data_json["image"]
+
+
+def test_legacy_track_id_images_are_migrated(tmp_path, monkeypatch):
+    image_dir = tmp_path / "image"
+    image_dir.mkdir()
+    (image_dir / "track-1.jpg").write_bytes(b"old")
+    temp_data_path = tmp_path / "temp.json"
+    temp_data_path.write_text(json.dumps({"image": {"track-1": {"last_time": 1}, "track-2": {"last_time": 1}}}),
+                              encoding="utf-8")
+    monkeypatch.setattr("common.temp_manage.TEMP_DATA_FILE_PATH", temp_data_path)
+    monkeypatch.setattr("common.temp_manage.TEMP_IMAGE_PATH", image_dir)
+
+    TempFileManage._instance = None
+    TempFileManage._is_init = False
+    manager = TempFileManage()
+    assert manager.get_temp_image("track-1").getvalue() == b"old"
+    assert "track-2" not in manager.temp_data_json["image"]
+    assert not (image_dir / "track-1.jpg").exists()
+    manager.flush()
+    TempFileManage._instance = None
+    TempFileManage._is_init = False
+
+
+def test_corrupt_temp_json_starts_empty(tmp_path, monkeypatch):
+    temp_data_path = tmp_path / "temp.json"
+    temp_data_path.write_text('{"image": {', encoding="utf-8")
+    monkeypatch.setattr("common.temp_manage.TEMP_DATA_FILE_PATH", temp_data_path)
+
+    TempFileManage._instance = None
+    TempFileManage._is_init = False
+    manager = TempFileManage()
+    assert manager.temp_data_json == {"image": {}, "blob": {}}
+    TempFileManage._instance = None
+    TempFileManage._is_init = False
+
+
+def test_debounced_writer_coalesces_writes(tmp_path, monkeypatch):
+    path = tmp_path / "data.json"
+    data = {"count": 0}
+    writes = []
+    monkeypatch.setattr("common.persistence.write_text_atomic", lambda p, text: writes.append(text))
+    writer = DebouncedJsonWriter(path, lambda: data, interval=0.05)
+
+    writer.mark_dirty()
+    timer = writer._timer
+    for i in range(100):
+        with writer.lock:
+            data["count"] = i
+        writer.mark_dirty()
+    timer.join(1)
+
+    assert writes == [json.dumps({"count": 99}, indent=4)]
+    writer.flush()
+    assert len(writes) == 1